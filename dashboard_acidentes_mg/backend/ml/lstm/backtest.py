@@ -0,0 +1,136 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Adiciona a raiz do projeto ao path
+sys.path.append(os.getcwd())
+
+from backend.ml.preprocessing.data import daily_counts, dataset_version
+from backend.ml.preprocessing.windows import train_cutoff
+from backend.ml.lstm.service import load_forecaster, recursive_forecast, METRICS_PATH
+
+# Backtest walk-forward (origem movel): a partir de cada origem t (ultimo dia
+# observado) o modelo preve os proximos dias e o erro e medido contra o que
+# aconteceu. As previsoes de todas as origens saem de uma unica previsao
+# recursiva em lote (um forward pass por dia do horizonte, com todas as
+# origens juntas). Os baselines (sazonal ingenuo e media movel) sao indexacao
+# e somas acumuladas sobre a serie, sem laco por origem.
+BACKTEST_PATH = os.path.join(os.path.dirname(METRICS_PATH), 'lstm_backtest.json')
+HORIZONS = [1, 7, 14, 30, 60, 90, 180, 365]
+SEASONS = [7, 365]
+MA_WINDOWS = [7, 28]
+METRICS = ['n', 'mae', 'rmse', 'smape']
+
+def origin_indices(n_steps, lookback, step=7, start=None):
+    """Origens a cada `step` dias; por padrao so depois do trecho visto no treino."""
+    if start is None:
+        _, seen = train_cutoff(n_steps, lookback)
+        start = seen - 1
+    return np.arange(max(start, lookback - 1), n_steps - 1, step)
+
+def actuals(values, origins, horizon):
+    """Matriz (origens, horizonte) com y[t + 1 .. t + horizonte]; NaN apos o fim da serie."""
+    padded = np.concatenate([values[1:], np.full(horizon, np.nan)])
+    return sliding_window_view(padded, horizon)[origins]
+
+def lstm_forecasts(forecaster, values, origins, horizon):
+    low, span = forecaster.scale
+    windows = sliding_window_view((values - low) / span, forecaster.lookback)[origins - forecaster.lookback + 1]
+    forecast = recursive_forecast(forecaster.predict_scaled, windows, horizon) * span + low
+    return np.clip(forecast.astype(np.float64), 0, None)
+
+def seasonal_naive(values, origins, horizon, season):
+    """Repete o ultimo ciclo de `season` dias observado antes de cada origem."""
+    leads = np.arange(1, horizon + 1)
+    idx = origins[:, None] + leads - season * np.ceil(leads / season).astype(np.int64)
+    return np.where(idx >= 0, values[np.clip(idx, 0, None)], np.nan)
+
+def moving_average(values, origins, horizon, window):
+    """Media dos ultimos `window` dias ate a origem, constante no horizonte."""
+    acc = np.concatenate([[0.0], np.cumsum(values)])
+    first = origins + 1 - window
+    mean = np.where(first >= 0, (acc[origins + 1] - acc[np.clip(first, 0, None)]) / window, np.nan)
+    return np.repeat(mean[:, None], horizon, axis=1)
+
+def horizon_metrics(forecast, actual, horizons):
+    """Metricas acumuladas ate cada horizonte h (todos os passos 1..h de todas as origens)."""
+    valid = np.isfinite(forecast) & np.isfinite(actual)
+    err = np.where(valid, forecast - actual, 0.0)
+    denom = np.abs(np.where(valid, forecast, 0.0)) + np.abs(np.where(valid, actual, 0.0))
+    sym = np.divide(2 * np.abs(err), denom, out=np.zeros_like(err), where=denom > 0)
+    # Somas por passo (sobre as origens) e depois acumuladas no horizonte
+    cum = lambda a: np.cumsum(a.sum(axis=0))
+    n, abs_sum, sq_sum, sym_sum = cum(valid), cum(np.abs(err)), cum(err ** 2), cum(sym)
+    at = np.asarray(horizons) - 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'n': n[at].astype(np.int64),
+            'mae': abs_sum[at] / n[at],
+            'rmse': np.sqrt(sq_sum[at] / n[at]),
+            'smape': 100 * sym_sum[at] / n[at],
+        }, index=pd.Index(horizons, name='horizonte'))
+
+def run_backtest(series=None, horizons=HORIZONS, step=7, start=None, seasons=SEASONS, ma_windows=MA_WINDOWS, forecaster=None):
+    """Tabela horizonte x (modelo, metrica) do backtest walk-forward."""
+    series = daily_counts()['total_acidentes'] if series is None else series
+    forecaster = forecaster or load_forecaster()
+    values = series.to_numpy(dtype=np.float64)
+    origins = origin_indices(len(values), forecaster.lookback, step, start)
+    if len(origins) == 0:
+        raise ValueError("Serie curta demais para o backtest")
+    horizon = int(min(max(horizons), len(values) - 1 - origins[0]))
+    horizons = [h for h in horizons if h <= horizon]
+    actual = actuals(values, origins, horizon)
+
+    start_time = time.perf_counter()
+    forecasts = {forecaster.source: lstm_forecasts(forecaster, values, origins, horizon)}
+    lstm_seconds = time.perf_counter() - start_time
+    for season in seasons:
+        forecasts[f"sazonal_{season}"] = seasonal_naive(values, origins, horizon, season)
+    for window in ma_windows:
+        forecasts[f"media_movel_{window}"] = moving_average(values, origins, horizon, window)
+
+    table = pd.concat({name: horizon_metrics(f, actual, horizons) for name, f in forecasts.items()},
+                      axis=1, names=['modelo', 'metrica'])
+    info = {
+        "origens": len(origins),
+        "primeira_origem": str(series.index[origins[0]].date()),
+        "ultima_origem": str(series.index[origins[-1]].date()),
+        "passo_dias": step,
+        "horizonte_max": horizon,
+        "segundos_lstm": round(lstm_seconds, 3),
+        "modelo": forecaster.source,
+        "dataset_version": dataset_version(),
+    }
+    return table, info
+
+def save_backtest(table, info, path=BACKTEST_PATH):
+    records = table.stack('modelo', future_stack=True).reset_index()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({**info, "metricas": records.round(4).to_dict(orient='records')}, f, ensure_ascii=False, indent=2)
+    print(f"✅ Backtest salvo em {path}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest walk-forward do LSTM contra baselines")
+    parser.add_argument("--step", type=int, default=7, help="dias entre origens")
+    parser.add_argument("--start", type=str, default=None, help="data da primeira origem (padrao: fim do treino)")
+    parser.add_argument("--horizons", type=lambda t: [int(v) for v in t.split(',')], default=HORIZONS)
+    args = parser.parse_args()
+
+    print("--- INICIANDO BACKTEST WALK-FORWARD ---")
+    series = daily_counts()['total_acidentes']
+    start = int(series.index.get_indexer([pd.Timestamp(args.start)])[0]) if args.start else None
+    table, info = run_backtest(series, args.horizons, args.step, start)
+    print(f"Origens: {info['origens']} ({info['primeira_origem']} a {info['ultima_origem']}, a cada {args.step} dias) | "
+          f"LSTM em lote: {info['segundos_lstm']}s")
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.precision', 2):
+        for metric in METRICS[1:]:
+            print(f"\n{metric.upper()} por horizonte (acumulado ate h dias)")
+            print(table.xs(metric, axis=1, level='metrica'))
+    save_backtest(table, info)
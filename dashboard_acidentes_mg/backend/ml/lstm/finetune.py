@@ -0,0 +1,115 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# Adiciona a raiz do projeto ao path
+sys.path.append(os.getcwd())
+
+from backend.ml.preprocessing.data import verify_and_load_data, dataset_version
+from backend.ml.preprocessing.windows import WindowSet, train_cutoff
+from backend.ml.lstm.service import load_forecaster, MODEL_CANDIDATES, METRICS_PATH
+
+# Ajuste incremental: parte do modelo promovido e da escala congelada (a
+# mesma que a API usa; o scaler nao e reajustado) e treina poucas epocas so
+# com as janelas cujo alvo e posterior ao ultimo dia ja treinado. Os ultimos
+# dias novos ficam de fora como holdout: o modelo ajustado so substitui o
+# atual se errar menos que ele nesses dias.
+MODEL_PATH, SCALER_PATH = MODEL_CANDIDATES[0]
+HOLDOUT_DAYS = 7
+EPOCHS = 3
+LEARNING_RATE = 1e-4  # menor que o do treino completo, para nao apagar o que o modelo ja aprendeu
+
+def last_trained_date(series, lookback):
+    """Ultimo dia usado como alvo no treino (lstm_metrics.json) ou, sem registro, o fim do corte 80/20."""
+    if os.path.exists(METRICS_PATH):
+        with open(METRICS_PATH) as f:
+            recorded = json.load(f).get('last_train_date')
+        if recorded:
+            return pd.Timestamp(recorded)
+    _, seen = train_cutoff(len(series), lookback)
+    print("Aviso: ultimo dia treinado nao registrado; usando o fim do corte 80/20")
+    return series.index[seen - 1]
+
+def new_windows(scaled, dates, lookback, since):
+    """Janelas (sobre a serie escalada) cujo alvo cai depois de `since`."""
+    windows = WindowSet(scaled, lookback)
+    first_target = int(dates.searchsorted(since, side='right'))
+    return windows, max(first_target - lookback, 0)
+
+def holdout_mae(model, windows, start, stop):
+    X, y = windows.X(0, start, stop), windows.y(0, start, stop)
+    pred = np.asarray(model(np.ascontiguousarray(X), training=False)).reshape(-1)
+    return float(np.abs(pred - y).mean())
+
+def finetune(epochs=EPOCHS, holdout_days=HOLDOUT_DAYS, learning_rate=LEARNING_RATE, tolerance=0.0):
+    """Ajusta o modelo promovido com os dias novos; devolve o resumo (promovido ou nao)."""
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.optimizers import Adam
+    from backend.ml.lstm.runtime import install_model, staging_path
+
+    print("--- INICIANDO AJUSTE INCREMENTAL ---")
+    forecaster = load_forecaster()
+    if forecaster.source != os.path.basename(MODEL_PATH):
+        raise FileNotFoundError(f"Modelo promovido nao encontrado: {MODEL_PATH}")
+    df_daily = verify_and_load_data()
+    if df_daily is None: return None
+    series = df_daily['total_acidentes']
+    lookback = forecaster.lookback
+    low, span = forecaster.scale
+
+    since = last_trained_date(series, lookback)
+    windows, first = new_windows(((series - low) / span).to_numpy(), series.index, lookback, since)
+    n_new = windows.n_windows - first
+    if n_new <= holdout_days:
+        print(f"Dias novos desde {since.date()}: {n_new} (holdout de {holdout_days}); nada a ajustar")
+        return {"promoted": False, "new_days": n_new, "since": str(since.date())}
+    split = windows.n_windows - holdout_days
+    print(f"Dias novos desde {since.date()}: {n_new} | treino: {split - first} | holdout: {holdout_days}")
+
+    current = load_model(MODEL_PATH, compile=False)
+    model = load_model(MODEL_PATH, compile=False)
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mean_squared_error')
+    model.fit(np.ascontiguousarray(windows.X(0, first, split)), np.ascontiguousarray(windows.y(0, first, split)),
+              epochs=epochs, batch_size=32, shuffle=True, verbose=0)
+
+    before, after = holdout_mae(current, windows, split, None), holdout_mae(model, windows, split, None)
+    summary = {
+        "since": str(since.date()),
+        "new_days": n_new,
+        "holdout_mae_before": round(before * span, 4),
+        "holdout_mae_after": round(after * span, 4),
+        "promoted": after <= before * (1 + tolerance),
+    }
+    print(f"MAE no holdout (escala real): atual {summary['holdout_mae_before']} | ajustado {summary['holdout_mae_after']}")
+    if not summary["promoted"]:
+        print("Modelo ajustado nao passou no holdout; o atual continua em uso")
+        return summary
+
+    # Modelo e .npz gravados ao lado e trocados juntos; o scaler congelado nao e regravado
+    staged = staging_path(MODEL_PATH)
+    model.save(staged)
+    install_model(staged, MODEL_PATH, scale=(low, span))
+    summary["last_train_date"] = str(series.index[split + lookback - 1].date())
+    metrics = {}
+    if os.path.exists(METRICS_PATH):
+        with open(METRICS_PATH) as f:
+            metrics = json.load(f)
+    metrics.update(last_train_date=summary["last_train_date"], dataset_version=dataset_version(),
+                   finetune={k: v for k, v in summary.items() if k != "promoted"})
+    with open(METRICS_PATH, 'w') as f:
+        json.dump(metrics, f)
+    print(f"✅ Modelo ajustado promovido (treinado ate {summary['last_train_date']})")
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ajuste incremental do LSTM com os dias novos")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--holdout", type=int, default=HOLDOUT_DAYS, help="dias mais recentes reservados para a checagem")
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--tolerance", type=float, default=0.0, help="piora relativa aceita no holdout (0.05 = 5%%)")
+    args = parser.parse_args()
+    finetune(args.epochs, args.holdout, args.learning_rate, args.tolerance)
@@ -0,0 +1,145 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# Adiciona a raiz do projeto ao path
+sys.path.append(os.getcwd())
+
+from backend.ml.preprocessing.data import daily_counts, dataset_version
+from backend.ml.preprocessing.windows import WindowSet, train_cutoff, minmax_fit
+from backend.ml.lstm.service import recursive_forecast, load_lstm_model, BASE_DIR, HORIZON, FORECAST_TABLE_PATH, FORECAST_META_PATH
+from backend.ml.lstm.runtime import export_model
+
+# Modelo global: um unico LSTM treinado sobre as series diarias de todas as
+# BRs e municipios. O id da serie entra por um Embedding concatenado a cada
+# passo da janela, e cada serie tem sua propria escala MinMax (ajustada so no
+# trecho de treino). Na inferencia todas as series andam juntas: um forward
+# pass por dia do horizonte, e o resultado vai para a tabela de previsoes.
+GLOBAL_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'tensorflow', 'lstm_global.keras')
+GLOBAL_META_PATH = os.path.join(BASE_DIR, 'models', 'tensorflow', 'lstm_global_series.json')
+GROUPS = ['br', 'municipio']
+MIN_RECORDS = 30  # series com menos registros no historico ficam de fora
+
+def build_series_matrix(groups=GROUPS, min_records=MIN_RECORDS):
+    """Dias x series com colunas 'br:381', 'municipio:BELO HORIZONTE', ..."""
+    frames = []
+    for group in groups:
+        counts = daily_counts(group)
+        counts = counts.loc[:, counts.sum() >= min_records]
+        counts.columns = [f"{group}:{key}" for key in counts.columns]
+        frames.append(counts)
+    return pd.concat(frames, axis=1)
+
+def create_global_model(lookback, n_series, embedding_dim=8, units=50):
+    from tensorflow.keras import layers, Model
+
+    window = layers.Input(shape=(lookback, 1), name='janela')
+    series_id = layers.Input(shape=(), dtype='int32', name='serie')
+    # Id da serie como vetor aprendido, repetido em cada passo da janela
+    embedding = layers.Embedding(n_series, embedding_dim, name='serie_embedding')(series_id)
+    steps = layers.Concatenate()([window, layers.RepeatVector(lookback)(embedding)])
+    x = layers.LSTM(units)(steps)
+    x = layers.Dropout(0.2)(x)
+    output = layers.Dense(1)(x)
+
+    model = Model([window, series_id], output)
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+def _predict_fn(model, n_series):
+    ids = np.arange(n_series, dtype=np.int32)
+    return lambda windows: np.asarray(model([windows[..., None], ids[:len(windows)]], training=False)).reshape(-1)
+
+def train_global(lookback=30, epochs=30, batch_size=256, train_frac=0.8):
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    print("--- INICIANDO TREINAMENTO DO MODELO GLOBAL ---")
+    matrix = build_series_matrix()
+    values = matrix.to_numpy()
+    n_train, seen = train_cutoff(len(values), lookback, 1, train_frac)
+    low, span = minmax_fit(values[:seen])
+    windows = WindowSet((values - low) / span, lookback)
+    train_idx, test_idx = windows.split(train_frac)
+    print(f"Series: {windows.n_series} | Janelas de treino: {len(train_idx)} | teste: {len(test_idx)}")
+
+    model = create_global_model(lookback, windows.n_series)
+    model.fit(
+        windows.tf_dataset(batch_size, train_idx, shuffle=True, with_ids=True),
+        validation_data=windows.tf_dataset(batch_size, test_idx, with_ids=True),
+        epochs=epochs,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)],
+        verbose=1,
+    )
+    os.makedirs(os.path.dirname(GLOBAL_MODEL_PATH), exist_ok=True)
+    model.save(GLOBAL_MODEL_PATH)
+    export_model(GLOBAL_MODEL_PATH)
+
+    # MAE de teste por serie, na escala real (erro escalado x amplitude da serie)
+    (X_test, ids_test), y_test = next(windows.batches(len(test_idx), test_idx, with_ids=True))
+    errors = np.abs(np.asarray(model([X_test, ids_test], training=False)).reshape(-1) - y_test) * span[ids_test]
+    mae = np.bincount(ids_test, weights=errors, minlength=windows.n_series) / np.maximum(np.bincount(ids_test, minlength=windows.n_series), 1)
+
+    meta = {
+        "series": list(matrix.columns),
+        "low": low.tolist(),
+        "span": span.tolist(),
+        "mae": np.round(mae, 4).tolist(),
+        "lookback": lookback,
+        "dataset_version": dataset_version(),
+        "last_train_date": str(matrix.index[seen - 1].date()),
+    }
+    with open(GLOBAL_META_PATH, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    print("✅ Modelo global salvo!")
+    return model, meta
+
+def forecast_all(model=None, meta=None, horizon=HORIZON):
+    """Preve todas as series do modelo global em lote e grava a tabela de previsoes."""
+    if meta is None:
+        with open(GLOBAL_META_PATH, encoding='utf-8') as f:
+            meta = json.load(f)
+    if model is None:
+        model = load_lstm_model(GLOBAL_MODEL_PATH)
+
+    print(f"🔮 Prevendo {len(meta['series'])} series x {horizon} dias...")
+    matrix = build_series_matrix(min_records=0).reindex(columns=meta['series'], fill_value=0)
+    low, span = np.asarray(meta['low']), np.asarray(meta['span'])
+    lookback = meta['lookback']
+    windows = ((matrix.to_numpy()[-lookback:] - low) / span).T
+    forecast = recursive_forecast(_predict_fn(model, len(low)), windows, horizon) * span[:, None] + low[:, None]
+
+    dates = pd.date_range(matrix.index[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    group, key = zip(*(s.split(':', 1) for s in meta['series']))
+    table = pd.DataFrame({
+        'grupo': np.repeat(group, horizon),
+        'chave': np.repeat(key, horizon),
+        'date': np.tile(dates.strftime('%Y-%m-%d'), len(group)),
+        'predicao': np.round(np.clip(forecast, 0, None).ravel(), 2),
+    })
+    os.makedirs(os.path.dirname(FORECAST_TABLE_PATH), exist_ok=True)
+    table.to_csv(FORECAST_TABLE_PATH, sep=';', index=False)
+    with open(FORECAST_META_PATH, 'w', encoding='utf-8') as f:
+        json.dump({
+            "dataset_version": dataset_version(),
+            "model": os.path.basename(GLOBAL_MODEL_PATH),
+            "last_date": str(matrix.index[-1].date()),
+            "generated_at": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "mae": dict(zip(meta['series'], meta.get('mae', []))),
+        }, f, ensure_ascii=False)
+    print(f"✅ Tabela de previsoes: {FORECAST_TABLE_PATH} ({len(table)} linhas)")
+    return table
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Modelo LSTM global por BR e municipio")
+    parser.add_argument("--train", action="store_true", help="treina o modelo antes de gerar as previsoes")
+    parser.add_argument("--lookback", type=int, default=30)
+    parser.add_argument("--epochs", type=int, default=30)
+    args = parser.parse_args()
+    model = meta = None
+    if args.train:
+        model, meta = train_global(lookback=args.lookback, epochs=args.epochs)
+    forecast_all(model, meta)
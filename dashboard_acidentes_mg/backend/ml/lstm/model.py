@@ -2,15 +2,22 @@
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 
-def create_lstm_model(input_shape):
-    model = Sequential([
-        # Camada LSTM com 50 unidades
-        LSTM(units=50, return_sequences=False, input_shape=input_shape),
-        # Dropout de 20% para evitar overfitting
-        Dropout(0.2),
-        # Camada de saida para regressao (prever 1 valor)
-        Dense(units=1)
-    ])
-    
-    model.compile(optimizer='adam', loss='mean_squared_error')
+def create_lstm_model(input_shape, units=50, n_layers=1, dropout=0.2, dense_units=None, learning_rate=0.001):
+    """LSTM(s) empilhadas + Dense de saida. Os padroes geram o modelo original (1 x 50 unidades)."""
+    from tensorflow.keras.optimizers import Adam
+
+    layers = []
+    for i in range(n_layers):
+        # Camadas LSTM com `units` unidades; so a ultima devolve apenas o ultimo passo
+        kwargs = {"input_shape": input_shape} if i == 0 else {}
+        layers.append(LSTM(units=units, return_sequences=i < n_layers - 1, **kwargs))
+        # Dropout para evitar overfitting
+        layers.append(Dropout(dropout))
+    if dense_units:
+        layers.append(Dense(units=dense_units))
+    # Camada de saida para regressao (prever 1 valor)
+    layers.append(Dense(units=1))
+    model = Sequential(layers)
+
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mean_squared_error')
     return model
@@ -1,55 +1,38 @@
 ﻿# -*- coding: utf-8 -*-
 import os
 import sys
-import numpy as np
-import pandas as pd
-from tensorflow.keras.models import load_model
-from sklearn.metrics import mean_absolute_error, mean_squared_error
 
 # Adiciona a raiz do projeto ao path
 sys.path.append(os.getcwd())
 
-from backend.ml.preprocessing.data import verify_and_load_data, prepare_lstm_data
+from backend.ml.lstm.backtest import run_backtest, save_backtest
 
 def evaluate_metrics():
+    """Metricas do modelo servido pela API, pelo backtest walk-forward (backend/ml/lstm/backtest.py).
+
+    Em vez de um unico corte 80/20 com previsao de 1 passo, avalia varias
+    origens depois do trecho de treino e todos os horizontes ate o fim da
+    serie; o retorno mantem MAE/RMSE do horizonte de 1 dia e traz a tabela
+    completa em `horizontes`.
+    """
     print("--- INICIANDO AVALIACAO ETAPA 4 ---")
-    
-    # 1. Carregar dados e modelo
-    df_daily = verify_and_load_data()
-    if df_daily is None: return
-    
-    # Reutilizamos a funcao de preparacao para obter o scaler e X_test
-    _, X_test, _, y_test, scaler = prepare_lstm_data(df_daily)
-    
-    model_path = 'backend/ml/lstm/model.h5'
-    if not os.path.exists(model_path):
-        print("Erro: Modelo nao encontrado.")
-        return
-    
-    model = load_model(model_path)
-    
-    # 2. Realizar predicoes
-    predictions = model.predict(X_test, verbose=0)
-    
-    # 3. Inverter normalizacao para escala real (numero de acidentes)
-    # O scaler espera 2D, entao ajustamos o shape
-    y_test_real = scaler.inverse_transform(y_test.reshape(-1, 1))
-    predictions_real = scaler.inverse_transform(predictions)
-    
-    # 4. Calcular Metricas
-    mae = mean_absolute_error(y_test_real, predictions_real)
-    rmse = np.sqrt(mean_squared_error(y_test_real, predictions_real))
-    
+    table, info = run_backtest()
+    model = table[info['modelo']]
+
     metrics = {
-        "mae": round(float(mae), 4),
-        "rmse": round(float(rmse), 4)
+        "mae": round(float(model.loc[1, 'mae']), 4),
+        "rmse": round(float(model.loc[1, 'rmse']), 4),
+        "horizontes": model.round(4).reset_index().to_dict(orient='records'),
     }
-    
+
     print("\n--- RESULTADOS ---")
-    print(f"MAE (Erro Medio Absoluto): {metrics['mae']}")
-    print(f"RMSE (Raiz do Erro Quadratico Medio): {metrics['rmse']}")
+    print(f"Origens avaliadas: {info['origens']} ({info['primeira_origem']} a {info['ultima_origem']})")
+    print(f"MAE (Erro Medio Absoluto, 1 dia): {metrics['mae']}")
+    print(f"RMSE (Raiz do Erro Quadratico Medio, 1 dia): {metrics['rmse']}")
+    print(model.to_string(float_format=lambda v: f"{v:.2f}"))
     print("------------------")
-    
+
+    save_backtest(table, info)
     return metrics
 
 if __name__ == '__main__':
@@ -0,0 +1,216 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+# Adiciona a raiz do projeto ao path
+sys.path.append(os.getcwd())
+
+# Runtime de inferencia em NumPy: os pesos dos modelos Keras (LSTM, Dropout,
+# Dense e o Embedding do modelo global) sao exportados uma vez para um .npz
+# ao lado do modelo, e a API roda o forward pass sem importar o TensorFlow.
+# Dropout e a identidade na inferencia, entao nao entra no arquivo.
+PARITY_TOLERANCE = 1e-4  # diferenca maxima aceita contra o Keras, na escala 0-1
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    # sigmoid(x) = (1 + tanh(x/2)) / 2: mesmo valor, sem a exp (bem mais rapida)
+    'sigmoid': lambda x: 0.5 * np.tanh(0.5 * x) + 0.5,
+}
+
+def npz_path(model_path):
+    """Arquivo de pesos exportados de um modelo: mesmo nome, extensao .npz."""
+    return os.path.splitext(model_path)[0] + '.npz'
+
+def _gates_ifoc(weight, units):
+    # Ordem dos gates no Keras: input, forget, cell, output. Reordenados para
+    # input, forget, output, cell: a ativacao recorrente roda uma vez so
+    # sobre os tres primeiros blocos
+    i, f, c, o = (weight[..., k * units:(k + 1) * units] for k in range(4))
+    return np.ascontiguousarray(np.concatenate([i, f, o, c], axis=-1))
+
+def _lstm(x, kernel, recurrent_kernel, bias, return_sequences, activation, recurrent_activation):
+    # Pesos ja na ordem input, forget, output, cell (_gates_ifoc)
+    batch, steps, _ = x.shape
+    units = recurrent_kernel.shape[0]
+    # Projecao da entrada de todos os passos numa unica multiplicacao
+    projected = (x.reshape(batch * steps, -1) @ kernel + bias).reshape(batch, steps, 4 * units)
+    h = np.zeros((batch, units), dtype=np.float32)
+    c = np.zeros((batch, units), dtype=np.float32)
+    outputs = np.empty((batch, steps, units), dtype=np.float32) if return_sequences else None
+    for t in range(steps):
+        z = projected[:, t] + h @ recurrent_kernel
+        gates = recurrent_activation(z[:, :3 * units])
+        i, f, o = gates[:, :units], gates[:, units:2 * units], gates[:, 2 * units:]
+        c = f * c + i * activation(z[:, 3 * units:])
+        h = o * activation(c)
+        if return_sequences:
+            outputs[:, t] = h
+    return outputs if return_sequences else h
+
+class NumpyLSTM:
+    """Forward pass em lote a partir dos pesos exportados por `export_model`.
+
+    Aceita a mesma chamada que o modelo Keras: `model(x, training=False)` com
+    x de shape (n, lookback, 1), ou `model([x, ids])` no modelo global.
+    """
+
+    def __init__(self, layers, arrays, input_shape, scale=None):
+        self.layers = layers
+        self.arrays = dict(arrays)
+        for layer in layers:
+            if layer['type'] == 'lstm':
+                units = self.arrays[layer['weights'][1]].shape[0]
+                for name in layer['weights']:
+                    self.arrays[name] = _gates_ifoc(self.arrays[name], units)
+        self.input_shape = tuple(input_shape)
+        self.scale = scale
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data['spec']))
+            arrays = {name: data[name].astype(np.float32) for name in data.files if name != 'spec'}
+        scale = tuple(spec['scale']) if spec.get('scale') else None
+        return cls(spec['layers'], arrays, spec['input_shape'], scale)
+
+    def __call__(self, inputs, training=False):
+        if isinstance(inputs, (list, tuple)):
+            x, ids = inputs
+        else:
+            x, ids = inputs, None
+        x = np.asarray(x, dtype=np.float32)
+        for layer in self.layers:
+            w = [self.arrays[name] for name in layer['weights']]
+            if layer['type'] == 'embedding':
+                # Vetor da serie repetido em cada passo e concatenado a janela
+                vectors = w[0][np.asarray(ids, dtype=np.int64)]
+                x = np.concatenate([x, np.broadcast_to(vectors[:, None, :], x.shape[:2] + vectors.shape[1:])], axis=-1)
+            elif layer['type'] == 'lstm':
+                x = _lstm(x, *w, layer['return_sequences'],
+                          ACTIVATIONS[layer['activation']], ACTIVATIONS[layer['recurrent_activation']])
+            elif layer['type'] == 'dense':
+                x = ACTIVATIONS[layer['activation']](x @ w[0] + w[1])
+        return x
+
+# =========================
+# EXPORTACAO (requer TensorFlow)
+# =========================
+def _layer_spec(layer, index):
+    kind = type(layer).__name__
+    config = layer.get_config()
+    names = [f"{index}_{name}" for name in ('kernel', 'recurrent_kernel', 'bias')]
+    if kind in ('InputLayer', 'Dropout', 'RepeatVector', 'Concatenate'):
+        # RepeatVector + Concatenate fazem parte do bloco do embedding
+        return None, {}
+    if kind == 'Embedding':
+        return {"type": "embedding", "weights": [f"{index}_embeddings"]}, {f"{index}_embeddings": layer.get_weights()[0]}
+    if kind == 'LSTM':
+        if config['activation'] not in ACTIVATIONS or config['recurrent_activation'] not in ACTIVATIONS:
+            raise ValueError(f"Ativacao nao suportada na camada {layer.name}")
+        if not config['use_bias'] or config.get('go_backwards') or config.get('stateful'):
+            raise ValueError(f"Configuracao de LSTM nao suportada na camada {layer.name}")
+        spec = {key: config[key] for key in ('return_sequences', 'activation', 'recurrent_activation')}
+        return {"type": "lstm", "weights": names, **spec}, dict(zip(names, layer.get_weights()))
+    if kind == 'Dense':
+        if config['activation'] not in ACTIVATIONS or not config['use_bias']:
+            raise ValueError(f"Configuracao de Dense nao suportada na camada {layer.name}")
+        names = [names[0], names[2]]
+        return {"type": "dense", "weights": names, "activation": config['activation']}, dict(zip(names, layer.get_weights()))
+    raise ValueError(f"Camada nao suportada pelo runtime NumPy: {kind} ({layer.name})")
+
+def export_model(model_path, scaler_path=None, out_path=None, check=True, scale=None, source=None):
+    """Grava os pesos de um modelo Keras em .npz (e a escala `scale` ou a do scaler, se houver).
+
+    Com `check`, compara o forward pass NumPy com o Keras antes de gravar e
+    falha se a diferenca passar de PARITY_TOLERANCE. `source` e o nome do
+    modelo registrado no .npz (padrao: o arquivo lido).
+    """
+    from tensorflow.keras.models import load_model
+
+    print(f"📦 Exportando pesos: {model_path}")
+    model = load_model(model_path, compile=False)
+    layers, arrays = [], {}
+    for index, layer in enumerate(model.layers):
+        spec, weights = _layer_spec(layer, index)
+        if spec is not None:
+            layers.append(spec)
+            arrays.update({name: np.asarray(value, dtype=np.float32) for name, value in weights.items()})
+
+    if scale is not None:
+        scale = [float(scale[0]), float(scale[1])]
+    elif scaler_path and os.path.exists(scaler_path):
+        import joblib
+        scaler = joblib.load(scaler_path)
+        scale = [float(scaler.data_min_[0]), float(scaler.data_range_[0]) or 1.0]
+
+    window_shape = model.inputs[0].shape
+    input_shape = [None, int(window_shape[1]), int(window_shape[2])]
+    runtime = NumpyLSTM(layers, arrays, input_shape, tuple(scale) if scale else None)
+    if check:
+        diff = check_parity(model, runtime)
+        print(f"  Paridade com o Keras: diferenca maxima {diff:.2e}")
+        if diff > PARITY_TOLERANCE:
+            raise ValueError(f"Runtime NumPy diverge do Keras ({diff:.2e} > {PARITY_TOLERANCE:.0e})")
+
+    out_path = out_path or npz_path(model_path)
+    spec = {"layers": layers, "input_shape": input_shape, "scale": scale,
+            "source": source or os.path.basename(model_path)}
+    np.savez(out_path, spec=np.array(json.dumps(spec)), **arrays)
+    print(f"✅ Pesos salvos em {out_path}")
+    return out_path
+
+def install_model(staged_path, model_path, scaler_path=None, scale=None):
+    """Exporta o modelo gravado em `staged_path` e o instala em `model_path` junto com o .npz.
+
+    Os dois arquivos ficam prontos ao lado antes da troca, e o .npz (que a API
+    le) e trocado primeiro: ele e mais novo que o modelo, entao a API nunca ve
+    o modelo novo com os pesos antigos nem volta ao Keras no meio da troca.
+    """
+    staged_npz = npz_path(staged_path)
+    try:
+        export_model(staged_path, scaler_path, out_path=staged_npz, scale=scale, source=os.path.basename(model_path))
+    except Exception:
+        for path in (staged_path, staged_npz):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    os.replace(staged_npz, npz_path(model_path))
+    os.replace(staged_path, model_path)
+
+def staging_path(model_path):
+    """Caminho temporario ao lado de `model_path`, com a mesma extensao (o Keras decide o formato por ela)."""
+    base, ext = os.path.splitext(model_path)
+    return f"{base}.tmp{ext}"
+
+def check_parity(model, runtime, n=256, seed=0):
+    """Maior diferenca absoluta entre Keras e NumPy em janelas aleatorias e num lote de 1."""
+    rng = np.random.default_rng(seed)
+    _, lookback, features = runtime.input_shape
+    x = rng.uniform(0, 1, (n, lookback, features)).astype(np.float32)
+    inputs = [x]
+    if len(model.inputs) > 1:
+        embedding = next(layer for layer in runtime.layers if layer['type'] == 'embedding')
+        n_series = runtime.arrays[embedding['weights'][0]].shape[0]
+        inputs.append(rng.integers(0, n_series, n).astype(np.int32))
+    inputs = inputs if len(inputs) > 1 else inputs[0]
+    expected = np.asarray(model(inputs, training=False))
+    got = runtime(inputs)
+    single = [part[:1] for part in inputs] if isinstance(inputs, list) else inputs[:1]
+    diff_single = np.abs(np.asarray(model(single, training=False)) - runtime(single)).max()
+    return float(max(np.abs(expected - got).max(), diff_single))
+
+if __name__ == '__main__':
+    from backend.ml.lstm.service import MODEL_CANDIDATES
+    from backend.ml.lstm.global_model import GLOBAL_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Exporta os modelos LSTM para o runtime NumPy")
+    parser.add_argument("--no-check", action="store_true", help="nao compara com o Keras antes de gravar")
+    args = parser.parse_args()
+    for model_path, scaler_path in MODEL_CANDIDATES + [(GLOBAL_MODEL_PATH, None)]:
+        if os.path.exists(model_path):
+            export_model(model_path, scaler_path, check=not args.no_check)
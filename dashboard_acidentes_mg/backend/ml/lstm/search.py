@@ -0,0 +1,242 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+# Adiciona a raiz do projeto ao path
+sys.path.append(os.getcwd())
+
+from backend.ml.preprocessing.data import verify_and_load_data, dataset_version
+from backend.ml.preprocessing.windows import WindowSet, train_cutoff, minmax_fit
+from backend.ml.lstm.service import BASE_DIR, METRICS_PATH, MODEL_CANDIDATES
+
+# Busca de hiperparametros: cada configuracao (lookback, unidades, camadas,
+# batch, learning rate) e treinada num processo do pool. A serie escalada de
+# cada lookback e preparada uma vez e guardada em disco; os workers so leem
+# esse arquivo e montam as janelas como views (WindowSet), sem reler o CSV.
+# Cada worker usa um numero limitado de threads (TF intra/inter op, OpenMP,
+# BLAS), para que workers x threads caiba nos nucleos da maquina. Como cada
+# lookback tem a sua escala, as configuracoes sao comparadas pelo MAE de
+# validacao na escala real (val_mae x amplitude).
+SEARCH_DIR = os.path.join(BASE_DIR, 'models', 'search')
+CACHE_DIR = os.path.join(SEARCH_DIR, 'cache')
+REGISTRY_PATH = os.path.join(os.path.dirname(METRICS_PATH), 'lstm_search.json')
+PROMOTED_MODEL_PATH, PROMOTED_SCALER_PATH = MODEL_CANDIDATES[0]
+
+GRID = {
+    "lookback": [14, 30, 60],
+    "units": [32, 50, 64],
+    "n_layers": [1, 2],
+    "batch_size": [32, 64],
+    "learning_rate": [0.001],
+}
+VAL_FRAC = 0.1  # ultimos 10% das janelas de treino validam (como no train.py)
+THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+               'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')
+
+def config_id(config):
+    text = json.dumps(config, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:10]
+
+def grid_configs(grid=GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+# =========================
+# CACHE DAS JANELAS POR LOOKBACK
+# =========================
+def cache_path(lookback, version):
+    return os.path.join(CACHE_DIR, f"janelas_L{lookback}_{version}.npz")
+
+def prepare_window_cache(df_daily, lookback, version, train_frac=0.8):
+    """Grava (uma vez por lookback e versao do dataset) a serie escalada e o corte de treino."""
+    path = cache_path(lookback, version)
+    if os.path.exists(path):
+        return path
+    values = df_daily['total_acidentes'].to_numpy(dtype=np.float64)
+    n_train, seen = train_cutoff(len(values), lookback, 1, train_frac)
+    # Escala ajustada so nos dias vistos pelas janelas de treino
+    low, span = minmax_fit(values[:seen])
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, series=((values - low) / span).astype(np.float32), low=low, span=span,
+             n_train=n_train, lookback=lookback)
+    os.replace(tmp, path)
+    return path
+
+def load_window_cache(path):
+    with np.load(path) as data:
+        windows = WindowSet(data['series'], int(data['lookback']))
+        return windows, int(data['n_train']), float(data['low']), float(data['span'])
+
+# =========================
+# WORKERS
+# =========================
+def _init_worker(threads):
+    # As variaveis de THREAD_VARS ja vem do ambiente do pai (run_search): o
+    # numpy e importado com o modulo, antes deste initializer
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def evaluate_config(config, cache_file, epochs, seed=42):
+    """Treina uma configuracao e devolve as metricas (escala 0-1 e real) e o caminho do modelo."""
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from backend.ml.lstm.model import create_lstm_model
+
+    tf.keras.utils.set_random_seed(seed)
+    start = time.perf_counter()
+    windows, n_train, low, span = load_window_cache(cache_file)
+    n_fit = int(n_train * (1 - VAL_FRAC))
+    batch_size = config['batch_size']
+    model = create_lstm_model((windows.lookback, 1), units=config['units'], n_layers=config['n_layers'],
+                              learning_rate=config['learning_rate'])
+    history = model.fit(
+        windows.tf_dataset(batch_size, np.arange(n_fit), shuffle=True, seed=seed),
+        validation_data=windows.tf_dataset(batch_size, np.arange(n_fit, n_train)),
+        epochs=epochs,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)],
+        verbose=0,
+    )
+
+    def errors(first, stop):
+        X, y = windows.X(0, first, stop), windows.y(0, first, stop)
+        pred = np.asarray(model(np.ascontiguousarray(X), training=False)).reshape(-1)
+        return pred - y
+
+    val, test = errors(n_fit, n_train), errors(n_train, None)
+    cid = config_id(config)
+    model_path = os.path.join(SEARCH_DIR, f"lstm_{cid}.keras")
+    model.save(model_path)
+    return {
+        "id": cid,
+        "config": config,
+        "val_mae": float(np.abs(val).mean()),
+        "val_mae_real": round(float(np.abs(val).mean() * span), 4),
+        "mae": float(np.abs(test).mean()),
+        "rmse": float(np.sqrt((test ** 2).mean())),
+        "mae_real": round(float(np.abs(test).mean() * span), 4),
+        "epochs": len(history.history['loss']),
+        "seconds": round(time.perf_counter() - start, 1),
+        "model_path": os.path.relpath(model_path, BASE_DIR),
+        "scale": [low, span],
+    }
+
+# =========================
+# REGISTRO E PROMOCAO
+# =========================
+def load_registry():
+    if not os.path.exists(REGISTRY_PATH):
+        return {"runs": [], "promoted": None}
+    with open(REGISTRY_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_registry(registry):
+    tmp = f"{REGISTRY_PATH}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, REGISTRY_PATH)
+
+def promote(run, version, last_train_date):
+    """Copia o modelo para o caminho servido pela API, com scaler, pesos NumPy e metricas."""
+    import joblib
+    from sklearn.preprocessing import MinMaxScaler
+    from backend.ml.lstm.runtime import install_model, staging_path
+
+    low, span = run['scale']
+    # Modelo e .npz trocados juntos (install_model); o scaler vai depois
+    staged = staging_path(PROMOTED_MODEL_PATH)
+    shutil.copyfile(os.path.join(BASE_DIR, run['model_path']), staged)
+    install_model(staged, PROMOTED_MODEL_PATH, scale=(low, span))
+    # MinMaxScaler equivalente a escala da busca, para quem ainda le o .pkl
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit([[low], [low + span]])
+    tmp = f"{PROMOTED_SCALER_PATH}.tmp"
+    joblib.dump(scaler, tmp)
+    os.replace(tmp, PROMOTED_SCALER_PATH)
+    with open(METRICS_PATH, 'w') as f:
+        json.dump({"mae": run['mae'], "rmse": run['rmse'], "config": run['config'],
+                   "search_id": run['id'], "dataset_version": version, "last_train_date": last_train_date}, f)
+    print(f"🏆 Modelo promovido: {run['id']} {run['config']} (MAE real {run['mae_real']})")
+
+def run_search(configs, epochs=50, workers=None, threads=None):
+    print("--- INICIANDO BUSCA DE HIPERPARAMETROS ---")
+    df_daily = verify_and_load_data()
+    if df_daily is None: return None
+    version = dataset_version()
+    caches = {lb: prepare_window_cache(df_daily, lb, version) for lb in sorted({c['lookback'] for c in configs})}
+    os.makedirs(SEARCH_DIR, exist_ok=True)
+
+    cores = os.cpu_count() or 1
+    workers = workers or min(len(configs), cores)
+    threads = threads or max(1, cores // workers)
+    print(f"Configuracoes: {len(configs)} | Workers: {workers} x {threads} thread(s) | Cache: {len(caches)} lookback(s)")
+
+    registry = load_registry()
+    runs = []
+    # spawn: cada worker comeca limpo com o ambiente do pai, entao os limites
+    # de threads entram no ambiente antes do pool e valem desde o import do
+    # numpy no worker; depois o ambiente do pai e restaurado
+    saved_env = {var: os.environ.get(var) for var in THREAD_VARS + ('TF_CPP_MIN_LOG_LEVEL',)}
+    os.environ.update({var: str(threads) for var in THREAD_VARS})
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = [pool.submit(evaluate_config, c, caches[c['lookback']], epochs) for c in configs]
+            for future in as_completed(futures):
+                run = {**future.result(), "dataset_version": version,
+                       "finished_at": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}
+                runs.append(run)
+                print(f"  {run['id']} {run['config']} -> val_mae real {run['val_mae_real']:.4f} | "
+                      f"mae real {run['mae_real']:.4f} ({run['seconds']}s)")
+    finally:
+        for var, value in saved_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+    # Melhor configuracao pela validacao na escala real; o teste so e reportado
+    best = min(runs, key=lambda r: r['val_mae_real'])
+    registry["runs"].extend(runs)
+    current = registry.get("promoted")
+    # Registros anteriores ao val_mae_real nao sao comparaveis: a busca atual promove
+    if (current is None or current.get("dataset_version") != version or current.get('val_mae_real') is None
+            or best['val_mae_real'] < current['val_mae_real']):
+        _, seen = train_cutoff(len(df_daily), best['config']['lookback'])
+        promote(best, version, str(df_daily.index[seen - 1].date()))
+        registry["promoted"] = {k: best[k] for k in ('id', 'config', 'val_mae', 'val_mae_real', 'mae', 'rmse',
+                                                      'mae_real', 'dataset_version')}
+    else:
+        print(f"Modelo atual ({current['id']}) continua melhor na validacao: {current['val_mae_real']:.4f}")
+    save_registry(registry)
+    print(f"✅ Registro salvo em {REGISTRY_PATH}")
+    return registry
+
+def _int_list(text):
+    return [int(v) for v in text.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Busca de hiperparametros do LSTM em paralelo")
+    parser.add_argument("--lookbacks", type=_int_list, default=GRID['lookback'])
+    parser.add_argument("--units", type=_int_list, default=GRID['units'])
+    parser.add_argument("--layers", type=_int_list, default=GRID['n_layers'])
+    parser.add_argument("--batch-sizes", type=_int_list, default=GRID['batch_size'])
+    parser.add_argument("--learning-rates", type=lambda t: [float(v) for v in t.split(',')], default=GRID['learning_rate'])
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None, help="threads por worker (padrao: nucleos / workers)")
+    args = parser.parse_args()
+    grid = {"lookback": args.lookbacks, "units": args.units, "n_layers": args.layers,
+            "batch_size": args.batch_sizes, "learning_rate": args.learning_rates}
+    run_search(grid_configs(grid), epochs=args.epochs, workers=args.workers, threads=args.threads)
@@ -0,0 +1,212 @@
+﻿# -*- coding: utf-8 -*-
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+from backend.ml.preprocessing.data import daily_counts, dataset_version
+from backend.ml.lstm.runtime import NumpyLSTM, npz_path
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Modelos em ordem de preferencia: (modelo, scaler salvo no treino)
+MODEL_CANDIDATES = [
+    (os.path.join(BASE_DIR, 'models', 'tensorflow', 'lstm_acidentes.keras'),
+     os.path.join(BASE_DIR, 'models', 'tensorflow', 'lstm_scaler.pkl')),
+    # model.h5 (train.py) leva a escala do scaler de treino no .npz exportado
+    (os.path.join(BASE_DIR, 'backend', 'ml', 'lstm', 'model.h5'), None),
+]
+METRICS_PATH = os.path.join(BASE_DIR, 'models', 'predictions', 'lstm_metrics.json')
+# Tabela pre-calculada pelo modelo global (backend/ml/lstm/global_model.py)
+FORECAST_TABLE_PATH = os.path.join(BASE_DIR, 'models', 'predictions', 'lstm_forecasts.csv')
+FORECAST_META_PATH = os.path.join(BASE_DIR, 'models', 'predictions', 'lstm_forecasts.json')
+HORIZON = 365
+
+# Modelo e scaler carregados uma vez (recarregados se o arquivo mudar) e
+# previsao base em cache por (serie, versao do dataset). O `factor` do
+# cenario so multiplica a previsao em cache.
+_MODEL_LOCK = threading.Lock()
+_MODEL = {"key": None, "forecaster": None}
+_TABLE_LOCK = threading.Lock()
+_TABLE = {"key": None, "meta": None, "series": None}
+_FORECASTS_LOCK = threading.Lock()
+_FORECASTS = {}
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+class Forecaster:
+    """Modelo (NumpyLSTM ou Keras) + escala MinMax (min, amplitude) da serie usada no treino."""
+
+    def __init__(self, model, lookback, scale, source):
+        self.model = model
+        self.lookback = lookback
+        self.scale = scale
+        self.source = source
+
+    def predict_scaled(self, windows):
+        # __call__ em vez de model.predict: sem o overhead de montar um tf.data por chamada
+        return np.asarray(self.model(windows[..., None], training=False)).reshape(len(windows))
+
+def _runtime_path(model_path):
+    """Pesos exportados (backend/ml/lstm/runtime.py), se existirem e nao forem mais velhos que o modelo."""
+    path = npz_path(model_path)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(model_path) and os.path.getmtime(path) < os.path.getmtime(model_path):
+        return None
+    return path
+
+def load_lstm_model(model_path):
+    runtime_path = _runtime_path(model_path)
+    if runtime_path:
+        print(f"🧠 Carregando modelo LSTM (NumPy): {runtime_path}")
+        return NumpyLSTM.load(runtime_path)
+    try:
+        # Sem pesos exportados: TensorFlow so e importado aqui, no primeiro uso
+        from tensorflow.keras.models import load_model
+    except ImportError as e:
+        raise ModelUnavailable("TensorFlow nao esta instalado e os pesos nao foram exportados (runtime.py)") from e
+    print(f"🧠 Carregando modelo LSTM: {model_path}")
+    return load_model(model_path, compile=False)
+
+def load_forecaster():
+    for model_path, scaler_path in MODEL_CANDIDATES:
+        runtime_path = _runtime_path(model_path)
+        if runtime_path is None and not os.path.exists(model_path):
+            continue
+        key = (model_path, os.path.getmtime(runtime_path or model_path))
+        with _MODEL_LOCK:
+            if _MODEL["key"] != key:
+                model = load_lstm_model(model_path)
+                if getattr(model, 'scale', None):
+                    scale = model.scale
+                elif scaler_path and os.path.exists(scaler_path):
+                    import joblib
+                    scaler = joblib.load(scaler_path)
+                    scale = (float(scaler.data_min_[0]), float(scaler.data_range_[0]) or 1.0)
+                else:
+                    # Reajustar a escala na serie atual mudaria a entrada que o modelo viu no treino
+                    raise ModelUnavailable(f"Escala de treino desconhecida para {os.path.basename(model_path)}; "
+                                           "reexporte os pesos com a escala do scaler (runtime.py)")
+                _MODEL["forecaster"] = Forecaster(model, int(model.input_shape[1]), scale, os.path.basename(model_path))
+                _MODEL["key"] = key
+            return _MODEL["forecaster"]
+    raise ModelUnavailable("Nenhum modelo LSTM treinado encontrado")
+
+def recursive_forecast(predict_scaled, windows, horizon):
+    """Previsao recursiva de varios passos para um lote de series de uma vez.
+
+    `windows` tem shape (n_series, lookback) ja na escala do modelo; cada passo
+    roda um unico forward pass com todas as series e a previsao entra no fim
+    da janela do passo seguinte. Devolve (n_series, horizon).
+    """
+    windows = np.asarray(windows, dtype=np.float32)
+    n_series, lookback = windows.shape
+    buffer = np.empty((n_series, lookback + horizon), dtype=np.float32)
+    buffer[:, :lookback] = windows
+    for step in range(horizon):
+        buffer[:, lookback + step] = predict_scaled(buffer[:, step:step + lookback])
+    return buffer[:, lookback:]
+
+def _forecast_table():
+    """Tabela de previsoes do modelo global, relida so quando os arquivos mudam."""
+    if not (os.path.exists(FORECAST_TABLE_PATH) and os.path.exists(FORECAST_META_PATH)):
+        return None
+    key = (os.path.getmtime(FORECAST_TABLE_PATH), os.path.getmtime(FORECAST_META_PATH))
+    with _TABLE_LOCK:
+        if _TABLE["key"] != key:
+            with open(FORECAST_META_PATH, encoding='utf-8') as f:
+                meta = json.load(f)
+            table = pd.read_csv(FORECAST_TABLE_PATH, sep=';', dtype={'grupo': str, 'chave': str, 'date': str})
+            _TABLE["series"] = {
+                chave: (pd.DatetimeIndex(part['date']), part['predicao'].to_numpy(dtype=np.float64))
+                for chave, part in table.groupby(['grupo', 'chave'], sort=False)
+            }
+            _TABLE["meta"], _TABLE["key"] = meta, key
+        return _TABLE
+
+def _table_forecast(group, key, version):
+    table = _forecast_table()
+    if table is None or table["meta"].get("dataset_version") != version:
+        raise ModelUnavailable("Previsoes por BR/municipio nao geradas para o dataset atual (global_model.py)")
+    entry = table["series"].get((group, key))
+    if entry is None:
+        return None
+    return {
+        "dates": entry[0],
+        "values": entry[1],
+        "last_date": pd.Timestamp(table["meta"]["last_date"]),
+        "model": table["meta"].get("model"),
+        "mae": table["meta"].get("mae", {}).get(f"{group}:{key}"),
+    }
+
+def base_forecast(group=None, key=None):
+    """Previsao de HORIZON dias (escala real) para uma serie ('br' ou 'municipio'), ou o estado todo.
+
+    BR e municipio vem da tabela do modelo global, que precisa ter sido gerada
+    para o dataset atual (ModelUnavailable se nao foi); o estado todo roda o
+    modelo estadual, que so conhece a escala da serie estadual.
+    """
+    version = dataset_version()
+    cache_key = (group, key, version)
+    with _FORECASTS_LOCK:
+        if cache_key in _FORECASTS:
+            return _FORECASTS[cache_key]
+    result = _table_forecast(group, key, version) if group else _model_forecast()
+    if result is None:
+        return None
+    with _FORECASTS_LOCK:
+        # Versoes antigas do dataset nao serao mais pedidas
+        for old in [k for k in _FORECASTS if k[2] != version]:
+            del _FORECASTS[old]
+        _FORECASTS[cache_key] = result
+    return result
+
+def _model_forecast():
+    forecaster = load_forecaster()
+    series = daily_counts()['total_acidentes']
+    if len(series) < forecaster.lookback:
+        return None
+
+    low, span = forecaster.scale
+    window = (series.to_numpy()[-forecaster.lookback:] - low) / span
+    forecast = recursive_forecast(forecaster.predict_scaled, window[None, :], HORIZON)[0] * span + low
+    return {
+        "dates": pd.date_range(series.index[-1] + pd.Timedelta(days=1), periods=HORIZON, freq='D'),
+        "values": np.clip(forecast.astype(np.float64), 0, None),
+        "last_date": series.index[-1],
+        "model": forecaster.source,
+        "mae": _real_mae(span),
+    }
+
+def _real_mae(span):
+    # O MAE salvo no treino esta na escala 0-1 do MinMax: na escala real e MAE * amplitude
+    if not os.path.exists(METRICS_PATH): return None
+    with open(METRICS_PATH) as f:
+        mae = json.load(f).get('mae')
+    return round(float(mae) * span, 2) if mae is not None else None
+
+def predict(br=None, municipio=None, factor=1.0):
+    """Resposta de /api/predict/lstm: previsao base em cache x fator do cenario."""
+    if br:
+        base = base_forecast('br', br)
+    elif municipio:
+        base = base_forecast('municipio', municipio)
+    else:
+        base = base_forecast()
+    if base is None:
+        return None
+    values = np.round(base["values"] * factor, 2)
+    mean = float(values.mean())
+    return {
+        "historico": [],
+        "previsao": [{"date": d, "predicao": v} for d, v in zip(base["dates"].strftime('%Y-%m-%d'), values.tolist())],
+        "metrics": {
+            "mae": base["mae"],
+            "risk_level": "CRÍTICO" if mean > 30 else "ESTÁVEL",
+            "risk_color": "red" if factor > 1.2 else "green",
+            "last_date": str(base["last_date"].date()),
+            "model": base["model"],
+        },
+    }
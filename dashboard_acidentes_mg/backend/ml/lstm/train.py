@@ -1,13 +1,15 @@
 ﻿# -*- coding: utf-8 -*-
 import os
 import sys
+import numpy as np
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
 
 # Adiciona a raiz do projeto ao path
 sys.path.append(os.getcwd())
 
-from backend.ml.preprocessing.data import verify_and_load_data, prepare_lstm_data
+from backend.ml.preprocessing.data import verify_and_load_data, prepare_lstm_windows
 from backend.ml.lstm.model import create_lstm_model
+from backend.ml.lstm.runtime import export_model
 
 def train_optimized_model():
     print("--- INICIANDO TREINAMENTO OTIMIZADO ---")
@@ -15,8 +17,14 @@ def train_optimized_model():
     df_daily = verify_and_load_data()
     if df_daily is None: return
     
-    X_train, X_test, y_train, y_test, scaler = prepare_lstm_data(df_daily)
-    model = create_lstm_model((X_train.shape[1], 1))
+    windows, n_train, scaler = prepare_lstm_windows(df_daily)
+    model = create_lstm_model((windows.lookback, 1))
+
+    # Lotes montados sob demanda a partir das views (WindowSet), sem materializar
+    # todas as janelas; os ultimos 10% do treino validam, como validation_split=0.1
+    n_fit = int(n_train * 0.9)
+    train_data = windows.tf_dataset(batch_size=32, indices=np.arange(n_fit), shuffle=True)
+    val_data = windows.tf_dataset(batch_size=32, indices=np.arange(n_fit, n_train))
     
     # Configura os Callbacks
     callbacks = [
@@ -28,16 +36,17 @@ def train_optimized_model():
     
     print("Treinando com EarlyStopping e Checkpoint...")
     model.fit(
-        X_train, y_train,
+        train_data,
         epochs=50, # Aumentamos o limite, o EarlyStopping cuidara do resto
-        batch_size=32,
-        validation_split=0.1,
+        validation_data=val_data,
         callbacks=callbacks,
         verbose=1
     )
     
     # Salva tambem no formato legado se necessario para sua rota atual
     model.save('backend/ml/lstm/model.h5')
+    # Pesos para a API servir sem TensorFlow, com a escala do scaler de treino
+    export_model('backend/ml/lstm/model.h5', scale=(scaler.data_min_[0], scaler.data_range_[0] or 1.0))
     print("✅ Treinamento concluido com sucesso!")
 
 if __name__ == '__main__':
@@ -2,47 +2,93 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.preprocessing import MinMaxScaler
+import hashlib
+import threading
+from processors.utils import ler_csv
+from processors.km_index import normalizar_br
+from backend.ml.preprocessing.windows import WindowSet, train_cutoff
 
-def verify_and_load_data():
-    candidates = ["acidentes_mg_dashboard_master.csv", "../Uploads/acidentes_mg_dashboard_master.csv"]
-    path = next((p for p in candidates if os.path.exists(p)), None)
+CSV_CANDIDATES = ["acidentes_mg_dashboard_master.csv", "../Uploads/acidentes_mg_dashboard_master.csv"]
+DATE_COLUMNS = ['data_inversa_x', 'data_inversa']
+GROUP_COLUMNS = {'br': ['br_x', 'br'], 'municipio': ['municipio_x', 'municipio']}
+
+# Registros do CSV (data, br, municipio) em cache por versao do arquivo: a
+# API e os scripts de treino montam as series diarias daqui sem reler o CSV.
+_EVENTS_LOCK = threading.Lock()
+_EVENTS = {"version": None, "frame": None}
+
+def find_dataset():
+    return next((p for p in CSV_CANDIDATES if os.path.exists(p)), None)
+
+def dataset_version(path=None):
+    """Identificador do CSV (caminho, mtime e tamanho); muda quando o arquivo e trocado."""
+    path = path or find_dataset()
     if not path: return None
-    
-    df = pd.read_csv(path, sep=None, engine='python', encoding='latin1', on_bad_lines='skip')
-    if 'data_inversa_x' in df.columns:
-        df = df.rename(columns={'data_inversa_x': 'data_inversa'})
-    
-    df['data_inversa'] = pd.to_datetime(df['data_inversa'], errors='coerce')
-    df = df.dropna(subset=['data_inversa'])
-    
-    df_daily = df.groupby('data_inversa').size().reset_index(name='total_acidentes')
-    df_daily = df_daily.set_index('data_inversa').sort_index()
-    # Garantir continuidade diaria
-    df_daily = df_daily.asfreq('D').fillna(0)
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}".encode()).hexdigest()[:12]
+
+def _first_column(df, options):
+    col = next((c for c in options if c in df.columns), None)
+    return df[col] if col else pd.Series(np.nan, index=df.index)
+
+def load_events():
+    """Uma linha por registro do CSV com data, br e municipio (so as colunas usadas no ML)."""
+    path = find_dataset()
+    if not path: return None
+    version = dataset_version(path)
+    with _EVENTS_LOCK:
+        if _EVENTS["version"] != version:
+            wanted = set(DATE_COLUMNS) | {c for cols in GROUP_COLUMNS.values() for c in cols}
+            df = ler_csv(path, encoding='latin1', on_bad_lines='skip', usecols=lambda c: c in wanted)
+            events = pd.DataFrame({'data_inversa': pd.to_datetime(_first_column(df, DATE_COLUMNS), errors='coerce')})
+            codes, values = pd.factorize(_first_column(df, GROUP_COLUMNS['br']))
+            events['br'] = np.array([normalizar_br(v) for v in values] + [''], dtype=object)[codes]
+            events['municipio'] = _first_column(df, GROUP_COLUMNS['municipio']).astype(str).str.strip()
+            _EVENTS["frame"] = events.dropna(subset=['data_inversa']).reset_index(drop=True)
+            _EVENTS["version"] = version
+        return _EVENTS["frame"]
+
+def daily_counts(group=None):
+    """Registros por dia em dias continuos: uma coluna por valor de `group` ('br' ou
+    'municipio'), ou so 'total_acidentes' sem grupo. Todas as series cobrem o mesmo
+    intervalo de datas do dataset."""
+    events = load_events()
+    if events is None: return None
+    days = pd.date_range(events['data_inversa'].min(), events['data_inversa'].max(), freq='D', name='data_inversa')
+    if group is None:
+        counts = events.groupby('data_inversa').size().rename('total_acidentes').to_frame()
+    else:
+        valid = events[~events[group].isin(['', 'nan', 'None'])]
+        counts = valid.groupby(['data_inversa', group]).size().unstack(fill_value=0)
+    return counts.reindex(days, fill_value=0).astype(np.float64)
+
+def verify_and_load_data():
+    df_daily = daily_counts()
+    if df_daily is None: return None
+    # Garantir continuidade diaria (daily_counts ja devolve todos os dias)
     return df_daily
 
-def prepare_lstm_data(df_daily, lookback=30):
-    # 1. Normalizacao
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(df_daily[['total_acidentes']].values)
-    
-    # 2. Criacao de janelas de sequencia
-    X, y = [], []
-    for i in range(lookback, len(scaled_data)):
-        X.append(scaled_data[i-lookback:i, 0])
-        y.append(scaled_data[i, 0])
-        
-    X, y = np.array(X), np.array(y)
-    
-    # Reshape para [samples, time steps, features]
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
-    
-    # 3. Separacao em treino e teste (80/20)
-    train_size = int(len(X) * 0.8)
-    X_train, X_test = X[:train_size], X[train_size:]
-    y_train, y_test = y[:train_size], y[train_size:]
-    
+def prepare_lstm_windows(df_daily, lookback=30, horizon=1, train_frac=0.8):
+    """Serie escalada em janelas (WindowSet), nº de janelas de treino e o scaler."""
+    # sklearn so e importado aqui, nao ao importar o modulo (usado pela API)
+    from sklearn.preprocessing import MinMaxScaler
+
+    values = df_daily[['total_acidentes']].values
+    # 1. Normalizacao ajustada so nos dias vistos pelas janelas de treino
+    n_train, seen = train_cutoff(len(values), lookback, horizon, train_frac)
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit(values[:seen])
+
+    # 2. Janelas de sequencia como views sobre a serie escalada
+    windows = WindowSet(scaler.transform(values)[:, 0], lookback, horizon)
+    return windows, n_train, scaler
+
+def prepare_lstm_data(df_daily, lookback=30, horizon=1, train_frac=0.8):
+    windows, n_train, scaler = prepare_lstm_windows(df_daily, lookback, horizon, train_frac)
+
+    # 3. Separacao temporal em treino e teste (80/20); X ja vem como [samples, time steps, features]
+    X_train, X_test = windows.X(0, 0, n_train), windows.X(0, n_train)
+    y_train, y_test = windows.y(0, 0, n_train), windows.y(0, n_train)
+
     return X_train, X_test, y_train, y_test, scaler
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+﻿# -*- coding: utf-8 -*-
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Janelas (lookback -> horizon) como views sobre a serie ja escalada: a
+# serie e guardada uma vez e X/y sao apenas visoes com strides sobre ela, sem
+# copiar cada janela. Copias so acontecem por lote, ao montar um batch.
+
+def train_cutoff(n_steps, lookback, horizon=1, train_frac=0.8):
+    """(janelas de treino, pontos da serie vistos por elas) para o corte temporal.
+
+    O scaler deve ser ajustado so nesses primeiros pontos (entradas e alvos
+    das janelas de treino), para nao vazar informacao do periodo de teste.
+    """
+    n_windows = n_steps - lookback - horizon + 1
+    n_train = int(n_windows * train_frac)
+    return n_train, n_train + lookback + horizon - 1
+
+def minmax_fit(values):
+    """(min, amplitude) por coluna, como o MinMaxScaler(0, 1)."""
+    values = np.asarray(values, dtype=np.float64)
+    low = values.min(axis=0)
+    span = values.max(axis=0) - low
+    return low, np.where(span == 0, 1.0, span)
+
+class WindowSet:
+    """Janelas de uma ou mais series alinhadas no tempo.
+
+    `series` tem shape (n_passos,) ou (n_passos, n_series), ja escalada. As
+    janelas da serie s comecam em t = 0 .. n_windows - 1; X e o trecho
+    [t, t + lookback) e y o trecho [t + lookback, t + lookback + horizon).
+    """
+
+    def __init__(self, series, lookback, horizon=1):
+        values = np.asarray(series, dtype=np.float32)
+        if values.ndim == 1:
+            values = values[:, None]
+        # (n_series, n_passos) contiguo: a unica copia feita aqui
+        self.values = np.ascontiguousarray(values.T)
+        self.lookback = lookback
+        self.horizon = horizon
+        self.n_series = self.values.shape[0]
+        self.n_windows = self.values.shape[1] - lookback - horizon + 1
+        if self.n_windows <= 0:
+            raise ValueError(f"Serie curta demais para lookback={lookback} e horizon={horizon}")
+        # (n_series, n_windows, lookback + horizon), view sobre self.values
+        self.windows = sliding_window_view(self.values, lookback + horizon, axis=1)
+
+    def __len__(self):
+        return self.n_series * self.n_windows
+
+    def X(self, series=0, start=0, stop=None):
+        """Entradas (janelas, lookback, 1) de uma serie, sem copia."""
+        return self.windows[series, start:stop, :self.lookback][..., None]
+
+    def y(self, series=0, start=0, stop=None):
+        """Alvos (janelas,) com horizon=1, ou (janelas, horizon); sem copia."""
+        target = self.windows[series, start:stop, self.lookback:]
+        return target[:, 0] if self.horizon == 1 else target
+
+    def split(self, train_frac=0.8):
+        """Indices globais (series * n_windows + t) de treino e teste pelo corte temporal."""
+        n_train, _ = train_cutoff(self.values.shape[1], self.lookback, self.horizon, train_frac)
+        t = np.arange(self.n_windows)
+        offsets = np.arange(self.n_series)[:, None] * self.n_windows
+        return (offsets + t[:n_train]).ravel(), (offsets + t[n_train:]).ravel()
+
+    def gather(self, indices):
+        """Lote (X, y, ids da serie) para indices globais; copia so o lote."""
+        series, start = np.divmod(np.asarray(indices), self.n_windows)
+        block = self.windows[series, start]
+        X = block[:, :self.lookback, None]
+        y = block[:, self.lookback:]
+        return X, (y[:, 0] if self.horizon == 1 else y), series.astype(np.int32)
+
+    def batches(self, batch_size=32, indices=None, shuffle=False, seed=None, with_ids=False):
+        """Gerador de lotes: (X, y) ou ((X, ids), y) com with_ids."""
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        if shuffle:
+            indices = np.random.default_rng(seed).permutation(indices)
+        for start in range(0, len(indices), batch_size):
+            X, y, ids = self.gather(indices[start:start + batch_size])
+            yield ((X, ids), y) if with_ids else (X, y)
+
+    def tf_dataset(self, batch_size=32, indices=None, shuffle=False, seed=None, with_ids=False):
+        """tf.data.Dataset em streaming sobre `batches` (um gerador novo por epoca)."""
+        import tensorflow as tf
+        x_spec = tf.TensorSpec((None, self.lookback, 1), tf.float32)
+        y_spec = tf.TensorSpec((None,) if self.horizon == 1 else (None, self.horizon), tf.float32)
+        if with_ids:
+            x_spec = (x_spec, tf.TensorSpec((None,), tf.int32))
+        dataset = tf.data.Dataset.from_generator(
+            lambda: self.batches(batch_size, indices, shuffle, seed, with_ids),
+            output_signature=(x_spec, y_spec),
+        )
+        return dataset.prefetch(tf.data.AUTOTUNE)
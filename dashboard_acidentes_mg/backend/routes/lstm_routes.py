@@ -1,44 +1,22 @@
 ﻿# -*- coding: utf-8 -*-
 from fastapi import APIRouter
 from typing import Optional
-import numpy as np
-import pandas as pd
-from datetime import timedelta
-import random
-from backend.ml.preprocessing.data import verify_and_load_data
+from processors.km_index import normalizar_br
+from processors.response_cache import RespostaJSON
 
 router = APIRouter()
 
 @router.get("/api/predict/lstm")
-async def get_lstm_prediction(br: Optional[str] = None, factor: float = 1.0):
-    df_daily = verify_and_load_data()
-    res = {"historico": [], "previsao": [], "metrics": {"mae": 5.07, "risk_level": "ESTÁVEL"}}
-    
-    if df_daily is not None:
-        avg_acc = float(df_daily['total_acidentes'].mean())
-        
-        # Gerar datas para todo o ano de 2026
-        future_dates = pd.date_range(start='2026-01-01', end='2026-12-31', freq='D')
-        
-        previsoes = []
-        for d in future_dates:
-            weekday = d.weekday()
-            # Ajuste de sazonalidade: picos no fim de semana
-            fator_sazonal = 1.4 if weekday >= 4 else 0.7
-            ruido = random.uniform(0.9, 1.1)
-            
-            valor_dia = avg_acc * factor * fator_sazonal * ruido
-            previsoes.append({
-                "date": str(d.date()),
-                "predicao": round(valor_dia, 2)
-            })
-            
-        res["metrics"] = {
-            "mae": 5.07, 
-            "risk_level": "CRÍTICO" if (avg_acc * factor) > 30 else "ESTÁVEL",
-            "risk_color": "red" if factor > 1.2 else "green",
-            "last_date": "2025-12-31"
-        }
-        res["previsao"] = previsoes
-        
+def get_lstm_prediction(br: Optional[str] = None, municipio: Optional[str] = None, factor: float = 1.0):
+    # Import tardio: a pilha de ML so e carregada no primeiro uso da rota,
+    # nao no startup do servidor
+    from backend.ml.lstm.service import predict, ModelUnavailable
+    br = normalizar_br(br) if br else None
+    try:
+        res = predict(br=br, municipio=municipio.strip() if municipio else None, factor=factor)
+    except ModelUnavailable as e:
+        return RespostaJSON({"error": str(e), "historico": [], "previsao": []}, status_code=503)
+    if res is None:
+        serie = f"BR-{br}" if br else municipio
+        return RespostaJSON({"error": f"Sem historico suficiente para {serie}", "historico": [], "previsao": []}, status_code=404)
     return res
@@ -0,0 +1,142 @@
+"""Compara o caminho antigo (apply/iterrows) com o núcleo vetorizado.
+
+Uso (a partir de dashboard_acidentes_mg/):
+    python3 benchmarks/bench_aggregations.py [n_linhas]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processors.utils import clean_string, calculate_severity_index, get_month_year
+from processors.causas_processor import process_causas
+from processors.evolucao_processor import process_evolucao_mensal
+from processors.distribuicoes_processor import process_distribuicoes
+from processors.rankings_processor import process_rankings
+from processors.areas_criticas_processor import process_areas_criticas
+
+
+def gerar_dados(n, seed=0):
+    rng = np.random.default_rng(seed)
+    datas = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n), unit='D')
+    df = pd.DataFrame({
+        'id': np.arange(n),
+        'data_inversa_x': datas,
+        'municipio_x': rng.choice([f' MUNICIPIO {i} ' for i in range(850)], n),
+        'br_x': rng.choice([40.0, 116.0, 262.0, 365.0, 381.0, 251.0, 50.0, 153.0], n),
+        'causa_acidente_x': rng.choice([f'Causa {i}' for i in range(70)] + [None], n),
+        'tipo_acidente_x': rng.choice([f'Tipo {i}' for i in range(16)], n),
+        'fase_dia_x': rng.choice(['Pleno dia', 'Plena Noite', 'Anoitecer', 'Amanhecer'], n),
+        'condicao_metereologica_x': rng.choice(['Céu Claro', 'Chuva', 'Nublado', 'Sol', 'Garoa/Chuvisco'], n),
+        'mortos_x': rng.poisson(0.08, n),
+        'feridos_graves_x': rng.poisson(0.3, n),
+        'feridos_leves_x': rng.poisson(0.9, n),
+    })
+    df['feridos'] = df['feridos_graves_x'] + df['feridos_leves_x']
+    df['ano'] = df['data_inversa_x'].dt.year.astype('Int64').astype(str)
+    df['mes'] = df['data_inversa_x'].dt.month.astype('Int64').astype(str).str.zfill(2)
+    return df
+
+
+# =========================
+# CAMINHO ANTIGO (referência)
+# =========================
+def causas_antigo(df):
+    df = df.copy()
+    df['causa_limpa'] = df['causa_acidente_x'].apply(clean_string)
+    causas = df[df['causa_limpa'].notna()].groupby('causa_limpa').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos': 'sum'}).reset_index()
+    causas.columns = ['causa', 'total_acidentes', 'total_mortos', 'total_feridos']
+    causas = causas.sort_values('total_acidentes', ascending=False).head(10)
+    total_geral = causas['total_acidentes'].sum()
+    return [{"causa": r['causa'], "total_acidentes": int(r['total_acidentes']), "percentual": round((r['total_acidentes']/total_geral)*100, 2)} for _, r in causas.iterrows()]
+
+
+def evolucao_antigo(df):
+    df = df.copy()
+    df['ano_mes'] = df['data_inversa_x'].apply(get_month_year)
+    evolucao = df.groupby('ano_mes').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos': 'sum'}).reset_index()
+    evolucao.columns = ['mes', 'total_acidentes', 'total_mortos', 'total_feridos']
+    return [{"mes": r['mes'], "total_acidentes": int(r['total_acidentes'])} for _, r in evolucao.sort_values('mes').iterrows()]
+
+
+def distribuicoes_antigo(df):
+    saida = {}
+    for coluna in ['tipo_acidente_x', 'fase_dia_x', 'condicao_metereologica_x']:
+        df_temp = df.copy()
+        df_temp['valor_limpo'] = df_temp[coluna].apply(clean_string)
+        dist = df_temp[df_temp['valor_limpo'].notna()].groupby('valor_limpo').agg({'id': 'nunique'}).reset_index()
+        dist.columns = ['categoria', 'total']
+        total_geral = dist['total'].sum()
+        saida[coluna] = [{"name": str(r['categoria']), "value": int(r['total']), "percentual": round((r['total']/total_geral)*100, 2)}
+                         for _, r in dist.sort_values('total', ascending=False).iterrows()]
+    return saida
+
+
+def rankings_antigo(df):
+    saida = {}
+    for col in ['municipio_x', 'br_x']:
+        df_temp = df.copy()
+        df_temp['limpo'] = df_temp[col].apply(clean_string)
+        rank = df_temp[df_temp['limpo'].notna()].groupby('limpo').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos': 'sum'}).reset_index()
+        rank = rank.sort_values('id', ascending=False).head(10)
+        saida[col] = [{"posicao": i+1, **r.to_dict()} for i, r in rank.reset_index(drop=True).iterrows()]
+    return saida
+
+
+def areas_criticas_antigo(df):
+    df = df.copy()
+    df['municipio_limpo'] = df['municipio_x'].apply(clean_string)
+    mun = df.groupby('municipio_limpo').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos_graves_x': 'sum', 'feridos_leves_x': 'sum'}).reset_index()
+    mun.columns = ['municipio', 'total_acidentes', 'mortos', 'feridos_graves', 'feridos_leves']
+    mun['indice_gravidade'] = mun.apply(lambda r: calculate_severity_index(r['mortos'], r['feridos_graves'], r['feridos_leves']), axis=1)
+    df['br_limpa'] = df['br_x'].apply(clean_string)
+    brs = df.groupby('br_limpa').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos': 'sum'}).reset_index()
+    brs.columns = ['br', 'total_acidentes', 'mortos', 'feridos']
+    brs['taxa_mortalidade'] = brs.apply(lambda r: round((r['mortos']/(r['mortos']+r['feridos'])*100), 2) if (r['mortos']+r['feridos']) > 0 else 0, axis=1)
+    return mun, brs
+
+
+def cronometrar(func, *args, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"🧪 Gerando {n:,} linhas sintéticas...")
+    df = gerar_dados(n)
+
+    casos = [
+        ("causas", causas_antigo, lambda d: process_causas(df_input=d, save=False)),
+        ("evolucao", evolucao_antigo, lambda d: process_evolucao_mensal(df_input=d, save=False)),
+        ("distribuicoes", distribuicoes_antigo, lambda d: process_distribuicoes(df_input=d, save=False)),
+        ("rankings", rankings_antigo, lambda d: process_rankings(df_input=d, save=False)),
+        ("areas_criticas", areas_criticas_antigo, lambda d: process_areas_criticas(df_input=d, save=False)),
+    ]
+    linhas = []
+    stdout = sys.stdout
+    for nome, antigo, novo in casos:
+        sys.stdout = open(os.devnull, 'w')  # os processadores imprimem o progresso
+        try:
+            t_antigo = cronometrar(antigo, df, repeticoes=1)
+            t_novo = cronometrar(novo, df)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        linhas.append((nome, t_antigo, t_novo))
+
+    print(f"\n{'processador':<16}{'antigo (s)':>12}{'vetorizado (s)':>16}{'speedup':>10}")
+    for nome, t_antigo, t_novo in linhas:
+        print(f"{nome:<16}{t_antigo:>12.3f}{t_novo:>16.3f}{t_antigo / t_novo:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
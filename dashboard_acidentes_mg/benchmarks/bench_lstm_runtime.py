@@ -0,0 +1,59 @@
+"""Compara a previsão recursiva de 365 dias no runtime NumPy (pesos .npz) com o
+modelo Keras, para 1 série e para um lote de séries, e mede a memória do
+processo. Sem TensorFlow instalado, mede só o runtime NumPy.
+
+Uso (a partir de dashboard_acidentes_mg/, depois de exportar os pesos com
+`python backend/ml/lstm/runtime.py`):
+    python3 benchmarks/bench_lstm_runtime.py [n_series]
+"""
+import os
+import sys
+import time
+import resource
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ml.lstm.runtime import NumpyLSTM, npz_path
+from backend.ml.lstm.service import MODEL_CANDIDATES, recursive_forecast, HORIZON
+
+
+def previsao(modelo, janelas):
+    passo = lambda x: np.asarray(modelo(x[..., None], training=False)).reshape(len(x))
+    inicio = time.perf_counter()
+    resultado = recursive_forecast(passo, janelas, HORIZON)
+    return resultado, time.perf_counter() - inicio
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 92
+    try:
+        from tensorflow.keras.models import load_model
+    except ImportError:
+        load_model = None
+        print("🧪 TensorFlow não instalado: medindo só o runtime NumPy")
+
+    print(f"\n{'modelo':<24}{'séries':>8}{'NumPy (s)':>11}{'Keras (s)':>11}{'dif. máx.':>11}")
+    for caminho, _ in MODEL_CANDIDATES:
+        if not os.path.exists(npz_path(caminho)):
+            continue
+        numpy_lstm = NumpyLSTM.load(npz_path(caminho))
+        keras = load_model(caminho, compile=False) if load_model and os.path.exists(caminho) else None
+        for series in (1, n):
+            janelas = np.random.default_rng(0).uniform(0, 1, (series, numpy_lstm.input_shape[1]))
+            obtido, t_numpy = previsao(numpy_lstm, janelas)
+            t_keras, diferenca = float('nan'), float('nan')
+            if keras is not None:
+                esperado, t_keras = previsao(keras, janelas)
+                diferenca = float(np.abs(obtido - esperado).max())
+            print(f"{os.path.basename(caminho):<24}{series:>8}{t_numpy:>11.2f}{t_keras:>11.2f}{diferenca:>11.1e}")
+    print(f"\nRSS máximo do processo: {rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
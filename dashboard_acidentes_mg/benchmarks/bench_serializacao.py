@@ -0,0 +1,107 @@
+"""Compara a serialização antiga (to_dict + jsonable_encoder + json) com a nova
+(to_records + processors.serializacao.dumps), em bytes por segundo, e o
+tamanho da mesma tabela em JSON e em Arrow IPC.
+
+Uso (a partir de dashboard_acidentes_mg/):
+    python3 benchmarks/bench_serializacao.py [n_trechos]
+"""
+import os
+import sys
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processors import serializacao
+from processors.aggregations import to_records
+
+
+def perfil_linear(n, seed=0):
+    """Mesmo formato de process_linear_profile com bin_size=1 numa BR de n km."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'km': np.arange(n, dtype=float),
+        'total_acidentes': rng.poisson(6, n),
+        'mortos': rng.poisson(0.3, n),
+        'feridos_graves': rng.poisson(1.2, n),
+    })
+    df['is_hotspot'] = df['total_acidentes'] > df['total_acidentes'].quantile(0.9)
+    return df
+
+
+def evolucao(n_meses, seed=0):
+    rng = np.random.default_rng(seed)
+    meses = pd.period_range('1990-01', periods=n_meses, freq='M')
+    return pd.DataFrame({
+        'mes': meses.strftime('%Y-%m'),
+        'total_acidentes': rng.poisson(900, n_meses),
+        'total_mortos': rng.poisson(60, n_meses),
+        'total_feridos': rng.poisson(1100, n_meses),
+    })
+
+
+# =========================
+# CAMINHOS
+# =========================
+def http_antigo(df):
+    # o que o FastAPI + JSONResponse faziam com um dict vindo de to_dict
+    conteudo = jsonable_encoder({"estatisticas": df.to_dict(orient='records')})
+    return json.dumps(conteudo, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def http_novo(df):
+    return serializacao.dumps({"estatisticas": to_records(df)})
+
+
+def arquivo_antigo(df):
+    return json.dumps({"estatisticas": df.to_dict(orient='records')}, ensure_ascii=False, indent=2, default=str).encode("utf-8")
+
+
+def arquivo_novo(df):
+    return serializacao.dumps({"estatisticas": to_records(df)}, indentar=True)
+
+
+def vazao(func, df, repeticoes=5):
+    melhor, tamanho = float('inf'), 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        tamanho = len(func(df))
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return tamanho / melhor / 1e6, melhor
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    motor = "orjson" if serializacao.orjson is not None else "json (orjson não instalado)"
+    print(f"🧪 Codificador: {motor}")
+
+    payloads = [
+        (f"perfil linear ({n:,} trechos)", perfil_linear(n)),
+        ("evolucao (600 meses)", evolucao(600)),
+    ]
+    casos = [("http", http_antigo, http_novo), ("save_json", arquivo_antigo, arquivo_novo)]
+
+    print(f"\n{'payload':<32}{'caminho':<11}{'antigo (MB/s)':>15}{'novo (MB/s)':>13}{'speedup':>10}")
+    for nome, df in payloads:
+        for caminho, antigo, novo in casos:
+            mb_antigo, t_antigo = vazao(antigo, df)
+            mb_novo, t_novo = vazao(novo, df)
+            print(f"{nome:<32}{caminho:<11}{mb_antigo:>15.1f}{mb_novo:>13.1f}{t_antigo / t_novo:>9.1f}x")
+
+    if serializacao.pa is None:
+        return
+    print(f"\n{'payload':<32}{'JSON (KB)':>11}{'Arrow (KB)':>12}{'JSON (ms)':>11}{'Arrow (ms)':>12}")
+    for nome, df in payloads:
+        _, t_json = vazao(http_novo, df)
+        _, t_arrow = vazao(lambda d: serializacao.arrow_ipc({"estatisticas": d}, "estatisticas"), df)
+        tam_json = len(http_novo(df)) / 1024
+        tam_arrow = len(serializacao.arrow_ipc({"estatisticas": df}, "estatisticas")) / 1024
+        print(f"{nome:<32}{tam_json:>11.0f}{tam_arrow:>12.0f}{t_json * 1e3:>11.1f}{t_arrow * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
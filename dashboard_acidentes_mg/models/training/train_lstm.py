@@ -7,6 +7,7 @@ sys.path.append(BASE_DIR)
 
 from utils.preprocessing_tf import prepare_time_series_data
 from utils.lstm_model import build_and_train_lstm
+from processors.utils import ler_csv
 
 def main():
     csv_path = 'acidentes_mg_dashboard_master.csv'
@@ -14,11 +15,12 @@ def main():
         csv_path = os.path.join('..', 'Uploads', 'acidentes_mg_dashboard_master.csv')
     
     print(f"📂 Carregando: {csv_path}")
-    df = pd.read_csv(csv_path, sep=None, engine='python', encoding='latin1', on_bad_lines='skip')
+    df = ler_csv(csv_path, encoding='latin1', on_bad_lines='skip')
     df['data_inversa'] = pd.to_datetime(df['data_inversa'], errors='coerce')
     
-    X_train, X_test, y_train, y_test, scaler, _ = prepare_time_series_data(df)
-    build_and_train_lstm(X_train, y_train, X_test, y_test)
+    X_train, X_test, y_train, y_test, scaler, df_daily = prepare_time_series_data(df)
+    last_train_date = df_daily.index[len(X_train) + X_train.shape[1] - 1]
+    build_and_train_lstm(X_train, y_train, X_test, y_test, scaler=scaler, last_train_date=last_train_date)
     print("🎉 Treino concluído!")
 
 if __name__ == "__main__":
@@ -1,18 +1,35 @@
 ﻿from typing import Optional, Dict, Any, List
+import threading
+from contextlib import asynccontextmanager
 import pandas as pd
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Request, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
-from processors.utils import get_filtered_df
-from processors.kpis_processor import process_kpis
-from processors.evolucao_processor import process_evolucao_mensal
-from processors.causas_processor import process_causas
-from processors.distribuicoes_processor import process_distribuicoes
-from processors.rankings_processor import process_rankings
-from processors.areas_criticas_processor import process_areas_criticas
+from processors.utils import get_filtered_df, get_dataset_version
+from processors.response_cache import instalar_cache, aceita_arrow, RespostaArrow, RespostaJSON, RotaJSON
+from processors.cube import consultar_cubo
+from processors.kpis_processor import process_kpis, COLUNAS as COLUNAS_KPIS
+from processors.evolucao_processor import process_evolucao_mensal, COLUNAS as COLUNAS_EVOLUCAO
+from processors.causas_processor import process_causas, COLUNAS as COLUNAS_CAUSAS
+from processors.distribuicoes_processor import process_distribuicoes, COLUNAS as COLUNAS_DISTRIBUICOES
+from processors.rankings_processor import process_rankings, COLUNAS as COLUNAS_RANKINGS
+from processors.areas_criticas_processor import process_areas_criticas, COLUNAS as COLUNAS_AREAS_CRITICAS
+from processors.hotspots_processor import consultar_hotspots, tabela_atual
 from processors.linear_profile_processor import process_linear_profile
+from processors.km_pyramid import consultar_piramide, RESOLUCOES
 
-app = FastAPI(title="Dashboard Acidentes MG API")
+@asynccontextmanager
+async def lifespan(app):
+    # Tabela de hotspots conferida (e, se preciso, gerada) em segundo plano no startup
+    threading.Thread(target=tabela_atual, name="hotspots-startup", daemon=True).start()
+    yield
+
+app = FastAPI(title="Dashboard Acidentes MG API", default_response_class=RespostaJSON, lifespan=lifespan)
+# Endpoints devolvem RespostaJSON direto (orjson), sem passar pelo jsonable_encoder
+app.router.route_class = RotaJSON
+
+# Cache por filtros + versão do dataset, com ETag/304 (registrado antes do CORS)
+instalar_cache(app, get_dataset_version)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,17 +39,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def build_filtered_df(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao_met=None):
-    return get_filtered_df(ano=ano, mes=mes, hora_inicio=hora_inicio, hora_fim=hora_fim, condicao=condicao_met)
+COLUNAS_OPTIONS = ['data_inversa_x', 'condicao_metereologica_x', 'fase_dia_x', 'tipo_acidente_x']
+
+def build_filtered_df(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao_met=None, colunas=None):
+    return get_filtered_df(ano=ano, mes=mes, hora_inicio=hora_inicio, hora_fim=hora_fim, condicao=condicao_met, colunas=colunas)
+
+def build_cube_slice(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao_met=None, colunas=None):
+    return consultar_cubo(ano=ano, mes=mes, hora_inicio=hora_inicio, hora_fim=hora_fim, condicao=condicao_met, colunas=colunas)
 
 def safe_unique_sorted(series: pd.Series) -> List[str]:
     s = series.dropna().astype(str)
     s = s[s.str.strip() != ""]
     return sorted(s.unique().tolist())
 
+def sem_cache_se_gerando(resultado, areas):
+    # Enquanto a tabela de hotspots é gerada os trechos críticos saem vazios: a resposta não entra no cache
+    if areas is not None and areas["trechos_criticos"].get("gerando"):
+        return RespostaJSON(resultado, headers={"Cache-Control": "no-store"})
+    return resultado
+
+# Painéis disponíveis no endpoint agregado: processador + colunas que ele lê
+PAINEIS = {
+    "kpis": (process_kpis, COLUNAS_KPIS),
+    "evolucao": (process_evolucao_mensal, COLUNAS_EVOLUCAO),
+    "causas": (process_causas, COLUNAS_CAUSAS),
+    "distribuicoes": (process_distribuicoes, COLUNAS_DISTRIBUICOES),
+    "rankings": (process_rankings, COLUNAS_RANKINGS),
+    "areas_criticas": (process_areas_criticas, COLUNAS_AREAS_CRITICAS),
+}
+
 @app.get("/api/options")
 def options(ano: Optional[str] = None, mes: Optional[str] = None):
-    df = build_filtered_df(ano, mes)
+    df = build_filtered_df(ano, mes, colunas=COLUNAS_OPTIONS)
     return {
         "anos": safe_unique_sorted(df["data_inversa_x"].dt.year) if "data_inversa_x" in df.columns else [],
         "condicoes_meteorologicas": safe_unique_sorted(df.get("condicao_metereologica_x", pd.Series(dtype=str))),
@@ -40,33 +78,75 @@ def options(ano: Optional[str] = None, mes: Optional[str] = None):
         "tipos_acidente": safe_unique_sorted(df.get("tipo_acidente_x", pd.Series(dtype=str))),
     }
 
+@app.get("/api/dashboard")
+def dashboard(
+    ano: Optional[str] = None,
+    mes: Optional[str] = None,
+    hora_inicio: Optional[int] = None,
+    hora_fim: Optional[int] = None,
+    condicao_met: Optional[str] = None,
+    paineis: Optional[str] = Query(None, description="Lista separada por vírgula; padrão: todos"),
+):
+    """Todos os painéis da página em uma resposta, cada um filtrando o rollup do cubo no seu grão."""
+    nomes = [p.strip() for p in paineis.split(",") if p.strip()] if paineis else list(PAINEIS)
+    desconhecidos = [n for n in nomes if n not in PAINEIS]
+    if desconhecidos:
+        raise HTTPException(status_code=400, detail=f"Painéis desconhecidos: {', '.join(desconhecidos)}")
+    filtros = dict(ano=ano, mes=mes, hora_inicio=hora_inicio, hora_fim=hora_fim, condicao=condicao_met)
+    resultado = {
+        nome: PAINEIS[nome][0](df_input=build_cube_slice(ano, mes, hora_inicio, hora_fim, condicao_met, PAINEIS[nome][1]),
+                               save=False, **({"filtros": filtros} if nome == "areas_criticas" else {}))
+        for nome in nomes
+    }
+    return sem_cache_se_gerando(resultado, resultado.get("areas_criticas"))
+
 @app.get("/api/kpis")
 def kpis(ano: Optional[str] = None, mes: Optional[str] = None):
-    return process_kpis(df_input=build_filtered_df(ano, mes), save=False)
+    return process_kpis(df_input=build_cube_slice(ano, mes, colunas=COLUNAS_KPIS), save=False)
 
 @app.get("/api/evolucao")
-def evolucao(ano: Optional[str] = None, mes: Optional[str] = None):
-    return process_evolucao_mensal(df_input=build_filtered_df(ano, mes), save=False)
+def evolucao(request: Request, ano: Optional[str] = None, mes: Optional[str] = None):
+    arrow = aceita_arrow(request)
+    result = process_evolucao_mensal(df_input=build_cube_slice(ano, mes, colunas=COLUNAS_EVOLUCAO), save=False, tabela=arrow)
+    return RespostaArrow(result, tabela="evolucao") if arrow else result
 
 @app.get("/api/causas")
 def causas(ano: Optional[str] = None, mes: Optional[str] = None):
-    return process_causas(df_input=build_filtered_df(ano, mes), save=False)
+    return process_causas(df_input=build_cube_slice(ano, mes, colunas=COLUNAS_CAUSAS), save=False)
 
 @app.get("/api/distribuicoes")
 def distribuicoes(ano: Optional[str] = None, mes: Optional[str] = None):
-    return process_distribuicoes(df_input=build_filtered_df(ano, mes), save=False)
+    return process_distribuicoes(df_input=build_cube_slice(ano, mes, colunas=COLUNAS_DISTRIBUICOES), save=False)
 
 @app.get("/api/rankings")
 def rankings(ano: Optional[str] = None, mes: Optional[str] = None):
-    return process_rankings(df_input=build_filtered_df(ano, mes), save=False)
+    return process_rankings(df_input=build_cube_slice(ano, mes, colunas=COLUNAS_RANKINGS), save=False)
 
 @app.get("/api/areas-criticas")
 def areas_criticas(ano: Optional[str] = None, mes: Optional[str] = None):
-    return process_areas_criticas(df_input=build_filtered_df(ano, mes), save=False)
+    resultado = process_areas_criticas(df_input=build_cube_slice(ano, mes, colunas=COLUNAS_AREAS_CRITICAS), save=False,
+                                       filtros=dict(ano=ano, mes=mes))
+    return sem_cache_se_gerando(resultado, resultado)
+
+@app.get("/api/hotspots")
+def hotspots(br: Optional[str] = None, limite: int = Query(50, ge=1, le=1000)):
+    result = consultar_hotspots(br=br, limite=limite)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Tabela de hotspots em geração", headers={"Retry-After": "30"})
+    return result
 
 @app.get("/api/v1/analytics/linear-profile/{br}")
-def linear_profile(br: str, bin_size: int = Query(1, ge=1)):
-    result = process_linear_profile(br, bin_size=bin_size, save=False)
+def linear_profile(request: Request, br: str, bin_size: int = Query(1, ge=1), km_inicio: Optional[float] = None, km_fim: Optional[float] = None):
+    arrow = aceita_arrow(request)
+    result = process_linear_profile(br, bin_size=bin_size, save=False, km_inicio=km_inicio, km_fim=km_fim, tabela=arrow)
+    if not result:
+        raise HTTPException(status_code=404, detail=f"Dados não encontrados para a BR-{br}")
+    return RespostaArrow(result, tabela="estatisticas") if arrow else result
+
+@app.get("/api/v1/analytics/km-tiles/{br}")
+def km_tiles(br: str, zoom: Optional[int] = Query(None, ge=0, le=len(RESOLUCOES) - 1),
+             km_inicio: Optional[float] = None, km_fim: Optional[float] = None):
+    result = consultar_piramide(br, zoom=zoom, km_inicio=km_inicio, km_fim=km_fim)
     if not result:
         raise HTTPException(status_code=404, detail=f"Dados não encontrados para a BR-{br}")
     return result
@@ -23,6 +23,8 @@ const AIPredictionChart = () => {
             month: d.date.split('-')[1] // Extrai o mês (01, 02...)
           }));
           setData({ chart: prev, metrics: json.metrics, causas: json.causas_principais || [] });
+        } else {
+          setData({ chart: [], metrics: {}, causas: [] });
         }
       }).catch(() => setData({ chart: [], metrics: {}, causas: [] }));
   }, [reduction, selectedBR]);
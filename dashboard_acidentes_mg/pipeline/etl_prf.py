@@ -1,7 +1,13 @@
 ﻿import os
+import re
+import json
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
 import zipfile
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Configurações de pastas
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,6 +20,23 @@ URLS_PRF = {
     "2024": "https://arquivos.prf.gov.br/arquivos/index.php/s/yxeXfVNnyZ2RROp/download"
 }
 
+def baixar_zip(ano, url):
+    """Baixa o zip de um ano para DADOS_DIR e devolve o caminho local."""
+    os.makedirs(DADOS_DIR, exist_ok=True)
+    zip_path = os.path.join(DADOS_DIR, f"dados_{ano}.zip")
+    # Usando o curl nativo do Windows para burlar o bloqueio SSL do Python
+    comando_curl = [
+        "curl", "-k", "-L", 
+        "-H", "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+        "-o", zip_path, url
+    ]
+    # Executa o download (pode demorar um pouco, aguarde)
+    subprocess.run(comando_curl, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return zip_path
+
+def _nome_csv(z):
+    return [name for name in z.namelist() if name.endswith('.csv')][0]
+
 def baixar_e_extrair_dados():
     dataframes = []
     
@@ -22,19 +45,11 @@ def baixar_e_extrair_dados():
         zip_path = os.path.join(DADOS_DIR, f"dados_{ano}.zip")
         
         try:
-            # Usando o curl nativo do Windows para burlar o bloqueio SSL do Python
-            comando_curl = [
-                "curl", "-k", "-L", 
-                "-H", "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-                "-o", zip_path, url
-            ]
-            
-            # Executa o download (pode demorar um pouco, aguarde)
-            subprocess.run(comando_curl, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            zip_path = baixar_zip(ano, url)
             
             # Extrai e lê o CSV
             with zipfile.ZipFile(zip_path) as z:
-                csv_filename = [name for name in z.namelist() if name.endswith('.csv')][0]
+                csv_filename = _nome_csv(z)
                 print(f"📄 Extraindo {csv_filename}...")
                 
                 with z.open(csv_filename) as f:
@@ -57,8 +72,9 @@ def baixar_e_extrair_dados():
     df_master = pd.concat(dataframes, ignore_index=True)
     return df_master
 
-def limpar_e_padronizar(df):
-    print("🧹 Iniciando limpeza e padronização dos dados...")
+def limpar_e_padronizar(df, verbose=True):
+    if verbose:
+        print("🧹 Iniciando limpeza e padronização dos dados...")
     
     col_map = {
         'data_inversa': 'data_inversa', 'condicao_metereologica': 'condicao_met',
@@ -84,17 +100,294 @@ def limpar_e_padronizar(df):
     linhas_antes = len(df)
     df = df.drop_duplicates()
     linhas_depois = len(df)
-    print(f"✂️ Linhas duplicadas removidas: {linhas_antes - linhas_depois}")
+    if verbose:
+        print(f"✂️ Linhas duplicadas removidas: {linhas_antes - linhas_depois}")
 
     return df
 
+# =========================
+# MODO STREAMING (memória limitada)
+# =========================
+# Lê cada CSV do zip em blocos, limpa bloco a bloco e grava row groups direto
+# no Parquet. Só os hashes (8 bytes) das linhas já gravadas ficam em memória,
+# para a deduplicação entre blocos e entre anos.
+COLUNAS_NUMERICAS = [
+    'id', 'br', 'mortos', 'feridos_leves', 'feridos_graves', 'feridos', 'ilesos',
+    'ignorados', 'pessoas', 'veiculos',
+]
+
+class HashesVistos:
+    """Conjunto de hashes uint64 mantido como corridas ordenadas.
+
+    Cada bloco acrescenta uma corrida ordenada com os seus hashes novos, e
+    corridas de tamanho parecido são fundidas (como num contador binário).
+    Sobram O(log n) corridas, a busca é um searchsorted em cada uma, e cada
+    hash é copiado O(log n) vezes no total. Refazer a união do array inteiro
+    a cada bloco custaria O(n) por bloco, quadrático no arquivo.
+    """
+
+    def __init__(self):
+        self.corridas = []
+
+    def __len__(self):
+        return sum(len(c) for c in self.corridas)
+
+    def contem(self, h):
+        """Máscara dos hashes de `h` já registrados."""
+        achados = np.zeros(len(h), dtype=bool)
+        for corrida in self.corridas:
+            pos = np.searchsorted(corrida, h).clip(max=len(corrida) - 1)
+            achados |= corrida[pos] == h
+        return achados
+
+    def _acrescentar(self, ordenados):
+        self.corridas.append(ordenados)
+        while len(self.corridas) > 1 and len(self.corridas[-2]) <= 2 * len(self.corridas[-1]):
+            ultima, penultima = self.corridas.pop(), self.corridas.pop()
+            # Duas corridas já ordenadas: o sort estável (timsort) só as intercala
+            fundida = np.concatenate([penultima, ultima])
+            fundida.sort(kind='stable')
+            self.corridas.append(fundida)
+
+    def filtrar_novos(self, df):
+        """Máscara das linhas ainda não vistas (inclusive dentro do próprio bloco); registra-as."""
+        h = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        unicos, primeira = np.unique(h, return_index=True)
+        novos = ~self.contem(unicos)
+        mascara = np.zeros(len(h), dtype=bool)
+        mascara[primeira[novos]] = True
+        if novos.any():
+            self._acrescentar(unicos[novos])
+        return mascara
+
+def _tipar_bloco(df):
+    """Tipos fixos por coluna, para que todos os blocos tenham o mesmo schema."""
+    for col in df.columns:
+        if col in COLUNAS_NUMERICAS:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.'), errors='coerce').astype('float64')
+        elif col == 'mes_num':
+            df[col] = df[col].astype('Int64')
+        elif col != 'data_inversa':
+            df[col] = df[col].astype('string')
+    return df
+
+def _ler_blocos(zip_path, chunksize):
+    with zipfile.ZipFile(zip_path) as z:
+        csv_filename = _nome_csv(z)
+        print(f"📄 Lendo {csv_filename} em blocos de {chunksize} linhas...")
+        with z.open(csv_filename) as f:
+            for bloco in pd.read_csv(f, sep=';', encoding='latin1', on_bad_lines='skip',
+                                     dtype=str, chunksize=chunksize):
+                yield bloco
+
+def _gravar_zip(zip_path, saida, vistos, chunksize, rotulo, descartar=()):
+    """Limpa os blocos de um zip e os acrescenta ao Parquet descrito por `saida`.
+
+    `saida` guarda caminho, schema e writer (criados no primeiro bloco), para
+    que vários zips possam ser gravados no mesmo arquivo.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    linhas = duplicadas = 0
+    avisado = False
+    for bloco in _ler_blocos(zip_path, chunksize):
+        lidas = len(bloco)
+        bloco = _tipar_bloco(limpar_e_padronizar(bloco, verbose=False))
+        bloco = bloco.drop(columns=[c for c in descartar if c in bloco.columns])
+        if saida.get('schema') is None:
+            saida['schema'] = pa.Schema.from_pandas(bloco, preserve_index=False)
+            saida['writer'] = pq.ParquetWriter(saida['caminho'], saida['schema'])
+        else:
+            extras = [c for c in bloco.columns if c not in saida['schema'].names]
+            if extras and not avisado:
+                avisado = True
+                print(f"⚠️ {rotulo}: colunas fora do schema ignoradas: {extras}")
+            bloco = bloco.reindex(columns=saida['schema'].names)
+        bloco = bloco[vistos.filtrar_novos(bloco)]
+        duplicadas += lidas - len(bloco)
+        saida['writer'].write_table(pa.Table.from_pandas(bloco, schema=saida['schema'], preserve_index=False))
+        linhas += len(bloco)
+    return linhas, duplicadas
+
+def executar_streaming(fontes=None, destino=ARQUIVO_FINAL, chunksize=100_000):
+    """Pipeline completo em blocos. `fontes` mapeia ano -> URL ou caminho de zip local.
+
+    Zips locais são lidos direto (e preservados), o que permite rodar o
+    pipeline sem acesso aos servidores da PRF.
+    """
+    fontes = URLS_PRF if fontes is None else fontes
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    saida = {"caminho": destino + '.tmp', "schema": None, "writer": None}
+    vistos = HashesVistos()
+    total = duplicadas = 0
+
+    try:
+        for ano, origem in fontes.items():
+            local = os.path.exists(origem)
+            zip_path = origem
+            try:
+                if not local:
+                    print(f"📥 Baixando dados do ano {ano}...")
+                    zip_path = baixar_zip(ano, origem)
+                linhas_ano, dup_ano = _gravar_zip(zip_path, saida, vistos, chunksize, ano)
+                total += linhas_ano
+                duplicadas += dup_ano
+                print(f"✅ {ano} gravado: {linhas_ano} linhas.")
+            except Exception as e:
+                print(f"❌ Erro ao processar {ano}: {e}")
+            finally:
+                if not local and os.path.exists(zip_path):
+                    os.remove(zip_path)
+    finally:
+        if saida['writer'] is not None:
+            saida['writer'].close()
+
+    if saida['writer'] is None:
+        print("⚠️ Nenhum dado foi lido. Abortando.")
+        return None
+    os.replace(saida['caminho'], destino)
+    print(f"✂️ Linhas duplicadas removidas: {duplicadas}")
+    print(f"🎉 Pipeline concluído com sucesso! Total de registros salvos: {total}")
+    return total
+
+# =========================
+# MODO INCREMENTAL (partição por ano + manifesto)
+# =========================
+# Cada ano vira dados_historicos/acidentes/ano=AAAA/part-0.parquet. O
+# _manifest.json guarda o sha256 e o nº de linhas de cada zip de origem: numa
+# atualização só os anos novos ou com zip alterado são reprocessados, em
+# processos paralelos, e só a partição deles é reescrita.
+PARTICOES_DIR = os.path.join(DADOS_DIR, 'acidentes')
+MANIFESTO = '_manifest.json'  # prefixo '_' para o pyarrow ignorar ao ler a pasta
+
+def _sha256_arquivo(path, tamanho_bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def ler_manifesto(destino_dir=PARTICOES_DIR):
+    path = os.path.join(destino_dir, MANIFESTO)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _salvar_manifesto(manifesto, destino_dir):
+    path = os.path.join(destino_dir, MANIFESTO)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def _arquivo_particao(ano, destino_dir):
+    return os.path.join(destino_dir, f"ano={ano}", "part-0.parquet")
+
+def _ano_do_nome(path):
+    """Ano de um zip local pelo nome do arquivo (ex.: dados_2023.zip -> '2023')."""
+    nome = os.path.basename(path)
+    encontrado = re.search(r'(19|20)\d{2}', nome)
+    return encontrado.group(0) if encontrado else os.path.splitext(nome)[0]
+
+def processar_ano(ano, origem, anterior, destino_dir, chunksize=100_000, forcar=False):
+    """Worker de um ano: obtém o zip, compara o checksum e, se mudou, regrava a partição.
+
+    Roda em um processo separado; devolve a entrada do manifesto e o status
+    ('inalterado' ou 'atualizado').
+    """
+    local = os.path.exists(origem)
+    zip_path = origem if local else baixar_zip(ano, origem)
+    try:
+        checksum = _sha256_arquivo(zip_path)
+        arquivo = _arquivo_particao(ano, destino_dir)
+        if not forcar and anterior and anterior.get('sha256') == checksum and os.path.exists(arquivo):
+            return ano, anterior, 'inalterado'
+
+        os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+        saida = {"caminho": arquivo + '.tmp', "schema": None, "writer": None}
+        try:
+            # 'ano' vem do nome da partição (hive), não do arquivo
+            linhas, duplicadas = _gravar_zip(zip_path, saida, HashesVistos(), chunksize, ano, descartar=('ano',))
+        finally:
+            if saida['writer'] is not None:
+                saida['writer'].close()
+        if saida['writer'] is None:
+            raise ValueError("nenhuma linha lida do zip")
+        os.replace(saida['caminho'], arquivo)
+        entrada = {
+            "origem": origem if local else os.path.basename(zip_path),
+            "sha256": checksum,
+            "linhas": linhas,
+            "duplicadas_removidas": duplicadas,
+            "atualizado_em": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        return ano, entrada, 'atualizado'
+    finally:
+        if not local and os.path.exists(zip_path):
+            os.remove(zip_path)
+
+def executar_incremental(fontes=None, destino_dir=PARTICOES_DIR, workers=None, chunksize=100_000, forcar=False):
+    """Atualiza só as partições cujo zip de origem mudou desde o último manifesto."""
+    fontes = URLS_PRF if fontes is None else fontes
+    os.makedirs(destino_dir, exist_ok=True)
+    manifesto = ler_manifesto(destino_dir)
+    resumo = {"atualizado": [], "inalterado": [], "erro": []}
+
+    with ProcessPoolExecutor(max_workers=workers or min(len(fontes), os.cpu_count() or 1)) as pool:
+        futuros = {
+            pool.submit(processar_ano, str(ano), origem, manifesto.get(str(ano)), destino_dir, chunksize, forcar): str(ano)
+            for ano, origem in fontes.items()
+        }
+        for futuro in as_completed(futuros):
+            ano = futuros[futuro]
+            try:
+                _, entrada, status = futuro.result()
+            except Exception as e:
+                print(f"❌ Erro ao processar {ano}: {e}")
+                resumo['erro'].append(ano)
+                continue
+            resumo[status].append(ano)
+            if status == 'atualizado':
+                manifesto[ano] = entrada
+                _salvar_manifesto(manifesto, destino_dir)
+                print(f"✅ {ano} atualizado: {entrada['linhas']} linhas.")
+            else:
+                print(f"⏭️ {ano} inalterado (checksum igual), partição mantida.")
+
+    total = sum(e['linhas'] for e in manifesto.values())
+    print(f"🎉 Atualização concluída: {len(resumo['atualizado'])} ano(s) reprocessado(s), "
+          f"{len(resumo['inalterado'])} inalterado(s). Total de registros: {total}")
+    return resumo
+
 if __name__ == "__main__":
-    print("🚀 Iniciando Pipeline ETL da PRF via CURL...")
-    
-    df_bruto = baixar_e_extrair_dados()
-    
-    if df_bruto is not None:
-        df_limpo = limpar_e_padronizar(df_bruto)
-        print(f"💾 Salvando o banco de dados otimizado em: {ARQUIVO_FINAL}")
-        df_limpo.to_parquet(ARQUIVO_FINAL, index=False)
-        print(f"🎉 Pipeline concluído com sucesso! Total de registros salvos: {len(df_limpo)}")
+    parser = argparse.ArgumentParser(description="Pipeline ETL da PRF")
+    parser.add_argument("--streaming", action="store_true", help="processa em blocos com memória limitada")
+    parser.add_argument("--zip", nargs="+", metavar="ARQUIVO", help="zips locais no lugar das URLs da PRF (implica --streaming; no modo incremental o ano vem do nome do arquivo)")
+    parser.add_argument("--incremental", action="store_true", help="grava uma partição por ano e reprocessa só os anos alterados")
+    parser.add_argument("--workers", type=int, default=None, help="processos paralelos no modo incremental")
+    parser.add_argument("--forcar", action="store_true", help="reprocessa todos os anos no modo incremental")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--saida", default=None)
+    args = parser.parse_args()
+
+    if args.incremental:
+        print("🚀 Iniciando Pipeline ETL da PRF em modo incremental...")
+        fontes = {_ano_do_nome(p): p for p in args.zip} if args.zip else None
+        executar_incremental(fontes, destino_dir=args.saida or PARTICOES_DIR, workers=args.workers,
+                             chunksize=args.chunksize, forcar=args.forcar)
+    elif args.streaming or args.zip:
+        print("🚀 Iniciando Pipeline ETL da PRF em modo streaming...")
+        fontes = {p: p for p in args.zip} if args.zip else None
+        executar_streaming(fontes, destino=args.saida or ARQUIVO_FINAL, chunksize=args.chunksize)
+    else:
+        print("🚀 Iniciando Pipeline ETL da PRF via CURL...")
+        
+        df_bruto = baixar_e_extrair_dados()
+        
+        if df_bruto is not None:
+            df_limpo = limpar_e_padronizar(df_bruto)
+            print(f"💾 Salvando o banco de dados otimizado em: {args.saida or ARQUIVO_FINAL}")
+            df_limpo.to_parquet(args.saida or ARQUIVO_FINAL, index=False)
+            print(f"🎉 Pipeline concluído com sucesso! Total de registros salvos: {len(df_limpo)}")
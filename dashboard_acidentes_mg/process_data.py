@@ -1,11 +1,33 @@
 from backend.routes.lstm_routes import router as lstm_router
 import pandas as pd
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import time
+import uuid
+import threading
 import numpy as np
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from processors.snapshot import snapshot_disponivel, ler_snapshot
+from processors.filter_index import FilterIndex
+from processors.km_index import KmIndex
+from processors.aggregations import to_records
+from processors import utils
+from processors.response_cache import aceita_arrow, RespostaArrow, RespostaJSON, RotaJSON
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # O servidor aceita conexões já; dados e índices são montados em segundo plano
+    if os.environ.get("PRF_AQUECIMENTO", "fundo") == "sincrono":
+        aquecer()
+    else:
+        threading.Thread(target=aquecer, name="aquecimento", daemon=True).start()
+    yield
+
+app = FastAPI(default_response_class=RespostaJSON, lifespan=lifespan)
+app.router.route_class = RotaJSON
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,15 +38,35 @@ app.add_middleware(
 
 app.include_router(lstm_router)
 
-def load_data():
-    """Lê o CSV e extrai apenas as colunas necessárias, evitando duplicatas."""
-    candidates = ["acidentes_mg_dashboard_master.csv", "../Uploads/acidentes_mg_dashboard_master.csv"]
-    path = next((p for p in candidates if os.path.exists(p)), None)
-    if not path: 
-        raise FileNotFoundError("Dataset CSV não encontrado.")
-    
-    # Leitura inicial com detecção de delimitador
-    df_raw = pd.read_csv(path, sep=None, engine='python', encoding='latin1', on_bad_lines='skip')
+# Colunas de origem aceitas por load_data (primeira disponível de cada grupo)
+COLUNAS_ORIGEM = [
+    'data_inversa_x', 'data_inversa_original', 'data_inversa', 'br_x', 'br_original', 'br',
+    'km_x', 'km_original', 'km', 'causa_acidente_x', 'causa_acidente', 'causa_principal', 'causa',
+    'tipo_acidente_x', 'tipo_acidente', 'fase_dia_x', 'fase_dia',
+    'condicao_metereologica_x', 'condicao_metereologica', 'condicao_met', 'municipio_x', 'municipio',
+    'mortos_x', 'mortos', 'feridos_leves_x', 'feridos_leves', 'feridos_graves_x', 'feridos_graves',
+]
+
+# CSV master (o mesmo de processors.utils, que o snapshot acompanha) e a cópia em Uploads
+CSV_CANDIDATOS = [utils.CSV_MASTER, utils.BASE_DIR.parent / "Uploads" / utils.CSV_MASTER.name]
+
+def load_data(path=None):
+    """Lê o CSV e extrai apenas as colunas necessárias, evitando duplicatas.
+
+    Com `path`, lê esse arquivo (ex.: um upload) em vez do dataset padrão.
+    Todo CSV passa pela mesma ingestão do CSV master usada pelos processadores
+    (utils.ler_csv_master), da qual o snapshot Parquet também é gerado, então
+    snapshot, CSV e upload produzem as mesmas linhas e valores.
+    """
+    if path is None and snapshot_disponivel():
+        # Snapshot Parquet já tipado: lê só as colunas usadas aqui
+        df_raw = ler_snapshot(colunas=COLUNAS_ORIGEM)
+    else:
+        if path is None:
+            path = next((p for p in CSV_CANDIDATOS if os.path.exists(p)), None)
+        if not path: 
+            raise FileNotFoundError("Dataset CSV não encontrado.")
+        df_raw = utils.ler_csv_master(path)
     
     # Função para buscar a primeira coluna disponível de uma lista de opções
     def get_best_col(options):
@@ -64,30 +106,234 @@ def load_data():
     
     # Padronizar BR (remover .0 e zeros à esquerda)
     df['br'] = df['br'].astype(str).str.replace(r'\.0$', '', regex=True).str.lstrip('0').str.strip()
+
+    # KM numérico calculado uma vez aqui, não a cada requisição
+    df['km_num'] = pd.to_numeric(df['km'].astype(str).str.replace(',', '.').str.extract(r'(\d+\.?\d*)')[0], errors='coerce')
     
     return df
 
-df_master = load_data()
-print(f"✅ CSV carregado com sucesso! Linhas: {len(df_master)}")
+COLUNAS_INDICE = ['ano', 'mes_num', 'condicao_met', 'tipo_acidente', 'fase_dia', 'br', 'municipio']
+
+def construir_indice_km(df):
+    """km ordenados por BR (processors/km_index.py) para /api/distribuicao-km."""
+    return KmIndex(df['br'], df['km_num'], {'mortos': df['mortos'], 'feridos': df['feridos']})
+
+# --- AQUECIMENTO EM SEGUNDO PLANO ---
+# O CSV e os índices são montados numa thread iniciada no startup, então o
+# servidor aceita conexões na hora. Até o dataset ficar pronto as rotas de
+# dados respondem 503 e /health/ready informa a etapa atual. Com
+# PRF_AQUECIMENTO=sincrono o servidor só aceita conexões depois de carregar.
+ETAPAS_AQUECIMENTO = ["aguardando", "lendo_dados", "indice_filtros", "indice_km", "pronto"]
+_AQUECIMENTO = {"etapa": "aguardando", "inicio": None, "fim": None, "linhas": None, "erro": None}
+
+def _etapa(nome, **campos):
+    _AQUECIMENTO.update(etapa=nome, **campos)
+
+def aquecer():
+    _etapa("lendo_dados", inicio=time.time())
+    versao_base = _ATIVO["versao"]
+    try:
+        df = load_data()
+        _etapa("indice_filtros", linhas=int(len(df)))
+        # Bitmaps por valor das colunas filtráveis: filtrar = AND de bitmaps, sem copiar o df
+        indice = FilterIndex(df, COLUNAS_INDICE)
+        _etapa("indice_km")
+        indice_km = construir_indice_km(df)
+        # Um upload concluído durante o aquecimento já é mais novo que o CSV lido aqui
+        if publicar_dataset((df, indice, indice_km), versao_base=versao_base) is None:
+            print("ℹ️ CSV do aquecimento descartado: um upload mais novo já está ativo")
+        _etapa("pronto", fim=time.time())
+        print(f"✅ CSV carregado com sucesso! Linhas: {len(df)} ({_AQUECIMENTO['fim'] - _AQUECIMENTO['inicio']:.1f}s)")
+    except Exception as e:
+        print(f"❌ Erro ao carregar o dataset: {e}")
+        _etapa("erro", erro=str(e), fim=time.time())
+
+# Dataset ativo: o trio (df, índice, índice de km) é trocado numa única
+# atribuição. Cada requisição pega o trio uma vez no início e termina com ele,
+# mesmo que um upload publique uma versão nova no meio do caminho.
+# A troca e o incremento da versão acontecem sob _ATIVO_LOCK, porque o
+# aquecimento e o executor de upload publicam a partir de threads diferentes.
+_ATIVO = {"dataset": None, "versao": 0}
+_ATIVO_LOCK = threading.Lock()
+
+def publicar_dataset(dataset, versao_base=None):
+    """Instala o trio como dataset ativo e devolve a nova versão.
+
+    Com `versao_base`, o trio é descartado (retorna None) se outra versão foi
+    instalada depois que ele começou a ser montado.
+    """
+    with _ATIVO_LOCK:
+        if versao_base is not None and _ATIVO["versao"] != versao_base:
+            return None
+        _ATIVO["dataset"] = dataset
+        _ATIVO["versao"] += 1
+        return _ATIVO["versao"]
+
+def dataset_ativo():
+    dataset = _ATIVO["dataset"]
+    if dataset is None:
+        raise HTTPException(status_code=503, detail=f"Dataset em carregamento ({_AQUECIMENTO['etapa']})",
+                            headers={"Retry-After": "5"})
+    return dataset
+
+def montar_filtros(ano=None, mes=None, condicao_met=None, tipo_acidente=None, fase_dia=None, br=None):
+    filtros = {}
+    # ano/mes fora do formato numérico não casam com nada (em vez de um 500)
+    if ano and str(ano).strip() != "": filtros['ano'] = str(utils.filtro_inteiro(ano))
+    if mes and str(mes).strip() != "": filtros['mes_num'] = utils.filtro_inteiro(mes)
+    if condicao_met and str(condicao_met).strip() != "": filtros['condicao_met'] = condicao_met
+    if tipo_acidente and str(tipo_acidente).strip() != "": filtros['tipo_acidente'] = tipo_acidente
+    if fase_dia and str(fase_dia).strip() != "": filtros['fase_dia'] = fase_dia
+    if br and str(br).strip() != "": filtros['br'] = br
+    return filtros
+
+def apply_filters(ano=None, mes=None, condicao_met=None, tipo_acidente=None, fase_dia=None, br=None):
+    df, indice, _ = dataset_ativo()
+    posicoes = indice.selecionar(montar_filtros(ano, mes, condicao_met, tipo_acidente, fase_dia, br))
+    # Cópia rasa quando não há filtro: as rotas criam colunas auxiliares no resultado
+    return df.copy(deep=False) if posicoes is None else df.take(posicoes)
+
+# --- UPLOAD DE NOVO CSV ---
+# O arquivo é gravado em disco em blocos; a leitura, validação e o índice da
+# versão nova são montados em uma thread de fundo (um upload por vez) e só
+# então o dataset ativo é trocado. O CSV master (utils.CSV_MASTER) é
+# substituído com os.replace, então um reinício do servidor já sobe com os
+# dados novos (o snapshot Parquet antigo deixa de corresponder ao CSV e é
+# ignorado). A escrita em disco roda no threadpool, fora do event loop.
+TAMANHO_BLOCO_UPLOAD = 1 << 20
+# O upload substitui o CSV master, então precisa estar no formato dele (';', utf-8)
+COLUNAS_UPLOAD = [c for c in utils.COLUNAS_DASHBOARD if c != 'feridos']
+UPLOADS_RETIDOS = 50  # uploads finalizados (concluido/erro) mantidos para consulta de status
+_UPLOADS = {}
+_UPLOADS_LOCK = threading.Lock()
+_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload")
+
+def _atualizar_upload(job_id, **campos):
+    with _UPLOADS_LOCK:
+        _UPLOADS[job_id].update(campos)
+        if campos.get("status") in ("concluido", "erro"):
+            # Descarta os finalizados mais antigos além do limite (dict mantém a ordem de criação)
+            finalizados = [j for j, job in _UPLOADS.items() if job["status"] in ("concluido", "erro")]
+            for antigo in finalizados[:-UPLOADS_RETIDOS]:
+                del _UPLOADS[antigo]
+
+def _remover(caminho):
+    if os.path.exists(caminho):
+        os.remove(caminho)
 
-def apply_filters(ano=None, mes=None, condicao_met=None, tipo_acidente=None, fase_dia=None):
-    dff = df_master.copy()
-    if ano and str(ano).strip() != "": dff = dff[dff['ano'] == str(ano)]
-    if mes and str(mes).strip() != "": dff = dff[dff['mes_num'] == int(mes)]
-    if condicao_met and str(condicao_met).strip() != "": dff = dff[dff['condicao_met'] == condicao_met]
-    if tipo_acidente and str(tipo_acidente).strip() != "": dff = dff[dff['tipo_acidente'] == tipo_acidente]
-    if fase_dia and str(fase_dia).strip() != "": dff = dff[dff['fase_dia'] == fase_dia]
-    return dff
+def _processar_upload(job_id, caminho_tmp, destino):
+    try:
+        _atualizar_upload(job_id, status="processando")
+        cabecalho = pd.read_csv(caminho_tmp, sep=';', encoding='utf-8', nrows=0).columns
+        faltando = [c for c in COLUNAS_UPLOAD if c not in cabecalho]
+        if faltando:
+            raise ValueError(f"CSV fora do formato do master (';'): faltam {', '.join(faltando)}")
+
+        df_novo = load_data(caminho_tmp)
+        if df_novo['data_inversa'].notna().sum() == 0:
+            raise ValueError("Nenhuma linha com data válida")
+        indice_novo = FilterIndex(df_novo, COLUNAS_INDICE)
+        indice_km_novo = construir_indice_km(df_novo)
+
+        os.replace(caminho_tmp, destino)
+        versao = publicar_dataset((df_novo, indice_novo, indice_km_novo))
+        _atualizar_upload(job_id, status="concluido", linhas=int(len(df_novo)), versao=versao)
+        print(f"✅ Upload {job_id} ativo: {len(df_novo)} linhas (versão {versao})")
+    except Exception as e:
+        print(f"❌ Erro no upload {job_id}: {e}")
+        _atualizar_upload(job_id, status="erro", erro=str(e))
+        _remover(caminho_tmp)
+
+@app.post("/api/upload", status_code=202)
+async def upload_csv(request: Request):
+    destino = utils.CSV_MASTER
+    job_id = uuid.uuid4().hex[:12]
+    # Mesmo diretório do destino, para que o os.replace final seja atômico
+    caminho_tmp = os.path.join(os.path.dirname(destino), f".upload-{job_id}.csv.tmp")
+
+    tamanho = 0
+    f = await run_in_threadpool(open, caminho_tmp, 'wb')
+    try:
+        if request.headers.get('content-type', '').startswith('multipart/form-data'):
+            # FormData do upload-button.tsx: o Starlette já descarrega partes grandes em disco
+            form = await request.form()
+            arquivo = form.get('file')
+            if arquivo is None or not hasattr(arquivo, 'read'):
+                raise HTTPException(status_code=400, detail="Campo 'file' ausente")
+            while bloco := await arquivo.read(TAMANHO_BLOCO_UPLOAD):
+                await run_in_threadpool(f.write, bloco)
+                tamanho += len(bloco)
+            await form.close()
+        else:
+            # Corpo bruto (text/csv): os pedaços do stream são juntados em blocos antes de gravar
+            buffer = bytearray()
+            async for pedaco in request.stream():
+                buffer += pedaco
+                if len(buffer) >= TAMANHO_BLOCO_UPLOAD:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    tamanho += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+                tamanho += len(buffer)
+        await run_in_threadpool(f.close)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(_remover, caminho_tmp)
+        raise
+    if tamanho == 0:
+        await run_in_threadpool(_remover, caminho_tmp)
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+
+    with _UPLOADS_LOCK:
+        _UPLOADS[job_id] = {"job_id": job_id, "status": "recebido", "bytes": tamanho}
+    _UPLOAD_EXECUTOR.submit(_processar_upload, job_id, caminho_tmp, destino)
+    return {"job_id": job_id, "status": "recebido", "bytes": tamanho, "status_url": f"/api/upload/{job_id}"}
+
+@app.get("/api/upload/{job_id}")
+async def get_upload_status(job_id: str):
+    with _UPLOADS_LOCK:
+        job = _UPLOADS.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Upload não encontrado")
+        return dict(job)
+
+# --- SAÚDE ---
+# live: o processo responde (liveness). ready: o dataset está carregado
+# (readiness); enquanto não estiver, 503 com a etapa e o progresso.
+@app.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready():
+    etapa = _AQUECIMENTO["etapa"]
+    pronto = _ATIVO["dataset"] is not None
+    inicio, fim = _AQUECIMENTO["inicio"], _AQUECIMENTO["fim"]
+    if pronto: progresso = 1.0
+    elif etapa in ETAPAS_AQUECIMENTO: progresso = round(ETAPAS_AQUECIMENTO.index(etapa) / (len(ETAPAS_AQUECIMENTO) - 1), 2)
+    else: progresso = 0.0
+    estado = {
+        "status": "pronto" if pronto else ("erro" if etapa == "erro" else "carregando"),
+        "etapa": etapa,
+        "progresso": progresso,
+        "segundos": round((fim or time.time()) - inicio, 2) if inicio else None,
+        "linhas": _AQUECIMENTO["linhas"],
+        "versao": _ATIVO["versao"],
+        "erro": _AQUECIMENTO["erro"],
+    }
+    return estado if pronto else RespostaJSON(estado, status_code=503)
 
 # --- ROTAS DA API ---
 
 @app.get("/api/options")
 async def get_options():
+    df, _, _ = dataset_ativo()
     return {
-        "anos": sorted([str(a) for a in df_master['ano'].unique() if a and a != 'nan' and a != ''], reverse=True),
-        "condicoes_meteorologicas": sorted(df_master['condicao_met'].dropna().unique().tolist()),
-        "tipos_acidente": sorted(df_master['tipo_acidente'].dropna().unique().tolist()),
-        "fases_dia": sorted(df_master['fase_dia'].dropna().unique().tolist())
+        "anos": sorted([str(a) for a in df['ano'].unique() if a and a != 'nan' and a != ''], reverse=True),
+        "condicoes_meteorologicas": sorted(df['condicao_met'].dropna().unique().tolist()),
+        "tipos_acidente": sorted(df['tipo_acidente'].dropna().unique().tolist()),
+        "fases_dia": sorted(df['fase_dia'].dropna().unique().tolist())
     }
 
 @app.get("/api/kpis")
@@ -104,67 +350,107 @@ async def get_kpis(ano: str = None, mes: str = None, condicao_met: str = None, t
         {"id": "taxa_mortalidade", "titulo": "Mortalidade", "valor": taxa, "formato": "percentual"}
     ]}
 
+COLUNAS_FAIXAS_KM = ['faixa_km', 'total_acidentes', 'indice_severidade', 'causa_predominante', 'causas_detalhadas']
+
+def faixas_km(km, mortos, feridos, causas):
+    """Faixas [a, a+10) de km com total, severidade e top 3 causas (DataFrame).
+
+    Recebe só as linhas já selecionadas, na ordem do dataset, e conta tudo
+    com bincount, sem groupby por faixa.
+    """
+    min_k = int(km.min() // 10 * 10)
+    max_k = int(km.max() // 10 * 10) + 10
+    bordas = np.arange(min_k, max_k + 10, 10)
+    n_faixas = len(bordas) - 1
+    faixa = np.searchsorted(bordas, km, side='right') - 1
+
+    totais = np.bincount(faixa, minlength=n_faixas)
+    soma_mortos = np.bincount(faixa, weights=mortos, minlength=n_faixas)
+    soma_feridos = np.bincount(faixa, weights=feridos, minlength=n_faixas)
+    codigos, nomes = pd.factorize(causas)
+    validos = codigos >= 0
+    n_causas = max(len(nomes), 1)
+    contagens = np.bincount(faixa[validos] * n_causas + codigos[validos],
+                            minlength=n_faixas * n_causas).reshape(n_faixas, n_causas)
+    # Desempate como no value_counts: primeira ocorrência da causa na faixa
+    primeira = np.full(n_faixas * n_causas, len(km), dtype=np.int64)
+    np.minimum.at(primeira, faixa[validos] * n_causas + codigos[validos], np.flatnonzero(validos))
+    primeira = primeira.reshape(n_faixas, n_causas)
+
+    com_dados = np.flatnonzero(totais)
+    predominantes, detalhadas = [], []
+    for i in com_dados:
+        linha = contagens[i]
+        ordem = np.lexsort((primeira[i], -linha))
+        ordem = ordem[linha[ordem] > 0]
+        top_3 = {str(nomes[j]): int(linha[j]) for j in ordem[:3]}
+        outros = int(linha[ordem[3:]].sum())
+        if outros > 0: top_3["Outras Causas"] = outros
+        predominantes.append(str(nomes[ordem[0]]) if len(ordem) else "N/I")
+        detalhadas.append(top_3)
+
+    return pd.DataFrame({
+        "faixa_km": [f"{bordas[i]}-{bordas[i] + 10}" for i in com_dados],
+        "total_acidentes": totais[com_dados].astype(np.int64),
+        "indice_severidade": np.round((soma_mortos[com_dados] * 13) + (soma_feridos[com_dados] * 3), 2),
+        "causa_predominante": predominantes,
+        "causas_detalhadas": detalhadas,
+    }, columns=COLUNAS_FAIXAS_KM)
+
+def selecionar_faixas_km(br=None, km_inicio=None, km_fim=None, ano=None, mes=None):
+    df, indice, indice_km = dataset_ativo()
+    vazio = pd.DataFrame(columns=COLUNAS_FAIXAS_KM)
+    # Filtro de BR (mesma normalização aplicada em load_data)
+    target_br = str(br).replace('.0', '').lstrip('0').strip() if br else None
+
+    if target_br:
+        # Trecho pedido por busca binária no índice de km da BR; ano/mes
+        # são conferidos só nas linhas desse trecho
+        ini, fim = indice_km.intervalo(target_br, km_inicio, km_fim)
+        if fim <= ini: return vazio
+        mascara = indice.contem(indice_km.posicoes(target_br, ini, fim), montar_filtros(ano, mes))
+        posicoes = indice_km.posicoes(target_br, ini, fim)[mascara]
+        km = indice_km.km(target_br, ini, fim)[mascara]
+        ordem = np.argsort(posicoes, kind='stable')
+        posicoes, km = posicoes[ordem], km[ordem]
+    else:
+        posicoes = indice.selecionar(montar_filtros(ano, mes))
+        if posicoes is None: posicoes = np.arange(len(df))
+        km = df['km_num'].to_numpy()[posicoes]
+        mascara = ~np.isnan(km)
+        if km_inicio is not None: mascara &= km >= km_inicio
+        if km_fim is not None: mascara &= km <= km_fim
+        posicoes, km = posicoes[mascara], km[mascara]
+
+    if len(posicoes) == 0: return vazio
+    return faixas_km(
+        km,
+        df['mortos'].to_numpy()[posicoes],
+        df['feridos'].to_numpy()[posicoes],
+        df['causa'].to_numpy()[posicoes],
+    )
+
 @app.get("/api/distribuicao-km")
-async def get_distribuicao_km(br: str = None, km_inicio: float = None, km_fim: float = None, ano: str = None, mes: str = None):
+async def get_distribuicao_km(request: Request, br: str = None, km_inicio: float = None, km_fim: float = None, ano: str = None, mes: str = None):
     try:
-        dff = apply_filters(ano, mes)
-        
-        # Filtro de BR
-        if br and str(br).strip() != "":
-            target_br = str(br).replace('.0', '').lstrip('0').strip()
-            dff = dff[dff['br'] == target_br]
-        
-        if dff.empty: return {"faixas_km": []}
-
-        # Tratamento de KM (remover vírgulas e converter para número)
-        dff['km_num'] = dff['km'].astype(str).str.replace(',', '.').str.extract(r'(\d+\.?\d*)')[0]
-        dff['km_num'] = pd.to_numeric(dff['km_num'], errors='coerce')
-        df_valid = dff.dropna(subset=['km_num']).copy()
-        
-        if km_inicio is not None: df_valid = df_valid[df_valid['km_num'] >= km_inicio]
-        if km_fim is not None: df_valid = df_valid[df_valid['km_num'] <= km_fim]
-        
-        if df_valid.empty: return {"faixas_km": []}
-            
-        min_k = int(df_valid['km_num'].min() // 10 * 10)
-        max_k = int(df_valid['km_num'].max() // 10 * 10) + 10
-        bins = list(range(min_k, max_k + 10, 10))
-        labels = [f"{i}-{i+10}" for i in range(min_k, max_k, 10)]
-        
-        df_valid['faixa_km'] = pd.cut(df_valid['km_num'], bins=bins, labels=labels, right=False)
-        
-        resultados = []
-        for faixa, group in df_valid.groupby('faixa_km', observed=False):
-            if group.empty: continue
-            
-            total_km = int(len(group))
-            sev = float(round((group['mortos'].sum() * 13) + (group['feridos'].sum() * 3), 2))
-            
-            counts = group['causa'].value_counts()
-            top_3 = {str(k): int(v) for k, v in counts.head(3).items()}
-            outros = int(counts.iloc[3:].sum())
-            if outros > 0: top_3["Outras Causas"] = outros
-                
-            resultados.append({
-                "faixa_km": str(faixa),
-                "total_acidentes": total_km,
-                "indice_severidade": sev,
-                "causa_predominante": str(counts.index[0]) if not counts.empty else "N/I",
-                "causas_detalhadas": top_3
-            })
-            
-        return {"faixas_km": resultados}
+        tabela = selecionar_faixas_km(br, km_inicio, km_fim, ano, mes)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Erro na API de KM: {e}")
-        return {"faixas_km": []}
+        tabela = pd.DataFrame(columns=COLUNAS_FAIXAS_KM)
+    # Arrow IPC se o cliente pedir no Accept; JSON por padrão
+    if aceita_arrow(request): return RespostaArrow({"faixas_km": tabela}, tabela="faixas_km")
+    return {"faixas_km": to_records(tabela)}
 
 @app.get("/api/evolucao")
-async def get_evolucao(ano: str = None, mes: str = None):
+async def get_evolucao(request: Request, ano: str = None, mes: str = None):
     dff = apply_filters(ano, mes)
     evol = dff.groupby(['ano', 'mes_num']).agg({'id': 'count', 'mortos': 'sum', 'feridos': 'sum'}).reset_index()
     evol['mes'] = evol['mes_num'].apply(lambda x: f"{int(x):02d}")
     evol = evol.rename(columns={'id': 'total_acidentes', 'mortos': 'total_mortos', 'feridos': 'total_feridos'})
-    return {"evolucao": evol.to_dict(orient='records')}
+    if aceita_arrow(request): return RespostaArrow({"evolucao": evol}, tabela="evolucao")
+    return {"evolucao": to_records(evol)}
 
 if __name__ == "__main__":
     import uvicorn
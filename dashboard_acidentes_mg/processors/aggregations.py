@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# NÚCLEO DE AGREGAÇÃO COLUNAR
+# =========================
+# Versões vetorizadas dos helpers usados pelos processadores. Todas operam
+# sobre colunas inteiras (sem apply/iterrows) e aceitam tanto linhas brutas
+# quanto fatias do cubo (processors/cube.py). Nas linhas o nº de acidentes é
+# o nº de ids distintos (uma linha por pessoa/veículo); nas células do cubo ele
+# já vem contado na coluna COL_ACIDENTES e é somado.
+COL_ACIDENTES = 'n_acidentes'
+
+
+def _por_valores_distintos(serie, transformar):
+    """Aplica `transformar` aos valores distintos (poucos) e expande pelos códigos."""
+    codigos, distintos = pd.factorize(serie)
+    if len(distintos) == 0:
+        return pd.Series(np.nan, index=serie.index, dtype=object)
+    convertidos = np.asarray(transformar(pd.Index(distintos)), dtype=object)
+    resultado = convertidos[codigos]
+    resultado[codigos < 0] = np.nan
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+
+def clean_column(serie):
+    """Equivalente vetorizado de clean_string: nulos viram NaN, o resto str.strip().
+
+    A limpeza roda sobre os valores distintos e é expandida pelos códigos do
+    factorize, então o custo por linha é só uma indexação de array.
+    """
+    return _por_valores_distintos(serie, lambda distintos: distintos.astype(str).str.strip())
+
+
+def severity_index(mortos, feridos_graves, feridos_leves):
+    """calculate_severity_index aplicado a colunas inteiras."""
+    return (mortos * 13 + feridos_graves * 5 + feridos_leves * 1).round(2)
+
+
+def month_key(df):
+    """Chave 'AAAA-MM' por aritmética em ano/mes (sem strftime por linha)."""
+    ano = pd.to_numeric(df['ano'], errors='coerce').astype(float)
+    mes = pd.to_numeric(df['mes'], errors='coerce').astype(float)
+    periodo = ano * 100 + mes
+    return _por_valores_distintos(
+        periodo, lambda p: [f"{int(v) // 100}-{int(v) % 100:02d}" for v in p]
+    )
+
+
+def count_accidents(df):
+    """Nº de acidentes: ids distintos nas linhas, soma de COL_ACIDENTES nas células do cubo."""
+    if COL_ACIDENTES in df.columns:
+        return int(df[COL_ACIDENTES].sum())
+    return int(df['id'].nunique())
+
+
+def widen_sums(df):
+    """Garante acumuladores int64: as contagens de vítimas são guardadas em int8."""
+    for col in df.columns:
+        if df[col].dtype.kind in 'iu' and df[col].dtype.itemsize < 8:
+            df[col] = df[col].astype(np.int64)
+    return df
+
+
+def aggregate_by(df, chave, somas):
+    """groupby com total_acidentes + somas, nessa ordem."""
+    agrupado = df.groupby(chave, observed=True, sort=True)
+    resultado = widen_sums(agrupado[list(somas)].sum()) if somas else pd.DataFrame(index=agrupado.size().index)
+    contagem = agrupado[COL_ACIDENTES].sum() if COL_ACIDENTES in df.columns else agrupado['id'].nunique()
+    resultado.insert(0, 'total_acidentes', contagem)
+    return resultado.reset_index()
+
+
+def top_n(df, n, coluna):
+    return df.nlargest(n, coluna, keep='first')
+
+
+def percentages(valores, total):
+    if total == 0:
+        return pd.Series(0.0, index=valores.index)
+    return (valores / total * 100).round(2)
+
+
+def to_records(df, inteiros=()):
+    """Lista de dicts com tipos nativos, montada coluna a coluna (sem iterrows)."""
+    colunas = {}
+    for col in df.columns:
+        serie = df[col]
+        if col in inteiros:
+            serie = serie.astype(np.int64)
+        colunas[col] = serie.tolist()
+    nomes = list(colunas)
+    return [dict(zip(nomes, valores)) for valores in zip(*colunas.values())]
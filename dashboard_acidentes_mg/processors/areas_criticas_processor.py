@@ -1,23 +1,38 @@
 import pandas as pd
-from processors.utils import load_data, save_json, clean_string, calculate_severity_index
+from processors.utils import load_data, save_json
+from processors.aggregations import clean_column, aggregate_by, severity_index, top_n, to_records
+from processors.hotspots_processor import trechos_criticos, tabela_atual
 
-def process_areas_criticas(df_input=None, save=True):
+# Colunas lidas por este processador (projeção na leitura do snapshot)
+COLUNAS = ['id', 'municipio_x', 'br_x', 'mortos_x', 'feridos_graves_x', 'feridos_leves_x', 'feridos']
+
+# `filtros` (ano, mes, hora_inicio, hora_fim, condicao) são os que produziram
+# df_input: os trechos críticos vêm do ranking de hotspots desse recorte.
+# `hotspots` é a tabela já carregada (uso em lote).
+def process_areas_criticas(df_input=None, save=True, filtros=None, hotspots=None):
     print("\n⚠️  Processando áreas críticas...")
     df_master = df_input if df_input is not None else load_data()[0]
+    if df_input is None and hotspots is None:
+        hotspots = tabela_atual(gerar=True)
     
-    df_master['municipio_limpo'] = df_master['municipio_x'].apply(clean_string)
-    mun = df_master.groupby('municipio_limpo').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos_graves_x': 'sum', 'feridos_leves_x': 'sum', 'feridos': 'sum'}).reset_index()
+    municipio = clean_column(df_master['municipio_x']).rename('municipio_limpo')
+    mun = aggregate_by(df_master, municipio, ['mortos_x', 'feridos_graves_x', 'feridos_leves_x', 'feridos'])
     mun.columns = ['municipio', 'total_acidentes', 'mortos', 'feridos_graves', 'feridos_leves', 'total_feridos']
-    mun['indice_gravidade'] = mun.apply(lambda r: calculate_severity_index(r['mortos'], r['feridos_graves'], r['feridos_leves']), axis=1)
+    mun['indice_gravidade'] = severity_index(mun['mortos'], mun['feridos_graves'], mun['feridos_leves'])
     
-    df_master['br_limpa'] = df_master['br_x'].apply(clean_string)
-    brs = df_master.groupby('br_limpa').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos': 'sum'}).reset_index()
+    br = clean_column(df_master['br_x']).rename('br_limpa')
+    brs = aggregate_by(df_master, br, ['mortos_x', 'feridos'])
     brs.columns = ['br', 'total_acidentes', 'mortos', 'feridos']
-    brs['taxa_mortalidade'] = brs.apply(lambda r: round((r['mortos']/(r['mortos']+r['feridos'])*100), 2) if (r['mortos']+r['feridos']) > 0 else 0, axis=1)
+    vitimas = brs['mortos'] + brs['feridos']
+    brs['taxa_mortalidade'] = (brs['mortos'] / vitimas.where(vitimas > 0) * 100).round(2).fillna(0)
 
+    trechos = trechos_criticos(**(filtros or {}), dados=hotspots)
     resultado = {
-        "municipios_criticos": {"dados": mun[mun['total_acidentes']>=5].sort_values('indice_gravidade', ascending=False).head(10).to_dict('records')},
-        "brs_criticas": {"dados": brs[brs['total_acidentes']>=10].sort_values('taxa_mortalidade', ascending=False).head(10).to_dict('records')},
+        "municipios_criticos": {"dados": to_records(top_n(mun[mun['total_acidentes']>=5], 10, 'indice_gravidade'))},
+        "brs_criticas": {"dados": to_records(top_n(brs[brs['total_acidentes']>=10], 10, 'taxa_mortalidade'))},
+        # Trechos do ranking de hotspots (processors/hotspots_processor.py);
+        # "gerando" enquanto a tabela da versão atual ainda está sendo gerada
+        "trechos_criticos": {"dados": trechos} if trechos is not None else {"dados": [], "gerando": True},
         "metadata": {"ultima_atualizacao": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}
     }
     if save: save_json(resultado, 'areas_criticas.json')
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from processors import utils
+from processors.aggregations import clean_column, widen_sums, COL_ACIDENTES
+
+
+# =========================
+# DEFINIÇÃO DO CUBO
+# =========================
+# As dimensões mantêm os nomes das colunas brutas para que os processadores
+# aceitem uma fatia do cubo no lugar do DataFrame de linhas. O CSV traz uma
+# linha por pessoa/veículo, então o cubo tem duas tabelas de células:
+#   - "acidentes": dimensões do acidente (iguais em todas as linhas do id).
+#     Cada acidente cai numa única célula, e a contagem (COL_ACIDENTES) e as
+#     somas das vítimas podem ser somadas entre células.
+#   - "causas": a causa varia entre as linhas de um acidente. Células de
+#     causa x dimensões de filtro, com a contagem de ids distintos feita na
+#     construção; como cada acidente está numa única célula de filtro, somar
+#     essas contagens entre filtros continua exato.
+# Cada painel lê um rollup no seu grão (filtros + dimensões que o processador
+# usa), calculado uma vez por versão do dataset: a consulta só filtra essa
+# tabela, e o custo depende do nº de valores distintos, não do nº de linhas.
+DIMENSOES_FILTRO = ['ano', 'mes', 'hora_int', 'condicao_metereologica_x']
+DIMENSOES = DIMENSOES_FILTRO + ['tipo_acidente_x', 'fase_dia_x', 'municipio_x', 'br_x']
+DIMENSAO_CAUSA = 'causa_acidente_x'
+MEDIDAS = ['mortos_x', 'feridos_graves_x', 'feridos_leves_x', 'feridos']
+DIMENSOES_TEXTO = ['condicao_metereologica_x', 'tipo_acidente_x', 'fase_dia_x', 'municipio_x', 'br_x', DIMENSAO_CAUSA]
+
+_CUBO_LOCK = threading.Lock()
+_CUBO = {"versao": None, "cubo": None, "tabelas": {}}
+
+
+def construir_cubo(df):
+    """Agrega as linhas nas tabelas "acidentes" e "causas" (contagem de acidentes + somas das vítimas).
+
+    As dimensões do acidente vêm da primeira linha de cada id; valores nulos
+    das dimensões formam células próprias.
+    """
+    base = df[['id'] + DIMENSOES + [DIMENSAO_CAUSA] + MEDIDAS].copy()
+    for col in DIMENSOES_TEXTO:
+        base[col] = clean_column(base[col])
+    for col in MEDIDAS:
+        base[col] = pd.to_numeric(base[col], errors='coerce').fillna(0).astype('int64')
+
+    # Uma linha por acidente: dimensões da primeira linha, vítimas somadas
+    primeira = ~base['id'].duplicated() & base['id'].notna()
+    acidentes = base.loc[primeira, ['id'] + DIMENSOES].set_index('id')
+    acidentes = acidentes.join(base.groupby('id', sort=False)[MEDIDAS].sum())
+    acidentes[COL_ACIDENTES] = np.int64(1)
+    celulas = acidentes.groupby(DIMENSOES, dropna=False, observed=True)[[COL_ACIDENTES] + MEDIDAS].sum()
+
+    # Linhas com as dimensões de filtro do seu acidente; ids distintos por célula
+    linhas = base[['id', DIMENSAO_CAUSA] + MEDIDAS].join(acidentes[DIMENSOES_FILTRO], on='id')
+    chave = DIMENSOES_FILTRO + [DIMENSAO_CAUSA]
+    agrupado = linhas.groupby(chave, dropna=False, observed=True)
+    causas = agrupado[MEDIDAS].sum()
+    causas.insert(0, COL_ACIDENTES, agrupado['id'].nunique().astype('int64'))
+    return {"acidentes": widen_sums(celulas).reset_index(), "causas": widen_sums(causas).reset_index()}
+
+
+def _cubo_atual():
+    versao = utils.get_dataset_version()
+    if _CUBO['versao'] != versao:
+        print(f"\n🧮 Construindo cubo (versão {versao})...")
+        _CUBO['cubo'] = construir_cubo(utils.get_df())
+        _CUBO['tabelas'] = {}
+        _CUBO['versao'] = versao
+        print(f"  ✅ Cubo pronto: {len(_CUBO['cubo']['acidentes'])} células de acidente, "
+              f"{len(_CUBO['cubo']['causas'])} de causa")
+    return _CUBO
+
+
+def obter_cubo():
+    """Cubo da versão atual do dataset, reconstruído só quando o CSV muda."""
+    with _CUBO_LOCK:
+        return _cubo_atual()['cubo']
+
+
+def obter_tabela(colunas=None):
+    """Rollup do cubo atual no grão de um painel (ver tabela_do_painel), em cache por versão."""
+    with _CUBO_LOCK:
+        estado = _cubo_atual()
+        chave = tuple(colunas) if colunas is not None else None
+        if chave not in estado['tabelas']:
+            estado['tabelas'][chave] = tabela_do_painel(estado['cubo'], colunas)
+        return estado['tabelas'][chave]
+
+
+# =========================
+# CONSULTA
+# =========================
+def rollup(celulas, dimensoes):
+    """Soma as células mantendo só as dimensões pedidas (contagens e vítimas são aditivas)."""
+    return widen_sums(
+        celulas.groupby(list(dimensoes), dropna=False, observed=True)[[COL_ACIDENTES] + MEDIDAS].sum()
+    ).reset_index()
+
+
+def tabela_do_painel(cubo, colunas=None, filtros=DIMENSOES_FILTRO):
+    """Células no grão de um painel: dimensões de `filtros` + as de `colunas` que o processador lê.
+
+    Painéis que leem a causa usam a tabela "causas"; sem `colunas`, a tabela
+    "acidentes" inteira.
+    """
+    if colunas is None:
+        return cubo['acidentes']
+    if DIMENSAO_CAUSA in colunas:
+        return rollup(cubo['causas'], list(filtros) + [DIMENSAO_CAUSA])
+    return rollup(cubo['acidentes'], list(filtros) + [c for c in colunas if c in DIMENSOES and c not in filtros])
+
+
+def consultar_cubo(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao=None, colunas=None):
+    """Mesmos filtros de get_filtered_df, respondidos pelo rollup do painel que lê `colunas`."""
+    tabela = obter_tabela(colunas)
+    mascara = np.ones(len(tabela), dtype=bool)
+    if ano:
+        mascara &= (tabela['ano'] == utils.filtro_inteiro(ano)).to_numpy(dtype=bool, na_value=False)
+    if mes:
+        mascara &= (tabela['mes'] == utils.filtro_inteiro(mes)).to_numpy(dtype=bool, na_value=False)
+    if hora_inicio is not None:
+        mascara &= (tabela['hora_int'] >= int(hora_inicio)).to_numpy(dtype=bool, na_value=False)
+    if hora_fim is not None:
+        mascara &= (tabela['hora_int'] <= int(hora_fim)).to_numpy(dtype=bool, na_value=False)
+    if condicao:
+        mascara &= (tabela['condicao_metereologica_x'] == str(condicao).strip()).to_numpy(dtype=bool, na_value=False)
+    return tabela.take(np.flatnonzero(mascara))
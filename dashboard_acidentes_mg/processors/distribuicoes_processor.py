@@ -1,27 +1,27 @@
 ﻿import pandas as pd
-from processors.utils import load_data, save_json, clean_string
+from processors.utils import load_data, save_json
+from processors.aggregations import clean_column, aggregate_by, percentages, to_records
+
+# Colunas lidas por este processador (projeção na leitura do snapshot)
+COLUNAS = ['id', 'tipo_acidente_x', 'fase_dia_x', 'condicao_metereologica_x']
 
 def calcular_distribuicao(df, coluna):
     if df.empty:
         return []
-        
-    df_temp = df.copy()
-    df_temp['valor_limpo'] = df_temp[coluna].apply(clean_string)
-    dist = df_temp[df_temp['valor_limpo'].notna()].groupby('valor_limpo').agg({'id': 'nunique'}).reset_index()
-    dist.columns = ['categoria', 'total']
-    
-    total_geral = dist['total'].sum()
+
+    valor_limpo = clean_column(df[coluna]).rename('valor_limpo')
+    validos = valor_limpo.notna()
+    dist = aggregate_by(df[validos], valor_limpo[validos], [])
+    dist.columns = ['name', 'value']
+
+    total_geral = dist['value'].sum()
     if total_geral == 0:
         return []
 
-    return [
-        {
-            "name": str(r['categoria']), 
-            "value": int(r['total']), 
-            "percentual": round((r['total']/total_geral)*100, 2)
-        } 
-        for _, r in dist.sort_values('total', ascending=False).iterrows()
-    ]
+    dist = dist.sort_values('value', ascending=False)
+    dist['name'] = dist['name'].astype(str)
+    dist['percentual'] = percentages(dist['value'], total_geral)
+    return to_records(dist, inteiros=('value',))
 
 def process_distribuicoes(df_input=None, save=True):
     print("\n📊 Processando distribuições...")
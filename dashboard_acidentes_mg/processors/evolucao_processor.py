@@ -1,14 +1,18 @@
 import pandas as pd
-from processors.utils import load_data, save_json, get_month_year
+from processors.utils import load_data, save_json
+from processors.aggregations import month_key, aggregate_by, to_records
 
-def process_evolucao_mensal(df_input=None, save=True):
+# Colunas lidas por este processador (projeção na leitura do snapshot)
+COLUNAS = ['id', 'mortos_x', 'feridos']
+
+def process_evolucao_mensal(df_input=None, save=True, tabela=False):
     print("\n📈 Processando evolução mensal...")
     df_master = df_input if df_input is not None else load_data()[0]
-    df_master['ano_mes'] = df_master['data_inversa_x'].apply(get_month_year)
-    evolucao = df_master.groupby('ano_mes').agg({'id': 'nunique', 'mortos_x': 'sum', 'feridos': 'sum'}).reset_index()
+    evolucao = aggregate_by(df_master, month_key(df_master).rename('ano_mes'), ['mortos_x', 'feridos'])
     evolucao.columns = ['mes', 'total_acidentes', 'total_mortos', 'total_feridos']
     evolucao = evolucao.sort_values('mes')
-    evolucao_list = [{"mes": r['mes'], "total_acidentes": int(r['total_acidentes']), "total_mortos": int(r['total_mortos']), "total_feridos": int(r['total_feridos'])} for _, r in evolucao.iterrows()]
+    # tabela=True mantém o DataFrame (resposta Arrow); o padrão é a lista de registros
+    evolucao_list = evolucao.reset_index(drop=True) if tabela else to_records(evolucao, inteiros=('total_acidentes', 'total_mortos', 'total_feridos'))
     resultado = {"evolucao": evolucao_list, "metadata": {"ultima_atualizacao": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}}
     if save: save_json(resultado, 'evolucao_mensal.json')
     return resultado
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# ÍNDICE DE BITMAPS
+# =========================
+class FilterIndex:
+    """Bitmaps (1 bit por linha) por valor distinto das colunas de filtro.
+
+    Um filtro vira um AND entre bitmaps e devolve só as posições das linhas
+    selecionadas, sem copiar o DataFrame. Para a hora há um bitmap cumulativo
+    por hora (linhas com hora <= h), e um intervalo [a, b] sai de
+    ate[b] AND NOT ate[a-1].
+    """
+
+    def __init__(self, df, colunas, coluna_hora=None):
+        self.n = len(df)
+        self._bytes = (self.n + 7) // 8
+        self.bitmaps = {}
+        for col in colunas:
+            if col not in df.columns:
+                continue
+            codigos, valores = pd.factorize(df[col])
+            self.bitmaps[col] = {
+                valor: np.packbits(codigos == i) for i, valor in enumerate(valores)
+            }
+        self.ate_hora = None
+        if coluna_hora is not None and coluna_hora in df.columns:
+            horas = pd.to_numeric(df[coluna_hora], errors='coerce').to_numpy(dtype=float)
+            self.ate_hora = [np.packbits(horas <= h) for h in range(24)]
+
+    def _vazio(self):
+        return np.zeros(self._bytes, dtype=np.uint8)
+
+    def _cheio(self):
+        return np.full(self._bytes, 0xFF, dtype=np.uint8)
+
+    def bitmap(self, coluna, valor):
+        return self.bitmaps.get(coluna, {}).get(valor, self._vazio())
+
+    def bitmap_horas(self, hora_inicio=None, hora_fim=None):
+        fim = 23 if hora_fim is None else min(int(hora_fim), 23)
+        if fim < 0:
+            return self._vazio()
+        resultado = self.ate_hora[fim]
+        if hora_inicio is not None and int(hora_inicio) > 0:
+            resultado = resultado & ~self.ate_hora[min(int(hora_inicio), 24) - 1]
+        return resultado
+
+    def selecionar(self, filtros=None, hora_inicio=None, hora_fim=None):
+        """Posições das linhas que atendem a todos os filtros (None = sem filtro).
+
+        `filtros` mapeia coluna -> valor já normalizado como está no DataFrame.
+        """
+        acumulado = self._combinar(filtros, hora_inicio, hora_fim)
+        if acumulado is None:
+            return None
+        return np.flatnonzero(np.unpackbits(acumulado, count=self.n))
+
+    def contem(self, posicoes, filtros=None, hora_inicio=None, hora_fim=None):
+        """Máscara booleana: quais das `posicoes` atendem aos filtros.
+
+        Lê só os bits dessas posições, útil quando o candidato já é um
+        subconjunto pequeno (ex.: um trecho de rodovia do índice de km).
+        """
+        posicoes = np.asarray(posicoes, dtype=np.int64)
+        acumulado = self._combinar(filtros, hora_inicio, hora_fim)
+        if acumulado is None:
+            return np.ones(len(posicoes), dtype=bool)
+        return ((acumulado[posicoes >> 3] >> (7 - (posicoes & 7))) & 1).astype(bool)
+
+    def _combinar(self, filtros, hora_inicio, hora_fim):
+        partes = [self.bitmap(col, valor) for col, valor in (filtros or {}).items()]
+        if self.ate_hora is not None and (hora_inicio is not None or hora_fim is not None):
+            partes.append(self.bitmap_horas(hora_inicio, hora_fim))
+        if not partes:
+            return None
+        acumulado = self._cheio()
+        for parte in partes:
+            np.bitwise_and(acumulado, parte, out=acumulado)
+        return acumulado
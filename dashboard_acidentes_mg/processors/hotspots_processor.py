@@ -0,0 +1,237 @@
+import os
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from processors import utils
+from processors.utils import load_data, save_json
+from processors.aggregations import clean_column, severity_index
+from processors.km_index import normalizar_br, km_numerico
+
+# Colunas lidas por este processador
+COLUNAS = ['id', 'ano', 'br_x', 'km_x', 'municipio_x', 'causa_acidente_x', 'mortos_x', 'feridos_graves_x', 'feridos_leves_x']
+
+ARQUIVO_HOTSPOTS = 'hotspots.json'
+_CARREGADO_LOCK = threading.Lock()
+_CARREGADO = {"mtime": None, "dados": None}
+_GERACAO_LOCK = threading.Lock()
+_GERACAO = {"thread": None}
+
+
+# =========================
+# JANELA DESLIZANTE POR BR
+# =========================
+# Cada acidente (um por id: o CSV traz uma linha por pessoa/veículo) abre uma
+# janela [km, km + janela_km] sobre os km ordenados da BR. O score da janela é a soma dos pesos (1 + índice de gravidade de cada
+# acidente), obtida por searchsorted + diferença de somas acumuladas. As
+# melhores janelas que não se sobrepõem viram hotspots.
+def _mais_frequente(valores):
+    serie = pd.Series(valores).dropna()
+    return str(serie.value_counts().index[0]) if not serie.empty else "Não Informado"
+
+
+def hotspots_br(br, km, mortos, feridos_graves, feridos_leves, causas, municipios,
+                janela_km=2.0, min_acidentes=5, max_por_br=20):
+    """Hotspots de uma BR. Recebe só arrays para poder rodar em outro processo."""
+    ordem = np.argsort(km, kind='stable')
+    km = km[ordem]
+    mortos, feridos_graves, feridos_leves = mortos[ordem], feridos_graves[ordem], feridos_leves[ordem]
+    peso = 1 + severity_index(mortos, feridos_graves, feridos_leves)
+    acum = np.concatenate([[0], np.cumsum(peso)])
+
+    inicio = np.arange(len(km))
+    fim = np.searchsorted(km, km + janela_km, side='right')
+    score = acum[fim] - acum[inicio]
+    candidatos = np.flatnonzero(fim - inicio >= min_acidentes)
+    candidatos = candidatos[np.argsort(-score[candidatos], kind='stable')]
+
+    ocupado = np.zeros(len(km), dtype=bool)
+    hotspots = []
+    for i in candidatos:
+        j = fim[i]
+        if ocupado[i:j].any():
+            continue
+        ocupado[i:j] = True
+        linhas = ordem[i:j]
+        m, g, l = int(mortos[i:j].sum()), int(feridos_graves[i:j].sum()), int(feridos_leves[i:j].sum())
+        hotspots.append({
+            "br": br,
+            "km_inicio": round(float(km[i]), 1),
+            "km_fim": round(float(km[j - 1]), 1),
+            "total_acidentes": int(j - i),
+            "mortos": m,
+            "feridos_graves": g,
+            "feridos_leves": l,
+            "indice_gravidade": utils.calculate_severity_index(m, g, l),
+            "score": float(score[i]),
+            "acidentes_por_km": round((j - i) / janela_km, 2),
+            "causa_predominante": _mais_frequente(causas[linhas]),
+            "municipio": _mais_frequente(municipios[linhas]),
+        })
+        if len(hotspots) >= max_por_br:
+            break
+    return hotspots
+
+
+def _arrays_por_br(df):
+    codigos, valores = pd.factorize(df['br_x'])
+    brs = np.array([normalizar_br(v) for v in valores] + [''], dtype=object)[codigos]
+    km = km_numerico(df['km_x'])
+    medidas = {col: pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+               for col in ['mortos_x', 'feridos_graves_x', 'feridos_leves_x']}
+    causas = clean_column(df['causa_acidente_x']).to_numpy()
+    municipios = clean_column(df['municipio_x']).to_numpy()
+    ids = df['id'].to_numpy()
+
+    validos = ~np.isnan(km) & (brs != '') & (brs != 'nan') & df['id'].notna().to_numpy()
+    for br in pd.unique(brs[validos]):
+        sel = np.flatnonzero(validos & (brs == br))
+        # Uma entrada por acidente: km, causa e município da primeira linha do
+        # id, vítimas somadas em todas as linhas dele
+        codigos, distintos = pd.factorize(ids[sel])
+        primeira = sel[np.unique(codigos, return_index=True)[1]]
+        somar = lambda col: np.bincount(codigos, weights=medidas[col][sel], minlength=len(distintos)).astype(np.int64)
+        yield br, (km[primeira], somar('mortos_x'), somar('feridos_graves_x'),
+                   somar('feridos_leves_x'), causas[primeira], municipios[primeira])
+
+
+def _recortes(df):
+    """Recortes com ranking próprio: todo o histórico (None) e cada ano."""
+    yield None, df
+    if 'ano' in df.columns:
+        anos = pd.to_numeric(df['ano'], errors='coerce').to_numpy(dtype=float)
+        for ano in np.unique(anos[~np.isnan(anos)]):
+            yield str(int(ano)), df[anos == ano]
+
+
+def _ranquear(hotspots):
+    hotspots = sorted(hotspots, key=lambda h: (-h['score'], h['br'], h['km_inicio']))
+    for posicao, h in enumerate(hotspots, start=1):
+        h['posicao'] = posicao
+    return hotspots
+
+
+def process_hotspots(df_input=None, save=True, janela_km=2.0, min_acidentes=5, max_por_br=20, workers=None):
+    print("\n🔥 Processando hotspots em todas as BRs...")
+    df_master = df_input if df_input is not None else load_data()[0]
+    versao = utils.get_dataset_version() if df_input is None else None
+
+    # Uma tarefa por (recorte, BR): o histórico completo e cada ano vão no mesmo pool
+    tarefas = [(recorte, br, arrays) for recorte, parte in _recortes(df_master) for br, arrays in _arrays_por_br(parte)]
+    parametros = dict(janela_km=janela_km, min_acidentes=min_acidentes, max_por_br=max_por_br)
+    workers = workers or min(len(tarefas), os.cpu_count() or 1)
+    if workers > 1:
+        # spawn: a geração também roda numa thread do servidor, e um fork de um
+        # processo com várias threads pode herdar locks presos
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futuros = [pool.submit(hotspots_br, br, *arrays, **parametros) for _, br, arrays in tarefas]
+            por_tarefa = [f.result() for f in futuros]
+    else:
+        por_tarefa = [hotspots_br(br, *arrays, **parametros) for _, br, arrays in tarefas]
+
+    por_recorte = {}
+    for (recorte, _, _), lista in zip(tarefas, por_tarefa):
+        por_recorte.setdefault(recorte, []).extend(lista)
+    hotspots = _ranquear(por_recorte.pop(None, []))
+    total_brs = sum(1 for recorte, _, _ in tarefas if recorte is None)
+
+    resultado = {
+        "hotspots": hotspots,
+        "por_ano": {ano: _ranquear(lista) for ano, lista in sorted(por_recorte.items())},
+        "parametros": parametros,
+        "metadata": {
+            "versao_dataset": versao,
+            "total_brs": total_brs,
+            "ultima_atualizacao": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        },
+    }
+    print(f"  ✅ {len(hotspots)} hotspots em {total_brs} BRs (+ rankings de {len(por_recorte)} anos)")
+    if save: save_json(resultado, ARQUIVO_HOTSPOTS)
+    return resultado
+
+
+# =========================
+# LEITURA DA TABELA SALVA
+# =========================
+# As requisições só leem a tabela salva. Se ela falta ou é de outra versão do
+# dataset, a geração roda numa thread de fundo (uma por vez, também disparada
+# no startup da API) e, até terminar, não há hotspots a servir.
+def carregar_hotspots():
+    """Tabela salva em data/hotspots.json, relida só quando o arquivo muda."""
+    path = utils.DATA_DIR / ARQUIVO_HOTSPOTS
+    if not path.exists():
+        return None
+    mtime = path.stat().st_mtime_ns
+    with _CARREGADO_LOCK:
+        if _CARREGADO['mtime'] != mtime:
+            with open(path, 'r', encoding='utf-8') as f:
+                _CARREGADO['dados'] = json.load(f)
+            _CARREGADO['mtime'] = mtime
+        return _CARREGADO['dados']
+
+
+def _gerar_em_fundo():
+    try:
+        process_hotspots(save=True)
+    except Exception as e:
+        print(f"❌ Erro ao gerar hotspots: {e}")
+
+
+def agendar_geracao():
+    """Dispara a geração da tabela numa thread de fundo, se já não houver uma rodando."""
+    with _GERACAO_LOCK:
+        thread = _GERACAO['thread']
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_gerar_em_fundo, name="hotspots", daemon=True)
+            _GERACAO['thread'] = thread
+            thread.start()
+
+
+def tabela_atual(gerar=False):
+    """Tabela da versão atual do dataset, ou None enquanto ela é gerada em segundo plano.
+
+    Com `gerar` (uso em lote), gera a tabela na hora em vez de agendar.
+    """
+    dados = carregar_hotspots()
+    if dados is not None and dados['metadata'].get('versao_dataset') == utils.get_dataset_version():
+        return dados
+    if gerar:
+        process_hotspots(save=True)
+        return carregar_hotspots()
+    agendar_geracao()
+    return None
+
+
+def consultar_hotspots(br=None, limite=50):
+    dados = tabela_atual()
+    if dados is None:
+        return None
+    hotspots = dados['hotspots']
+    if br:
+        chave = normalizar_br(br)
+        hotspots = [h for h in hotspots if h['br'] == chave]
+    return {"hotspots": hotspots[:limite], "parametros": dados['parametros'], "metadata": dados['metadata']}
+
+
+def trechos_criticos(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao=None, limite=10, dados=None):
+    """Trechos do ranking para os filtros de um painel (None se a tabela ainda não existe).
+
+    Há ranking do histórico completo e de cada ano; para filtros de mês, hora
+    ou condição não há ranking correspondente e a lista sai vazia.
+    """
+    if mes or condicao or hora_inicio is not None or hora_fim is not None:
+        return []
+    dados = dados if dados is not None else tabela_atual()
+    if dados is None:
+        return None
+    if ano:
+        return dados.get('por_ano', {}).get(str(utils.filtro_inteiro(ano)), [])[:limite]
+    return dados['hotspots'][:limite]
+
+
+if __name__ == "__main__":
+    process_hotspots(save=True)
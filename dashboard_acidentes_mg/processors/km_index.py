@@ -0,0 +1,128 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from processors import utils
+
+
+# =========================
+# ÍNDICE LINEAR POR BR
+# =========================
+# Para cada rodovia guarda os km ordenados, a posição de cada linha no
+# DataFrame de origem e as somas acumuladas das medidas. Qualquer faixa ou
+# tamanho de trecho sai de busca binária (searchsorted) + diferença entre
+# somas acumuladas, sem varrer o dataset.
+MEDIDAS_KM = {
+    'mortos': 'mortos_x',
+    'feridos_graves': 'feridos_graves_x',
+    'feridos_leves': 'feridos_leves_x',
+    'feridos': 'feridos',
+}
+
+_INDICE_LOCK = threading.Lock()
+_INDICE = {"versao": None, "indice": None}
+
+
+def normalizar_br(valor):
+    """'381', '381.0', ' 0381 ' e 'BR-381' viram '381' (mesma regra do process_data.py)."""
+    texto = str(valor).strip()
+    if texto[:2].upper() == 'BR':
+        texto = texto[2:].lstrip(' -')
+    if texto.endswith('.0'):
+        texto = texto[:-2]
+    return texto.lstrip('0').strip()
+
+
+def km_numerico(serie):
+    """'123,4' -> 123.4 em float64, convertendo só os valores distintos."""
+    codigos, distintos = pd.factorize(serie)
+    convertidos = pd.to_numeric(pd.Index(distintos).astype(str).str.replace(',', '.'), errors='coerce')
+    km = np.asarray(convertidos, dtype=float)[codigos]
+    km[codigos < 0] = np.nan
+    return km
+
+
+class KmIndex:
+    """km ordenados por BR com somas acumuladas das medidas."""
+
+    def __init__(self, br, km, medidas=None):
+        km = np.asarray(km, dtype=float)
+        medidas = {nome: np.asarray(valores) for nome, valores in (medidas or {}).items()}
+        self.medidas = list(medidas)
+        self.rodovias = {}
+
+        codigos, valores = pd.factorize(pd.Series(br))
+        grupos = {}
+        for i, valor in enumerate(valores):
+            grupos.setdefault(normalizar_br(valor), []).append(i)
+
+        validos = ~np.isnan(km)
+        for chave, idx in grupos.items():
+            if chave in ('', 'nan', '<NA>', 'None'):
+                continue
+            posicoes = np.flatnonzero(np.isin(codigos, idx) & validos)
+            posicoes = posicoes[np.argsort(km[posicoes], kind='stable')]
+            entrada = {"km": km[posicoes], "posicoes": posicoes, "acum": {}}
+            for nome, valores in medidas.items():
+                v = valores[posicoes]
+                v = v.astype(np.int64) if v.dtype.kind in 'iub' else v.astype(float)
+                entrada["acum"][nome] = np.concatenate([[0], np.cumsum(v)])
+            self.rodovias[chave] = entrada
+
+    def rodovia(self, br):
+        return self.rodovias.get(normalizar_br(br))
+
+    def intervalo(self, br, km_inicio=None, km_fim=None):
+        """Fatia [ini, fim) dos arrays ordenados com km_inicio <= km <= km_fim."""
+        entrada = self.rodovia(br)
+        if entrada is None:
+            return 0, 0
+        km = entrada["km"]
+        ini = 0 if km_inicio is None else int(np.searchsorted(km, km_inicio, side='left'))
+        fim = len(km) if km_fim is None else int(np.searchsorted(km, km_fim, side='right'))
+        return ini, max(ini, fim)
+
+    def km(self, br, ini=0, fim=None):
+        return self.rodovia(br)["km"][ini:fim]
+
+    def posicoes(self, br, ini=0, fim=None):
+        return self.rodovia(br)["posicoes"][ini:fim]
+
+    def somas_por_faixa(self, br, bordas, ini=0, fim=None, fechado='direita'):
+        """Contagem e somas por faixa entre bordas consecutivas, dentro da fatia [ini, fim).
+
+        fechado='direita' reproduz pd.cut(..., include_lowest=True): (a, b], com a
+        primeira faixa incluindo a borda inicial. fechado='esquerda' usa [a, b).
+        """
+        entrada = self.rodovia(br)
+        km = entrada["km"]
+        fim = len(km) if fim is None else fim
+        bordas = np.asarray(bordas, dtype=float)
+        lado = 'right' if fechado == 'direita' else 'left'
+        cortes = np.searchsorted(km, bordas, side=lado)
+        if fechado == 'direita':
+            cortes[0] = np.searchsorted(km, bordas[0], side='left')
+        cortes = cortes.clip(ini, fim)
+        resultado = {"total_acidentes": np.diff(cortes)}
+        for nome in self.medidas:
+            resultado[nome] = np.diff(entrada["acum"][nome][cortes])
+        return resultado
+
+
+def construir_indice_km(df):
+    medidas = {nome: pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy()
+               for nome, col in MEDIDAS_KM.items() if col in df.columns}
+    return KmIndex(df['br_x'], km_numerico(df['km_x']), medidas)
+
+
+def obter_indice_km():
+    """Índice da versão atual do dataset, reconstruído só quando o CSV muda."""
+    versao = utils.get_dataset_version()
+    with _INDICE_LOCK:
+        if _INDICE['versao'] != versao:
+            print(f"\n📏 Construindo índice de km por BR (versão {versao})...")
+            _INDICE['indice'] = construir_indice_km(utils.get_df())
+            _INDICE['versao'] = versao
+            print(f"  ✅ Índice pronto: {len(_INDICE['indice'].rodovias)} rodovias")
+        return _INDICE['indice']
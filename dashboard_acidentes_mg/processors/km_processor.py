@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-from processors.utils import load_data, save_json, clean_string, calculate_severity_index
+from processors.utils import load_data, save_json, calculate_severity_index
+from processors.aggregations import clean_column
 
 def process_km_distribution(df_input=None, br_selecionada=None, save=True):
     print("\n🔍 Processando distribuição espaciais por KM...")
@@ -14,7 +15,7 @@ def process_km_distribution(df_input=None, br_selecionada=None, save=True):
     
     # Tratamento da quilometragem
     # Limpa a string, troca vírgula por ponto e converte para numérico
-    df_master['km_limpo'] = df_master['km_x'].apply(clean_string).str.replace(',', '.').astype(float, errors='ignore')
+    df_master['km_limpo'] = clean_column(df_master['km_x']).str.replace(',', '.')
     df_master['km_limpo'] = pd.to_numeric(df_master['km_limpo'], errors='coerce')
     
     # Remove registros sem KM válido
@@ -43,7 +44,8 @@ def process_km_distribution(df_input=None, br_selecionada=None, save=True):
         if group.empty:
             continue
             
-        total_acidentes = int(len(group))
+        # O CSV traz uma linha por pessoa/veículo: acidentes são ids distintos
+        total_acidentes = int(group['id'].nunique())
         mortos = float(group['mortos_x'].sum())
         f_graves = float(group['feridos_graves_x'].sum())
         f_leves = float(group['feridos_leves_x'].sum())
@@ -52,8 +54,8 @@ def process_km_distribution(df_input=None, br_selecionada=None, save=True):
         severidade = calculate_severity_index(mortos, f_graves, f_leves)
         
         # Correlação: Identificar causas
-        causas_limpas = group['causa_acidente_x'].apply(clean_string)
-        causas_count = causas_limpas.value_counts()
+        causas_limpas = group.assign(causa=clean_column(group['causa_acidente_x']))
+        causas_count = causas_limpas.drop_duplicates(['id', 'causa'])['causa'].value_counts()
         
         causa_predominante = causas_count.index[0] if not causas_count.empty else "Não Informado"
         top_causas = causas_count.head(3).to_dict()
@@ -0,0 +1,148 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from processors import utils
+from processors.aggregations import clean_column, severity_index, to_records
+from processors.km_index import normalizar_br, km_numerico
+
+
+# =========================
+# PIRÂMIDE DE TRECHOS POR KM
+# =========================
+# Agregados por BR em várias resoluções, do trecho de 1 km ao de 100 km.
+# O nível de 1 km é calculado a partir das linhas e os demais são somados a
+# partir dele. Acidentes são contados por id distinto: o km é do acidente,
+# então cada id cai num único trecho e as contagens continuam aditivas. Cada nível guarda, por BR, os trechos ordenados pelo km
+# inicial, então uma janela (viewport) sai de duas buscas binárias.
+RESOLUCOES = [100, 50, 10, 5, 1]  # zoom 0 (visão geral) -> zoom 4 (detalhe)
+MAX_SEGMENTOS = 250  # limite usado na escolha automática do zoom
+MEDIDAS = {
+    'mortos': 'mortos_x',
+    'feridos_graves': 'feridos_graves_x',
+    'feridos_leves': 'feridos_leves_x',
+    'feridos': 'feridos',
+}
+
+_PIRAMIDE_LOCK = threading.Lock()
+_PIRAMIDE = {"versao": None, "piramide": None}
+
+
+def _base_fina(df):
+    """Linhas do CSV (pessoa/veículo) com id, BR normalizada, trecho de 1 km, medidas e causa."""
+    codigos, valores = pd.factorize(df['br_x'])
+    brs = np.array([normalizar_br(v) for v in valores] + [''], dtype=object)
+    base = pd.DataFrame({
+        'id': df['id'].to_numpy(),
+        'br': brs[codigos],
+        'km': km_numerico(df['km_x']),
+        'causa': clean_column(df['causa_acidente_x']),
+    })
+    for nome, col in MEDIDAS.items():
+        base[nome] = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=np.int64) if col in df.columns else 0
+    base = base[(base['br'] != '') & (base['br'] != 'nan') & base['km'].notna()]
+    base['inicio'] = np.floor(base['km']).astype(np.int64)
+    return base
+
+
+def _nivel(medidas_finas, causas_finas, resolucao):
+    """Trechos de uma resolução, somados a partir do nível de 1 km."""
+    medidas = medidas_finas.assign(inicio=medidas_finas['inicio'] // resolucao * resolucao)
+    medidas = medidas.groupby(['br', 'inicio'], sort=True).sum().reset_index()
+    medidas['km_fim'] = medidas['inicio'] + resolucao
+    medidas['indice_severidade'] = severity_index(medidas['mortos'], medidas['feridos_graves'], medidas['feridos_leves'])
+
+    causas = causas_finas.assign(inicio=causas_finas['inicio'] // resolucao * resolucao)
+    causas = causas.groupby(['br', 'inicio', 'causa'], sort=False)['qtd'].sum().reset_index()
+    causas = causas.sort_values(['br', 'inicio', 'qtd', 'causa'], ascending=[True, True, False, True])
+    top = causas.groupby(['br', 'inicio'], sort=False).head(3)
+    detalhadas = {}
+    for br, inicio, causa, qtd in zip(top['br'].tolist(), top['inicio'].tolist(), top['causa'].tolist(), top['qtd'].tolist()):
+        detalhadas.setdefault((br, inicio), {})[causa] = int(qtd)
+
+    nivel = {}
+    for br, trechos in medidas.groupby('br', sort=False):
+        registros = to_records(
+            trechos[['inicio', 'km_fim', 'total_acidentes'] + list(MEDIDAS) + ['indice_severidade']]
+            .rename(columns={'inicio': 'km_inicio'}),
+            inteiros=['km_inicio', 'km_fim', 'total_acidentes'] + list(MEDIDAS),
+        )
+        for registro in registros:
+            causas_trecho = detalhadas.get((br, registro['km_inicio']), {})
+            registro['causa_predominante'] = next(iter(causas_trecho), "Não Informado")
+            registro['causas_detalhadas'] = causas_trecho
+        nivel[br] = {"inicio": trechos['inicio'].to_numpy(), "trechos": registros}
+    return nivel
+
+
+def construir_piramide(df):
+    base = _base_fina(df)
+    agrupado = base.groupby(['br', 'inicio'], sort=True)
+    medidas_finas = agrupado[list(MEDIDAS)].sum()
+    medidas_finas.insert(0, 'total_acidentes', agrupado['id'].nunique())
+    medidas_finas = medidas_finas.reset_index()
+    causas_finas = base.dropna(subset=['causa']).groupby(['br', 'inicio', 'causa'], sort=False)['id'].nunique()
+    causas_finas = causas_finas.rename('qtd').reset_index()
+    return {resolucao: _nivel(medidas_finas, causas_finas, resolucao) for resolucao in RESOLUCOES}
+
+
+def obter_piramide():
+    """Pirâmide da versão atual do dataset, reconstruída só quando o CSV muda."""
+    versao = utils.get_dataset_version()
+    with _PIRAMIDE_LOCK:
+        if _PIRAMIDE['versao'] != versao:
+            print(f"\n🗺️ Construindo pirâmide de km (versão {versao})...")
+            _PIRAMIDE['piramide'] = construir_piramide(utils.get_df())
+            _PIRAMIDE['versao'] = versao
+            print(f"  ✅ Pirâmide pronta: resoluções {RESOLUCOES} km")
+        return _PIRAMIDE['piramide']
+
+
+# =========================
+# CONSULTA
+# =========================
+def _janela(nivel_br, resolucao, km_inicio, km_fim):
+    """Índices [ini, fim) dos trechos que cruzam o intervalo [km_inicio, km_fim]."""
+    inicio = nivel_br['inicio']
+    ini = 0 if km_inicio is None else int(np.searchsorted(inicio, km_inicio - resolucao, side='right'))
+    fim = len(inicio) if km_fim is None else int(np.searchsorted(inicio, km_fim, side='right'))
+    return ini, max(ini, fim)
+
+
+def consultar_piramide(br, zoom=None, km_inicio=None, km_fim=None, piramide=None):
+    """Trechos de uma BR no nível de zoom pedido, limitados ao viewport.
+
+    Sem `zoom`, usa a resolução mais fina que caiba em MAX_SEGMENTOS trechos
+    dentro do viewport. Devolve None se a BR não tiver dados.
+    """
+    piramide = obter_piramide() if piramide is None else piramide
+    chave = normalizar_br(br)
+    if chave not in piramide[RESOLUCOES[0]]:
+        return None
+
+    if zoom is None:
+        zoom = 0
+        for z, resolucao in enumerate(RESOLUCOES):
+            ini, fim = _janela(piramide[resolucao][chave], resolucao, km_inicio, km_fim)
+            if fim - ini <= MAX_SEGMENTOS:
+                zoom = z
+    resolucao = RESOLUCOES[zoom]
+    nivel_br = piramide[resolucao][chave]
+    ini, fim = _janela(nivel_br, resolucao, km_inicio, km_fim)
+    extremos = piramide[1][chave]['inicio']
+
+    return {
+        "br": chave,
+        "zoom": zoom,
+        "resolucao_km": resolucao,
+        "resolucoes_km": RESOLUCOES,
+        "viewport": {"km_inicio": km_inicio, "km_fim": km_fim},
+        "extensao": {"km_min": int(extremos[0]), "km_max": int(extremos[-1]) + 1},
+        "segmentos": nivel_br['trechos'][ini:fim],
+    }
+
+
+if __name__ == "__main__":
+    for resolucao, nivel in obter_piramide().items():
+        print(f"  {resolucao:>3} km: {sum(len(n['trechos']) for n in nivel.values())} trechos em {len(nivel)} BRs")
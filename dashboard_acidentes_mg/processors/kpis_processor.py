@@ -4,6 +4,10 @@ from processors.utils import (
     load_data, save_json, get_last_two_months,
     calculate_percentage_change, format_trend, calculate_severity_index
 )
+from processors.aggregations import count_accidents
+
+# Colunas lidas por este processador (projeção na leitura do snapshot)
+COLUNAS = ['id', 'mortos_x', 'feridos', 'feridos_graves_x', 'feridos_leves_x']
 
 def process_kpis(df_input=None, save=True):
     print("\n�� Processando KPIs...")
@@ -13,8 +17,8 @@ def process_kpis(df_input=None, save=True):
         df_master, _ = load_data()
     
     df_atual, df_anterior, mes_atual, mes_anterior = get_last_two_months(df_master)
-    total_acidentes_atual = df_atual['id'].nunique()
-    total_acidentes_anterior = df_anterior['id'].nunique() if not df_anterior.empty else 0
+    total_acidentes_atual = count_accidents(df_atual)
+    total_acidentes_anterior = count_accidents(df_anterior) if not df_anterior.empty else 0
     total_mortos_atual = int(df_atual['mortos_x'].sum())
     total_mortos_anterior = int(df_anterior['mortos_x'].sum()) if not df_anterior.empty else 0
     total_feridos_atual = int(df_atual['feridos'].sum())
@@ -1,41 +1,35 @@
 ﻿import pandas as pd
 import numpy as np
-from processors.utils import load_data, save_json
+from processors.utils import save_json
+from processors.km_index import obter_indice_km
+from processors.aggregations import to_records
 
-def process_linear_profile(br_target, bin_size=1, save=True):
+def process_linear_profile(br_target, bin_size=1, save=True, km_inicio=None, km_fim=None, tabela=False):
     print(f"\n🔍 Processando Perfil Linear para BR-{br_target}...")
     
-    df_master, _ = load_data()
+    # 1. Filtragem: busca binária no índice de km da BR (processors/km_index.py)
+    indice = obter_indice_km()
+    ini, fim = indice.intervalo(br_target, km_inicio, km_fim)
     
-    # 1. Filtragem e Limpeza
-    # Garante que a BR seja tratada como string para comparação
-    df_br = df_master[df_master['br_x'].astype(str) == str(br_target)].copy()
-    
-    if df_br.empty:
+    if fim <= ini:
         print(f"⚠️ Nenhum dado encontrado para a BR-{br_target}")
         return None
 
-    # Limpeza da coluna KM (converte '123,4' para 123.4)
-    df_br['km_numeric'] = pd.to_numeric(
-        df_br['km_x'].astype(str).str.replace(',', '.'), 
-        errors='coerce'
-    )
-    df_br = df_br.dropna(subset=['km_numeric'])
+    km = indice.km(br_target, ini, fim)
 
     # 2. Definição dos Bins (Intervalos de KM)
-    km_min = int(df_br['km_numeric'].min())
-    km_max = int(df_br['km_numeric'].max())
+    km_min = int(km[0])
+    km_max = int(km[-1])
     bins = np.arange(km_min, km_max + bin_size + 1, bin_size)
     
-    # 3. Agrupamento (Binning)
-    df_br['km_bin'] = pd.cut(df_br['km_numeric'], bins=bins, labels=bins[:-1], include_lowest=True)
-    
-    # 4. Cálculo de Densidade e Gravidade
-    profile_data = df_br.groupby('km_bin', observed=False).agg(
-        total_acidentes=('id', 'count'),
-        mortos=('mortos_x', 'sum'),
-        feridos_graves=('feridos_graves_x', 'sum')
-    ).reset_index()
+    # 3. e 4. Densidade e gravidade por trecho: diferenças das somas acumuladas
+    somas = indice.somas_por_faixa(br_target, bins, ini, fim, fechado='direita')
+    profile_data = pd.DataFrame({
+        'km_bin': bins[:-1],
+        'total_acidentes': somas['total_acidentes'],
+        'mortos': somas['mortos'],
+        'feridos_graves': somas['feridos_graves'],
+    })
     
     # Renomear para facilitar o frontend
     profile_data.rename(columns={'km_bin': 'km'}, inplace=True)
@@ -45,15 +39,16 @@ def process_linear_profile(br_target, bin_size=1, save=True):
     threshold = profile_data['total_acidentes'].quantile(0.9)
     profile_data['is_hotspot'] = profile_data['total_acidentes'] > threshold
     
-    # Converter para lista de dicionários para o JSON
+    # Converter para lista de dicionários para o JSON (coluna a coluna);
+    # com tabela=True o DataFrame segue como está para a resposta Arrow
     result = {
         "br": br_target,
         "bin_size": bin_size,
-        "estatisticas": profile_data.to_dict(orient='records'),
+        "estatisticas": profile_data if tabela else to_records(profile_data),
         "metadata": {
             "km_inicial": km_min,
             "km_final": km_max,
-            "total_registros": len(df_br)
+            "total_registros": int(fim - ini)
         }
     }
     
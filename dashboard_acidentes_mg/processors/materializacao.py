@@ -0,0 +1,235 @@
+import os
+import gzip
+import contextlib
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+from processors import utils
+from processors.serializacao import dumps
+from processors.cube import construir_cubo, tabela_do_painel
+from processors.kpis_processor import process_kpis, COLUNAS as COLUNAS_KPIS
+from processors.evolucao_processor import process_evolucao_mensal, COLUNAS as COLUNAS_EVOLUCAO
+from processors.causas_processor import process_causas, COLUNAS as COLUNAS_CAUSAS
+from processors.distribuicoes_processor import process_distribuicoes, COLUNAS as COLUNAS_DISTRIBUICOES
+from processors.rankings_processor import process_rankings, COLUNAS as COLUNAS_RANKINGS
+from processors.areas_criticas_processor import process_areas_criticas, COLUNAS as COLUNAS_AREAS_CRITICAS
+from processors.hotspots_processor import tabela_atual
+
+
+# =========================
+# MATERIALIZAÇÃO EM LOTE
+# =========================
+# Roda todos os painéis para cada combinação (ano, mes, condicao_met),
+# incluindo "todos" em cada dimensão, e grava os JSONs comprimidos com nome
+# igual ao hash do conteúdo. O index.json mapeia a query da API para o
+# arquivo de cada painel, para que o frontend sirva essas visões como
+# arquivos estáticos.
+#
+# Como na API, os painéis leem o cubo (processors/cube.py): para cada painel
+# o cubo é consolidado uma vez em ano/mes/condição + as dimensões que ele usa
+# (contagem de acidentes e somas já agregadas, sem o id), e cada combinação só
+# filtra essa tabela. O tamanho dela é o nº de combinações distintas desses
+# valores: poucas centenas para KPIs e evolução, mais para os rankings, que
+# cruzam município e BR.
+DESTINO_PADRAO = utils.DATA_DIR / "estatico"
+PAINEIS = {
+    "kpis": (process_kpis, COLUNAS_KPIS),
+    "evolucao": (process_evolucao_mensal, COLUNAS_EVOLUCAO),
+    "causas": (process_causas, COLUNAS_CAUSAS),
+    "distribuicoes": (process_distribuicoes, COLUNAS_DISTRIBUICOES),
+    "rankings": (process_rankings, COLUNAS_RANKINGS),
+    "areas_criticas": (process_areas_criticas, COLUNAS_AREAS_CRITICAS),
+}
+DIMENSOES_FILTRO = ['ano', 'mes', 'condicao_metereologica_x']
+
+
+def tabelas_por_painel(cubo):
+    return {nome: tabela_do_painel(cubo, colunas, filtros=DIMENSOES_FILTRO) for nome, (_, colunas) in PAINEIS.items()}
+
+
+# =========================
+# DATASET EM MEMÓRIA COMPARTILHADA
+# =========================
+# Cada coluna vira um array numpy num bloco de shared_memory: textos são
+# guardados como códigos de categoria (a lista de categorias, pequena, vai no
+# descritor) e inteiros anuláveis usam -1 como nulo. Os workers montam o
+# DataFrame sobre esses buffers, sem receber uma cópia serializada dos dados.
+def publicar_dataset(df):
+    blocos, descritor = [], {"n": len(df), "colunas": {}}
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object or isinstance(serie.dtype, pd.StringDtype):
+            serie = serie.astype('category')
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            arr, extra = serie.cat.codes.to_numpy(), {"tipo": "categoria", "categorias": serie.cat.categories.tolist()}
+        elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+            arr, extra = serie.fillna(-1).to_numpy(dtype=serie.dtype.numpy_dtype), {"tipo": "anulavel"}
+        else:
+            arr, extra = serie.to_numpy(), {"tipo": "numerico"}
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        blocos.append(shm)
+        descritor["colunas"][col] = {"shm": shm.name, "dtype": arr.dtype.str, **extra}
+    return blocos, descritor
+
+
+def anexar_dataset(descritor):
+    """DataFrame apoiado nos blocos compartilhados; devolve também os blocos (mantê-los vivos)."""
+    blocos, colunas = [], {}
+    for col, info in descritor["colunas"].items():
+        shm = shared_memory.SharedMemory(name=info["shm"])
+        blocos.append(shm)
+        arr = np.ndarray((descritor["n"],), dtype=np.dtype(info["dtype"]), buffer=shm.buf)
+        if info["tipo"] == "categoria":
+            colunas[col] = pd.Categorical.from_codes(arr, categories=info["categorias"])
+        elif info["tipo"] == "anulavel":
+            colunas[col] = pd.arrays.IntegerArray(arr, arr == -1)
+        else:
+            colunas[col] = arr
+    return pd.DataFrame(colunas, copy=False), blocos
+
+
+# =========================
+# WORKERS
+# =========================
+_WORKER = {}
+
+
+def _iniciar_worker(descritores, destino, hotspots):
+    _WORKER["tabelas"], _WORKER["blocos"] = {}, []
+    for nome, descritor in descritores.items():
+        _WORKER["tabelas"][nome], blocos = anexar_dataset(descritor)
+        _WORKER["blocos"].extend(blocos)
+    _WORKER["destino"] = destino
+    # Tabela de hotspots carregada uma vez no processo pai (trechos críticos por ano)
+    _WORKER["hotspots"] = hotspots
+
+
+def chave_combinacao(ano=None, mes=None, condicao_met=None):
+    """Mesma query string que a API recebe, com parâmetros vazios omitidos e ordenados."""
+    params = {"ano": ano, "mes": f"{int(mes):02d}" if mes else None, "condicao_met": condicao_met}
+    return urlencode(sorted((k, v) for k, v in params.items() if v not in (None, "")))
+
+
+def _sem_horario(dados):
+    # O horário de geração muda a cada chamada e faria painéis iguais virarem
+    # arquivos diferentes; no lote ele fica só no index.json (gerado_em)
+    metadata = {k: v for k, v in dados.get("metadata", {}).items() if k != "ultima_atualizacao"}
+    dados = {k: v for k, v in dados.items() if k != "metadata"}
+    if metadata:
+        dados["metadata"] = metadata
+    return dados
+
+
+def gravar_artefato(dados, destino):
+    """Grava o JSON comprimido com nome = sha256 do conteúdo; devolve o caminho relativo."""
+    corpo = dumps(_sem_horario(dados))
+    digest = hashlib.sha256(corpo).hexdigest()
+    relativo = os.path.join("objetos", digest[:2], f"{digest}.json.gz")
+    caminho = os.path.join(destino, relativo)
+    if not os.path.exists(caminho):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp = f"{caminho}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(corpo, compresslevel=9, mtime=0))
+        os.replace(tmp, caminho)
+    return relativo.replace(os.sep, '/')
+
+
+def _filtrar(tabela, ano, mes, condicao):
+    mascara = np.ones(len(tabela), dtype=bool)
+    if ano is not None:
+        mascara &= (tabela['ano'] == ano).to_numpy(dtype=bool, na_value=False)
+    if mes is not None:
+        mascara &= (tabela['mes'] == mes).to_numpy(dtype=bool, na_value=False)
+    if condicao is not None:
+        mascara &= (tabela['condicao_metereologica_x'] == condicao).to_numpy(dtype=bool, na_value=False)
+    return tabela.take(np.flatnonzero(mascara))
+
+
+def materializar_combinacao(combinacao):
+    ano, mes, condicao = combinacao
+    artefatos = {}
+    for nome, (processar, _) in PAINEIS.items():
+        fatia = _filtrar(_WORKER["tabelas"][nome], ano, mes, condicao)
+        if fatia.empty:
+            return None
+        extras = {}
+        if nome == "areas_criticas":
+            extras = {"filtros": {"ano": ano, "mes": mes, "condicao": condicao}, "hotspots": _WORKER["hotspots"]}
+        artefatos[nome] = gravar_artefato(processar(df_input=fatia, save=False, **extras), _WORKER["destino"])
+    return chave_combinacao(ano, mes, condicao), artefatos
+
+
+def _silencioso(combinacao):
+    # Os processadores imprimem o progresso; no lote isso viraria milhares de linhas
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return materializar_combinacao(combinacao)
+
+
+# =========================
+# EXECUÇÃO
+# =========================
+def combinacoes(df):
+    anos = [None] + sorted(int(a) for a in df['ano'].dropna().unique())
+    meses = [None] + sorted(int(m) for m in df['mes'].dropna().unique())
+    condicoes = [None] + sorted(str(c) for c in df['condicao_metereologica_x'].dropna().unique())
+    return [(a, m, c) for a in anos for m in meses for c in condicoes]
+
+
+def materializar(destino=DESTINO_PADRAO, workers=None):
+    print("\n🏭 Materializando artefatos estáticos para todas as combinações de filtros...")
+    destino = os.fspath(destino)
+    os.makedirs(destino, exist_ok=True)
+    df = utils.get_df()
+    versao = utils.get_dataset_version()
+    tarefas = combinacoes(df)
+    print(f"  🔢 {len(tarefas)} combinações x {len(PAINEIS)} painéis")
+
+    hotspots = tabela_atual(gerar=True)
+
+    blocos, descritores = [], {}
+    indice = {}
+    try:
+        for nome, tabela in tabelas_por_painel(construir_cubo(df)).items():
+            blocos_tabela, descritores[nome] = publicar_dataset(tabela)
+            blocos.extend(blocos_tabela)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                 initializer=_iniciar_worker, initargs=(descritores, destino, hotspots)) as pool:
+            for resultado in pool.map(_silencioso, tarefas, chunksize=8):
+                if resultado is not None:
+                    indice[resultado[0]] = resultado[1]
+    finally:
+        for shm in blocos:
+            shm.close()
+            shm.unlink()
+
+    conteudo = {
+        "versao_dataset": versao,
+        "gerado_em": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "paineis": list(PAINEIS),
+        "combinacoes": indice,
+    }
+    tmp = os.path.join(destino, "index.json.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(destino, "index.json"))
+
+    arquivos = {a for artefatos in indice.values() for a in artefatos.values()}
+    print(f"  ✅ {len(indice)} combinações com dados, {len(arquivos)} arquivos distintos em {destino}")
+    return conteudo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materializa os painéis para todas as combinações de filtros")
+    parser.add_argument("--destino", default=str(DESTINO_PADRAO))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    materializar(destino=args.destino, workers=args.workers)
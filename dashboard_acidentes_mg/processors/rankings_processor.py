@@ -1,5 +1,9 @@
 ﻿import pandas as pd
-from processors.utils import load_data, save_json, clean_string
+from processors.utils import load_data, save_json
+from processors.aggregations import clean_column, aggregate_by, top_n, to_records
+
+# Colunas lidas por este processador (projeção na leitura do snapshot)
+COLUNAS = ['id', 'municipio_x', 'br_x', 'mortos_x', 'feridos']
 
 def process_rankings(df_input=None, save=True):
     print("\n🏆 Processando rankings...")
@@ -11,23 +15,19 @@ def process_rankings(df_input=None, save=True):
         return resultado
 
     def get_rank(df, col, label):
-        df_temp = df.copy()
-        df_temp['limpo'] = df_temp[col].apply(clean_string)
+        limpo = clean_column(df[col]).rename(label)
         # Filtra nulos e agrupa com segurança
-        rank = df_temp[df_temp['limpo'].notna()].groupby('limpo').agg({
-            'id': 'nunique', 
-            'mortos_x': 'sum', 
-            'feridos': 'sum'
-        }).reset_index()
+        validos = limpo.notna()
+        rank = aggregate_by(df[validos], limpo[validos], ['mortos_x', 'feridos'])
         rank.columns = [label, 'total_acidentes', 'total_mortos', 'total_feridos']
-        return rank.sort_values('total_acidentes', ascending=False).head(10)
+        return top_n(rank, 10, 'total_acidentes')
 
     rank_mun = get_rank(df_master, 'municipio_x', 'municipio')
     rank_br = get_rank(df_master, 'br_x', 'br')
     
     resultado = {
-        "top_municipios": [{"posicao": i+1, **r.to_dict()} for i, r in rank_mun.reset_index(drop=True).iterrows()],
-        "top_brs": [{"posicao": i+1, **r.to_dict()} for i, r in rank_br.reset_index(drop=True).iterrows()],
+        "top_municipios": [{"posicao": i+1, **r} for i, r in enumerate(to_records(rank_mun))],
+        "top_brs": [{"posicao": i+1, **r} for i, r in enumerate(to_records(rank_br))],
         "metadata": {"ultima_atualizacao": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}
     }
     if save: save_json(resultado, 'rankings.json')
@@ -0,0 +1,206 @@
+import asyncio
+import inspect
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from processors import serializacao
+from processors.serializacao import dumps
+
+
+# =========================
+# CACHE DE RESPOSTAS
+# =========================
+class ResponseCache:
+    """LRU de corpos de resposta limitado por nº de entradas e por bytes."""
+
+    def __init__(self, max_entradas=512, max_bytes=64 * 1024 * 1024):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        # Requisições idênticas em andamento (single-flight): chave -> concurrent Future
+        self.em_andamento = {}
+
+    @staticmethod
+    def chave(caminho, query_params, versao, formato=None):
+        """Normaliza a query: ordena, ignora parâmetros vazios e padroniza `mes`.
+
+        `formato` separa as variantes negociadas pelo Accept (JSON / Arrow).
+        """
+        itens = []
+        for nome, valor in query_params.multi_items():
+            valor = valor.strip()
+            if valor == "":
+                continue
+            if nome == "mes" and valor.isdigit():
+                valor = valor.zfill(2)
+            itens.append((nome, valor))
+        return (versao, caminho, tuple(sorted(itens)), formato)
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+            return entrada
+
+    def put(self, chave, corpo, headers):
+        """Guarda o corpo com os cabeçalhos do endpoint (sem Content-Length) e o ETag."""
+        etag = '"' + hashlib.sha1(corpo).hexdigest()[:20] + '"'
+        entrada = (corpo, headers, etag)
+        if len(corpo) > self.max_bytes:
+            return entrada
+        with self._lock:
+            antigo = self._entradas.pop(chave, None)
+            if antigo is not None:
+                self.total_bytes -= len(antigo[0])
+            self._entradas[chave] = entrada
+            self.total_bytes += len(corpo)
+            while self._entradas and (len(self._entradas) > self.max_entradas or self.total_bytes > self.max_bytes):
+                _, removido = self._entradas.popitem(last=False)
+                self.total_bytes -= len(removido[0])
+        return entrada
+
+
+def _cabecalhos_originais(response):
+    """Cabeçalhos do endpoint, menos o Content-Length (recalculado a cada resposta)."""
+    return {k: v for k, v in response.headers.items() if k != "content-length"}
+
+
+def _responder(entrada, request):
+    corpo, originais, etag = entrada
+    # Os cabeçalhos do endpoint voltam em hits e 304; ETag e validação são do cache
+    headers = dict(originais)
+    vary = [v.strip() for v in headers.get("vary", "").split(",") if v.strip()]
+    if "accept" not in [v.lower() for v in vary]:
+        vary.append("Accept")
+    headers.update({"etag": etag, "cache-control": "no-cache", "vary": ", ".join(vary)})
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        headers.pop("content-type", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, headers=headers)
+
+
+def instalar_cache(app, obter_versao, prefixo="/api/", cache=None):
+    """Registra o middleware de cache para os GETs sob `prefixo`.
+
+    A chave inclui a versão do dataset (`obter_versao()`), então uma troca de
+    dados invalida tudo sem limpeza explícita. Chame antes de adicionar o
+    CORSMiddleware para que os cabeçalhos de CORS fiquem fora do cache.
+    """
+    cache = cache or ResponseCache()
+
+    @app.middleware("http")
+    async def cache_de_respostas(request, call_next):
+        if request.method != "GET" or not request.url.path.startswith(prefixo):
+            return await call_next(request)
+        try:
+            versao = await run_in_threadpool(obter_versao)
+        except Exception:
+            return await call_next(request)
+
+        chave = cache.chave(request.url.path, request.query_params, versao,
+                            MEDIA_ARROW if aceita_arrow(request) else None)
+        entrada = cache.get(chave)
+        if entrada is None:
+            with cache._lock:
+                pendente = cache.em_andamento.get(chave)
+                lider = pendente is None
+                if lider:
+                    pendente = cache.em_andamento[chave] = Future()
+            if not lider:
+                # Outra requisição idêntica já está calculando: espera o resultado dela
+                entrada = await asyncio.wrap_future(pendente)
+                if entrada is None:
+                    return await call_next(request)
+        if entrada is not None:
+            return _responder(entrada, request)
+
+        try:
+            response = await call_next(request)
+            corpo = b"".join([parte async for parte in response.body_iterator])
+            # Erros e respostas marcadas como no-store (dados ainda em geração) não entram no cache
+            if response.status_code != 200 or 'no-store' in response.headers.get('cache-control', ''):
+                pendente.set_result(None)
+                return Response(content=corpo, status_code=response.status_code,
+                                media_type=response.media_type, headers=_cabecalhos_originais(response))
+            entrada = cache.put(chave, corpo, _cabecalhos_originais(response))
+            pendente.set_result(entrada)
+        except BaseException:
+            if not pendente.done():
+                pendente.set_result(None)
+            raise
+        finally:
+            with cache._lock:
+                cache.em_andamento.pop(chave, None)
+        return _responder(entrada, request)
+
+    app.state.response_cache = cache
+    return cache
+
+
+# =========================
+# RESPOSTAS HTTP
+# =========================
+class RespostaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+
+
+def aceita_arrow(request):
+    """Negociação de conteúdo: Arrow IPC só quando o Accept pede e o pyarrow existe."""
+    return serializacao.pa is not None and MEDIA_ARROW in request.headers.get("accept", "")
+
+
+class RespostaArrow(Response):
+    """Resposta colunar: `content` é o dict da resposta JSON e `tabela` a chave do DataFrame."""
+    media_type = MEDIA_ARROW
+
+    def __init__(self, content, tabela, **kwargs):
+        self.tabela = tabela
+        super().__init__(content, **kwargs)
+
+    def render(self, content):
+        return serializacao.arrow_ipc(content, self.tabela)
+
+
+class RotaJSON(APIRoute):
+    """Rota que devolve o retorno do endpoint já como RespostaJSON.
+
+    O FastAPI passa dicts pelo jsonable_encoder (que percorre e copia cada
+    valor) antes de serializar; quando o endpoint já devolve uma Response esse
+    passo é pulado. Use com `app.router.route_class = RotaJSON` antes de
+    declarar as rotas.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _embrulhar(endpoint, kwargs.get("status_code") or 200), **kwargs)
+
+
+def _como_resposta(valor, status_code):
+    return valor if isinstance(valor, Response) else RespostaJSON(content=valor, status_code=status_code)
+
+
+def _embrulhar(endpoint, status_code=200):
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def rota(*args, **kwargs):
+            return _como_resposta(await endpoint(*args, **kwargs), status_code)
+    else:
+        @functools.wraps(endpoint)
+        def rota(*args, **kwargs):
+            return _como_resposta(endpoint(*args, **kwargs), status_code)
+    return rota
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # sem orjson, cai para o json da biblioteca padrão
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow é opcional: sem ele só há JSON
+    pa = None
+
+from processors.aggregations import to_records
+
+
+# =========================
+# CODIFICAÇÃO JSON
+# =========================
+# Um único codificador para as respostas HTTP e para os arquivos em data/.
+# Com orjson os arrays e escalares numpy são escritos direto, sem virar
+# objetos Python antes; DataFrames viram lista de registros montada coluna a
+# coluna (to_records). Datas saem como str(), igual ao default=str que o
+# save_json usava.
+if orjson is not None:
+    _OPCOES = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _padrao(obj):
+    if isinstance(obj, pd.DataFrame):
+        return to_records(obj)
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    return str(obj)
+
+
+def dumps(dados, indentar=False):
+    """JSON em bytes UTF-8. `indentar` usa 2 espaços (arquivos legíveis)."""
+    if orjson is not None:
+        return orjson.dumps(dados, default=_padrao, option=_OPCOES | (orjson.OPT_INDENT_2 if indentar else 0))
+    texto = json.dumps(dados, ensure_ascii=False, default=_padrao,
+                       indent=2 if indentar else None, separators=None if indentar else (',', ':'))
+    return texto.encode('utf-8')
+
+
+# =========================
+# ARROW IPC (COLUNAR)
+# =========================
+# Para gráficos: a tabela vai como um stream Arrow IPC, coluna a coluna, e os
+# demais campos da resposta (br, bin_size, metadata...) vão em JSON nos
+# metadados do schema (chave "campos"); a chave "tabela" diz onde a tabela
+# ficaria na resposta JSON. Colunas numéricas do DataFrame são repassadas ao
+# Arrow sem cópia.
+def _coluna_arrow(serie):
+    if serie.dtype == object and len(serie) and isinstance(serie.iloc[0], dict):
+        # dicts de contagens (ex.: causas_detalhadas) viram map<string, int64>
+        return pa.array([list(d.items()) for d in serie], type=pa.map_(pa.string(), pa.int64()))
+    return pa.Array.from_pandas(serie)
+
+
+def arrow_ipc(dados, chave):
+    """Stream Arrow IPC com a tabela `dados[chave]` (um DataFrame) e os demais campos em metadados."""
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível gerar Arrow IPC.")
+    tabela = dados[chave]
+    campos = {k: v for k, v in dados.items() if k != chave}
+    tabela = pa.table({str(col): _coluna_arrow(tabela[col]) for col in tabela.columns})
+    tabela = tabela.replace_schema_metadata({"tabela": chave, "campos": dumps(campos)})
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return saida.getvalue().to_pybytes()
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow é opcional: sem ele o serviço continua lendo o CSV
+    pa = ds = None
+
+from processors import utils
+
+
+# =========================
+# CAMINHOS
+# =========================
+SNAPSHOT_DIR = utils.BASE_DIR / "dados_historicos" / "snapshot"
+SNAPSHOT_META = "_snapshot.json"
+# Posição da linha no CSV: o particionamento agrupa as linhas por ano/mes e a
+# leitura restaura a ordem original, para que o snapshot devolva as mesmas
+# linhas, na mesma ordem, que a leitura do CSV master.
+COL_LINHA = "linha_origem"
+
+
+def _particionamento():
+    return ds.partitioning(pa.schema([('ano', pa.int16()), ('mes', pa.int8())]), flavor='hive')
+
+
+# =========================
+# CONSTRUÇÃO
+# =========================
+def _colunas_derivadas(df):
+    """Colunas calculadas uma única vez no build em vez de a cada requisição."""
+    df['km_num'] = pd.to_numeric(df['km_x'].astype(str).str.replace(',', '.'), errors='coerce')
+    for col in ['mortos_x', 'feridos_graves_x', 'feridos_leves_x']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(np.int32)
+    if 'feridos' not in df.columns:
+        df['feridos'] = df['feridos_graves_x'] + df['feridos_leves_x']
+    df['feridos'] = pd.to_numeric(df['feridos'], errors='coerce').fillna(0).astype(np.int32)
+    df['indice_gravidade'] = utils.calculate_severity_index(df['mortos_x'], df['feridos_graves_x'], df['feridos_leves_x'])
+    df['br_limpa'] = df['br_x'].astype('string').str.strip()
+    df['municipio_limpo'] = df['municipio_x'].astype('string').str.strip()
+    return df
+
+
+def construir_snapshot(df=None, destino=SNAPSHOT_DIR):
+    """Grava o dataset particionado por ano/mes (hive) com colunas já tipadas.
+
+    O build acontece em um diretório temporário que substitui o anterior no
+    final, para que leitores nunca vejam um snapshot pela metade.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado; não é possível gerar o snapshot.")
+    print("\n🧊 Gerando snapshot Parquet particionado...")
+    df = utils.get_df() if df is None else df.copy(deep=False)
+    df = _colunas_derivadas(df)
+    df[COL_LINHA] = np.arange(len(df), dtype=np.int64)
+    df['ano'] = df['data_inversa_x'].dt.year.astype('Int16')
+    df['mes'] = df['data_inversa_x'].dt.month.astype('Int8')
+    df['hora_int'] = df['hora_int'].astype('Int8')
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype('string')
+
+    destino = os.fspath(destino)
+    tmp = destino + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(tabela, tmp, format='parquet', partitioning=_particionamento(),
+                     existing_data_behavior='overwrite_or_ignore')
+
+    stat = utils.CSV_MASTER.stat() if utils.CSV_MASTER.exists() else None
+    meta = {
+        "origem": str(utils.CSV_MASTER),
+        "origem_mtime_ns": stat.st_mtime_ns if stat else None,
+        "origem_tamanho": stat.st_size if stat else None,
+        "linhas": int(len(df)),
+        "gerado_em": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(os.path.join(tmp, SNAPSHOT_META), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    antigo = destino + ".old"
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(destino):
+        os.replace(destino, antigo)
+    os.replace(tmp, destino)
+    shutil.rmtree(antigo, ignore_errors=True)
+    print(f"  ✅ Snapshot salvo em: {destino} ({len(df)} linhas)")
+    return meta
+
+
+# =========================
+# LEITURA
+# =========================
+def snapshot_disponivel(destino=SNAPSHOT_DIR):
+    """O snapshot só é usado se existir e corresponder ao CSV atual (quando houver CSV)."""
+    meta_path = os.path.join(os.fspath(destino), SNAPSHOT_META)
+    if pa is None or not os.path.exists(meta_path):
+        return False
+    if not utils.CSV_MASTER.exists():
+        return True
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    stat = utils.CSV_MASTER.stat()
+    return meta.get("origem_mtime_ns") == stat.st_mtime_ns and meta.get("origem_tamanho") == stat.st_size
+
+
+def ler_snapshot(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao=None, colunas=None, destino=SNAPSHOT_DIR):
+    """Lê só as partições e colunas necessárias.
+
+    ano/mes podam diretórios inteiros; hora e condição são empurradas para o
+    leitor Parquet, que descarta row groups pelas estatísticas.
+    """
+    dataset = ds.dataset(os.fspath(destino), format='parquet', partitioning=_particionamento(),
+                         exclude_invalid_files=True, ignore_prefixes=['_', '.'])
+    filtro = None
+    condicoes = []
+    if ano:
+        condicoes.append(ds.field('ano') == utils.filtro_inteiro(ano))
+    if mes:
+        condicoes.append(ds.field('mes') == utils.filtro_inteiro(mes))
+    if hora_inicio is not None:
+        condicoes.append(ds.field('hora_int') >= int(hora_inicio))
+    if hora_fim is not None:
+        condicoes.append(ds.field('hora_int') <= int(hora_fim))
+    if condicao:
+        condicoes.append(ds.field('condicao_metereologica_x') == condicao)
+    for c in condicoes:
+        filtro = c if filtro is None else filtro & c
+
+    if colunas is not None:
+        colunas = [c for c in dict.fromkeys(list(colunas) + ['ano', 'mes', COL_LINHA]) if c in dataset.schema.names]
+    df = dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+    if COL_LINHA in df.columns:
+        df = df.sort_values(COL_LINHA, kind='stable').drop(columns=COL_LINHA).reset_index(drop=True)
+
+    # Mesmo contrato de get_df(): ano/mes como inteiros
+    df['ano'] = df['ano'].astype('Int16')
+    df['mes'] = df['mes'].astype('Int8')
+    return df
+
+
+if __name__ == "__main__":
+    construir_snapshot()
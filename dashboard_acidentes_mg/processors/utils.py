@@ -1,9 +1,14 @@
 import pandas as pd
 import numpy as np
-import json
 import os
+import csv
+import hashlib
+import threading
 from pathlib import Path
 
+from processors.aggregations import clean_column, month_key
+from processors.serializacao import dumps
+
 
 # =========================
 # CAMINHOS
@@ -17,17 +22,162 @@ DATA_DIR = BASE_DIR / "data"
 # =========================
 # LEITURA DO CSV
 # =========================
-def get_df():
-    if not CSV_MASTER.exists():
-        raise FileNotFoundError(f"CSV não encontrado em: {CSV_MASTER}")
-    df = pd.read_csv(CSV_MASTER, sep=';', encoding='utf-8', low_memory=False)
+# Perfil de carga enxuto: só as colunas usadas pelo dashboard, textos de baixa
+# cardinalidade como categorias e contagens em inteiros pequenos.
+COLUNAS_DASHBOARD = [
+    'id', 'data_inversa_x', 'horario_x', 'municipio_x', 'br_x', 'km_x',
+    'causa_acidente_x', 'tipo_acidente_x', 'fase_dia_x', 'condicao_metereologica_x',
+    'mortos_x', 'feridos_graves_x', 'feridos_leves_x', 'feridos',
+]
+COLUNAS_CATEGORICAS = [
+    'municipio_x', 'br_x', 'km_x', 'causa_acidente_x', 'tipo_acidente_x',
+    'fase_dia_x', 'condicao_metereologica_x',
+]
+COLUNAS_VITIMAS = ['mortos_x', 'feridos_graves_x', 'feridos_leves_x', 'feridos']
+
+
+def ler_csv_master(caminho=None):
+    """Lê o CSV master (ou `caminho`, no mesmo formato) no perfil do dashboard.
+
+    É a ingestão usada pelo cache, pelo snapshot e pelo process_data.py.
+    """
+    df = pd.read_csv(caminho or CSV_MASTER, sep=';', encoding='utf-8', low_memory=False,
+                     usecols=lambda col: col in COLUNAS_DASHBOARD)
+    df['id'] = pd.to_numeric(df['id'], downcast='integer')
+
     df['data_inversa_x'] = pd.to_datetime(df['data_inversa_x'], errors='coerce')
-    df['ano'] = df['data_inversa_x'].dt.year.astype('Int64').astype(str)
-    df['mes'] = df['data_inversa_x'].dt.month.astype('Int64').astype(str).str.zfill(2)
-    df['hora_int'] = pd.to_datetime(df['horario_x'], format='%H:%M:%S', errors='coerce').dt.hour
+    df['ano'] = df['data_inversa_x'].dt.year.astype('Int16')
+    df['mes'] = df['data_inversa_x'].dt.month.astype('Int8')
+    df['hora_int'] = pd.to_datetime(df['horario_x'], format='%H:%M:%S', errors='coerce').dt.hour.astype('Int8')
+    df = df.drop(columns=['horario_x'])
+
+    df['km_num'] = pd.to_numeric(df['km_x'].astype(str).str.replace(',', '.'), errors='coerce').astype(np.float32)
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = clean_column(df[col]).astype('category')
+
+    for col in ['mortos_x', 'feridos_graves_x', 'feridos_leves_x']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    if 'feridos' not in df.columns:
+        df['feridos'] = df['feridos_graves_x'] + df['feridos_leves_x']
+    df['feridos'] = pd.to_numeric(df['feridos'], errors='coerce').fillna(0)
+    for col in COLUNAS_VITIMAS:
+        df[col] = pd.to_numeric(df[col].round().astype(np.int64), downcast='integer')
     return df
 
 
+# =========================
+# CSV COM DELIMITADOR DESCONHECIDO
+# =========================
+# read_csv(sep=None) detecta o delimitador, mas força o engine python, muito
+# mais lento que o C. Aqui o delimitador é detectado numa amostra do início
+# do arquivo e a leitura usa o engine C.
+SEPARADORES = ';,\t|'
+
+
+def detectar_separador(path, encoding='latin1', amostra=64 * 1024):
+    """Delimitador do CSV pelo csv.Sniffer nas primeiras linhas (';' se não der para decidir)."""
+    with open(path, 'r', encoding=encoding, errors='replace') as f:
+        linhas = f.read(amostra).splitlines()
+    # A última linha da amostra pode ter sido cortada no meio
+    trecho = '\n'.join(linhas[:-1] if len(linhas) > 1 else linhas)
+    try:
+        return csv.Sniffer().sniff(trecho, delimiters=SEPARADORES).delimiter
+    except csv.Error:
+        return ';'
+
+
+def ler_csv(path, encoding='latin1', **kwargs):
+    """pd.read_csv com o delimitador detectado e o engine C."""
+    kwargs.setdefault('low_memory', False)
+    return pd.read_csv(path, sep=detectar_separador(path, encoding), encoding=encoding, **kwargs)
+
+
+def _bytes_em_memoria(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report():
+    """Compara o footprint do CSV completo (leitura antiga) com o perfil enxuto."""
+    completo = pd.read_csv(CSV_MASTER, sep=';', encoding='utf-8', low_memory=False)
+    antes = _bytes_em_memoria(completo)
+    del completo
+    depois = _bytes_em_memoria(ler_csv_master())
+    print(f"💾 Memória do dataset: antes {antes / 2**20:.1f} MiB -> depois {depois / 2**20:.1f} MiB "
+          f"({antes / max(depois, 1):.1f}x menor)")
+    return {"antes_bytes": antes, "depois_bytes": depois}
+
+
+# =========================
+# CACHE DO DATASET
+# =========================
+# O CSV é parseado uma única vez por processo. A cada acesso só o stat do
+# arquivo é consultado; se mtime/tamanho mudarem, o hash do conteúdo decide
+# se é preciso reler (um "touch" sem alteração não dispara nova leitura).
+_CACHE_LOCK = threading.Lock()
+_CACHE = {"df": None, "assinatura": None, "hash": None, "versao": None, "indice": None}
+
+# Colunas com bitmap no índice de filtros (ver processors/filter_index.py)
+COLUNAS_INDICE = ['ano', 'mes', 'condicao_metereologica_x', 'tipo_acidente_x', 'fase_dia_x', 'br_x', 'municipio_x']
+
+
+def _hash_arquivo(path, tamanho_bloco=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _dataset_atual():
+    if not CSV_MASTER.exists():
+        raise FileNotFoundError(f"CSV não encontrado em: {CSV_MASTER}")
+    stat = CSV_MASTER.stat()
+    assinatura = (str(CSV_MASTER), stat.st_mtime_ns, stat.st_size)
+    with _CACHE_LOCK:
+        if _CACHE['df'] is not None and _CACHE['assinatura'] == assinatura:
+            return _CACHE['df'], _CACHE['versao']
+        digest = _hash_arquivo(CSV_MASTER)
+        if _CACHE['df'] is None or digest != _CACHE['hash']:
+            _CACHE['df'] = ler_csv_master()
+            _CACHE['hash'] = digest
+            _CACHE['versao'] = digest[:12]
+            _CACHE['indice'] = None
+            print(f"  📦 Dataset carregado (versão {_CACHE['versao']}): {len(_CACHE['df'])} linhas, "
+                  f"{_bytes_em_memoria(_CACHE['df']) / 2**20:.1f} MiB em memória")
+        _CACHE['assinatura'] = assinatura
+        return _CACHE['df'], _CACHE['versao']
+
+
+def get_df():
+    """Visão do dataset em cache.
+
+    É uma cópia rasa: os processadores podem criar colunas auxiliares sem
+    afetar o cache, mas não devem alterar valores existentes in-place.
+    """
+    df, _ = _dataset_atual()
+    return df.copy(deep=False)
+
+
+def _dataset_e_indice():
+    from processors.filter_index import FilterIndex
+    df, versao = _dataset_atual()
+    with _CACHE_LOCK:
+        if _CACHE['indice'] is None or _CACHE['indice'][0] is not df:
+            _CACHE['indice'] = (df, FilterIndex(df, COLUNAS_INDICE, coluna_hora='hora_int'))
+        return _CACHE['indice']
+
+
+def get_filter_index():
+    """Índice de bitmaps do dataset em cache, criado no primeiro uso de cada versão."""
+    return _dataset_e_indice()[1]
+
+
+def get_dataset_version():
+    """Identificador da versão do CSV atualmente em memória."""
+    return _dataset_atual()[1]
+
+
 def load_data():
     """Compatibilidade com processadores antigos."""
     df_master = get_df()
@@ -43,18 +193,42 @@ def load_data():
 # =========================
 # FILTRO CENTRAL (AND completo)
 # =========================
-def get_filtered_df(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao=None):
-    df = get_df()
+# ano/mes chegam da query como texto. Um valor que não é número não casa com
+# nenhuma linha (resultado vazio, não erro), como na comparação por texto
+# original: vira SEM_CORRESPONDENCIA, que não existe em ano nem em mes.
+SEM_CORRESPONDENCIA = -1
+
+
+def filtro_inteiro(valor):
+    """ano/mes da query como int (SEM_CORRESPONDENCIA se não for um número)."""
+    try:
+        return int(str(valor).strip())
+    except ValueError:
+        return SEM_CORRESPONDENCIA
+
+
+def get_filtered_df(ano=None, mes=None, hora_inicio=None, hora_fim=None, condicao=None, colunas=None):
+    """Filtra o dataset; `colunas` limita as colunas devolvidas.
+
+    Com um snapshot Parquet atualizado (processors/snapshot.py) só as
+    partições de ano/mes pedidas e as colunas necessárias são lidas.
+    """
+    from processors.snapshot import snapshot_disponivel, ler_snapshot
+    if snapshot_disponivel():
+        return ler_snapshot(ano=ano, mes=mes, hora_inicio=hora_inicio, hora_fim=hora_fim, condicao=condicao, colunas=colunas)
+
+    filtros = {}
     if ano:
-        df = df[df['ano'] == str(ano)]
+        filtros['ano'] = filtro_inteiro(ano)
     if mes:
-        df = df[df['mes'] == str(mes).zfill(2)]
-    if hora_inicio is not None:
-        df = df[df['hora_int'] >= int(hora_inicio)]
-    if hora_fim is not None:
-        df = df[df['hora_int'] <= int(hora_fim)]
+        filtros['mes'] = filtro_inteiro(mes)
     if condicao:
-        df = df[df['condicao_metereologica_x'] == condicao]
+        filtros['condicao_metereologica_x'] = condicao
+    base, indice = _dataset_e_indice()
+    posicoes = indice.selecionar(filtros, hora_inicio=hora_inicio, hora_fim=hora_fim)
+    df = base.copy(deep=False) if posicoes is None else base.take(posicoes)
+    if colunas is not None:
+        df = df[list(dict.fromkeys(list(colunas) + ['ano', 'mes']))]
     return df
 
 
@@ -64,8 +238,8 @@ def get_filtered_df(ano=None, mes=None, hora_inicio=None, hora_fim=None, condica
 def save_json(data, filename):
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     path = DATA_DIR / filename
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    with open(path, 'wb') as f:
+        f.write(dumps(data, indentar=True))
     print(f"  ✅ Salvo: {path}")
 
 
@@ -80,10 +254,11 @@ def get_month_year(date):
 
 def get_last_two_months(df):
     df = df.copy()
-    df['ano_mes'] = df['data_inversa_x'].apply(get_month_year)
+    df['ano_mes'] = month_key(df)
     meses = sorted(df['ano_mes'].dropna().unique())
     if len(meses) == 0:
-        return pd.DataFrame(), pd.DataFrame(), None, None
+        # Filtro sem linhas: fatias vazias com as colunas, para os KPIs saírem zerados
+        return df.iloc[:0], df.iloc[:0], None, None
     mes_atual = meses[-1]
     mes_anterior = meses[-2] if len(meses) >= 2 else None
     df_atual = df[df['ano_mes'] == mes_atual]
@@ -116,3 +291,7 @@ def clean_string(value):
     if pd.isna(value):
         return None
     return str(value).strip()
+
+
+if __name__ == "__main__":
+    memory_report()
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# Testes rodam a partir de qualquer pasta: a raiz do projeto entra no path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
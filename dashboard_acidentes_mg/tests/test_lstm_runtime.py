@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import numpy as np
+import pytest
+
+from backend.ml.lstm.runtime import NumpyLSTM, PARITY_TOLERANCE, export_model
+from backend.ml.lstm.service import BASE_DIR, MODEL_CANDIDATES
+
+# Paridade do runtime NumPy: contra uma implementacao de referencia em
+# float64 (sem TensorFlow, sobre os .npz do repositorio e um modelo global
+# sintetico) e, com TensorFlow instalado, contra o proprio Keras.
+COMMITTED_NPZ = [
+    path for path in (os.path.splitext(model)[0] + '.npz' for model, _ in MODEL_CANDIDATES)
+    if os.path.exists(path)
+]
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+REFERENCE_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+}
+
+def reference_forward(spec, arrays, x, ids=None):
+    """Forward pass passo a passo em float64, com os pesos na ordem do Keras (i, f, c, o)."""
+    x = np.asarray(x, dtype=np.float64)
+    w = {name: np.asarray(value, dtype=np.float64) for name, value in arrays.items()}
+    for layer in spec['layers']:
+        if layer['type'] == 'embedding':
+            vectors = w[layer['weights'][0]][ids]
+            x = np.concatenate([x, np.repeat(vectors[:, None, :], x.shape[1], axis=1)], axis=-1)
+        elif layer['type'] == 'lstm':
+            kernel, recurrent, bias = (w[name] for name in layer['weights'])
+            act = REFERENCE_ACTIVATIONS[layer['activation']]
+            rec_act = REFERENCE_ACTIVATIONS[layer['recurrent_activation']]
+            units = recurrent.shape[0]
+            h = np.zeros((x.shape[0], units))
+            c = np.zeros((x.shape[0], units))
+            outputs = []
+            for t in range(x.shape[1]):
+                z = x[:, t] @ kernel + h @ recurrent + bias
+                i, f, g, o = (z[:, k * units:(k + 1) * units] for k in range(4))
+                c = rec_act(f) * c + rec_act(i) * act(g)
+                h = rec_act(o) * act(c)
+                outputs.append(h)
+            x = np.stack(outputs, axis=1) if layer['return_sequences'] else h
+        elif layer['type'] == 'dense':
+            kernel, bias = (w[name] for name in layer['weights'])
+            x = REFERENCE_ACTIVATIONS[layer['activation']](x @ kernel + bias)
+    return x
+
+def _windows(n, lookback, features=1, seed=0):
+    return np.random.default_rng(seed).uniform(0, 1, (n, lookback, features)).astype(np.float32)
+
+# =========================
+# SEM TENSORFLOW
+# =========================
+@pytest.mark.parametrize("path", COMMITTED_NPZ, ids=lambda p: os.path.relpath(p, BASE_DIR))
+def test_committed_weights_match_reference(path):
+    with np.load(path, allow_pickle=False) as data:
+        spec = json.loads(str(data['spec']))
+        arrays = {name: data[name] for name in data.files if name != 'spec'}
+    runtime = NumpyLSTM.load(path)
+    x = _windows(64, spec['input_shape'][1], spec['input_shape'][2])
+
+    expected = reference_forward(spec, arrays, x)
+    assert runtime(x).shape == expected.shape
+    assert np.abs(runtime(x) - expected).max() < PARITY_TOLERANCE
+    assert np.abs(runtime(x[:1]) - expected[:1]).max() < PARITY_TOLERANCE
+
+def test_global_model_matches_reference():
+    # Mesma arquitetura do global_model.py: Embedding concatenado a janela, LSTM e Dense
+    rng = np.random.default_rng(1)
+    lookback, n_series, dim, units = 14, 6, 4, 8
+    spec = {
+        "layers": [
+            {"type": "embedding", "weights": ["1_embeddings"]},
+            {"type": "lstm", "weights": ["4_kernel", "4_recurrent_kernel", "4_bias"],
+             "return_sequences": False, "activation": "tanh", "recurrent_activation": "sigmoid"},
+            {"type": "dense", "weights": ["6_kernel", "6_bias"], "activation": "linear"},
+        ],
+        "input_shape": [None, lookback, 1],
+    }
+    arrays = {
+        "1_embeddings": rng.normal(0, 0.5, (n_series, dim)),
+        "4_kernel": rng.normal(0, 0.5, (1 + dim, 4 * units)),
+        "4_recurrent_kernel": rng.normal(0, 0.5, (units, 4 * units)),
+        "4_bias": rng.normal(0, 0.5, 4 * units),
+        "6_kernel": rng.normal(0, 0.5, (units, 1)),
+        "6_bias": rng.normal(0, 0.5, 1),
+    }
+    arrays = {name: value.astype(np.float32) for name, value in arrays.items()}
+    runtime = NumpyLSTM(spec['layers'], arrays, spec['input_shape'])
+    x, ids = _windows(32, lookback), rng.integers(0, n_series, 32)
+
+    expected = reference_forward(spec, arrays, x, ids)
+    assert np.abs(runtime([x, ids]) - expected).max() < PARITY_TOLERANCE
+
+# =========================
+# CONTRA O KERAS
+# =========================
+def _keras_parity(model, tmp_path, inputs):
+    path = str(tmp_path / 'modelo.keras')
+    model.save(path)
+    out = export_model(path, out_path=str(tmp_path / 'modelo.npz'), check=False, scale=(0.0, 1.0))
+    runtime = NumpyLSTM.load(out)
+    expected = np.asarray(model(inputs, training=False))
+    single = [part[:1] for part in inputs] if isinstance(inputs, list) else inputs[:1]
+    assert runtime.scale == (0.0, 1.0)
+    assert np.abs(runtime(inputs) - expected).max() < PARITY_TOLERANCE
+    assert np.abs(runtime(single) - np.asarray(model(single, training=False))).max() < PARITY_TOLERANCE
+
+@pytest.mark.parametrize("n_layers, dense_units", [(1, None), (2, 16)])
+def test_sequential_model_matches_keras(tmp_path, n_layers, dense_units):
+    pytest.importorskip("tensorflow")
+    from backend.ml.lstm.model import create_lstm_model
+
+    model = create_lstm_model((30, 1), units=24, n_layers=n_layers, dense_units=dense_units)
+    _keras_parity(model, tmp_path, _windows(128, 30))
+
+def test_global_model_matches_keras(tmp_path):
+    pytest.importorskip("tensorflow")
+    from backend.ml.lstm.global_model import create_global_model
+
+    n_series = 7
+    model = create_global_model(lookback=21, n_series=n_series, embedding_dim=4, units=16)
+    ids = np.random.default_rng(2).integers(0, n_series, 128).astype(np.int32)
+    _keras_parity(model, tmp_path, [_windows(128, 21), ids])
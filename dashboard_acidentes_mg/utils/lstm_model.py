@@ -6,12 +6,14 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
 import os
 import json
+import joblib
+from backend.ml.lstm.runtime import export_model
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODELS_DIR = os.path.join(BASE_DIR, 'models', 'tensorflow')
 METRICS_DIR = os.path.join(BASE_DIR, 'models', 'predictions')
 
-def build_and_train_lstm(X_train, y_train, X_test, y_test):
+def build_and_train_lstm(X_train, y_train, X_test, y_test, scaler=None, last_train_date=None):
     model = Sequential([
         LSTM(50, return_sequences=True, input_shape=(X_train.shape[1], 1)),
         Dropout(0.2),
@@ -28,9 +30,15 @@ def build_and_train_lstm(X_train, y_train, X_test, y_test):
     
     os.makedirs(MODELS_DIR, exist_ok=True)
     model.save(os.path.join(MODELS_DIR, 'lstm_acidentes.keras'))
+    if scaler is not None:
+        joblib.dump(scaler, os.path.join(MODELS_DIR, 'lstm_scaler.pkl'))
+    export_model(os.path.join(MODELS_DIR, 'lstm_acidentes.keras'), os.path.join(MODELS_DIR, 'lstm_scaler.pkl'))
     
     preds = model.predict(X_test)
     metrics = {"mae": float(mean_absolute_error(y_test, preds)), "rmse": float(np.sqrt(mean_squared_error(y_test, preds)))}
+    if last_train_date is not None:
+        # Ultimo dia usado como alvo no treino: ponto de partida do ajuste incremental (finetune.py)
+        metrics["last_train_date"] = str(last_train_date.date())
     
     os.makedirs(METRICS_DIR, exist_ok=True)
     with open(os.path.join(METRICS_DIR, 'lstm_metrics.json'), 'w') as f:
@@ -1,8 +1,7 @@
 ﻿import pandas as pd
-import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-import joblib
 import os
+from backend.ml.preprocessing.windows import WindowSet, train_cutoff
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODELS_DIR = os.path.join(BASE_DIR, 'models', 'tensorflow')
@@ -14,19 +13,15 @@ def prepare_time_series_data(df, time_steps=30):
     idx = pd.date_range(df_daily.index.min(), df_daily.index.max())
     df_daily = df_daily.reindex(idx, fill_value=0)
     
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(df_daily[['total_acidentes']])
+    # Scaler ajustado so nos dias vistos pelas janelas de treino (sem vazar o teste)
+    values = df_daily[['total_acidentes']].values
+    split, seen = train_cutoff(len(values), time_steps, 1, 0.8)
+    # O scaler so e gravado junto com o modelo treinado (build_and_train_lstm),
+    # para o lstm_scaler.pkl nunca ficar fora de par com o modelo salvo
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit(values[:seen])
     
-    os.makedirs(MODELS_DIR, exist_ok=True)
-    joblib.dump(scaler, os.path.join(MODELS_DIR, 'lstm_scaler.pkl'))
-    
-    X, y = [], []
-    for i in range(len(scaled_data) - time_steps):
-        X.append(scaled_data[i:(i + time_steps), 0])
-        y.append(scaled_data[i + time_steps, 0])
-        
-    X, y = np.array(X), np.array(y)
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
-    
-    split = int(len(X) * 0.8)
-    return X[:split], X[split:], y[:split], y[split:], scaler, df_daily
+    # Janelas como views sobre a serie escalada (X: [samples, time steps, 1])
+    windows = WindowSet(scaler.transform(values)[:, 0], time_steps)
+    X_train, X_test = windows.X(0, 0, split), windows.X(0, split)
+    y_train, y_test = windows.y(0, 0, split), windows.y(0, split)
+    return X_train, X_test, y_train, y_test, scaler, df_daily